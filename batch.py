@@ -0,0 +1,159 @@
+import glob
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from debuglog import DEFAULT_MAX_SAMPLE_ROWS, DebugLog
+from engine import LaborTimeEngine
+from writer import XLSX_MAX_ROWS, fits_xlsx, write_workbook
+
+SUMMARY_COLUMNS = ['源文件', '状态', 'Sheet1行数', 'Sheet2行数', '输出文件', '错误信息']
+
+# 工作进程中的共享参考数据，由 _init_worker 在进程启动时设置一次
+_worker_references = None
+
+
+def expand_inputs(pattern: str) -> list[str]:
+    """Return the .xlsx files in a directory, or the files matching a glob pattern."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.xlsx')
+    files = sorted(glob.glob(pattern))
+    # 跳过 Excel 打开文件时生成的 ~$ 临时文件
+    return [f for f in files if os.path.isfile(f) and not os.path.basename(f).startswith('~$')]
+
+
+def per_file_output_paths(inputs: list[str], output_dir: str) -> dict:
+    """Map each input file to a unique '<stem>_工时.xlsx' path in output_dir."""
+    paths = {}
+    used = set()
+    for test_file_path in inputs:
+        stem = os.path.splitext(os.path.basename(test_file_path))[0]
+        name = f"{stem}_工时.xlsx"
+        suffix = 2
+        while name in used:
+            name = f"{stem}_工时_{suffix}.xlsx"
+            suffix += 1
+        used.add(name)
+        paths[test_file_path] = os.path.join(output_dir, name)
+    return paths
+
+
+def _init_worker(references: dict) -> None:
+    global _worker_references
+    _worker_references = references
+
+
+def process_file(test_file_path: str, user_batch_size: float | None, output_file_path: str | None = None,
+                 sheet2_format: str = 'xlsx', log_level: str = '分布信息',
+                 max_sample_rows: int = DEFAULT_MAX_SAMPLE_ROWS, sampling_plan: str | None = None,
+                 debug_rows_path: str | None = None) -> dict:
+    """Worker: calculate one file, writing it to output_file_path or returning the sheets for consolidation.
+
+    Full row sets for the debug-rows sidecar stay in the returned log; the parent writes them when merging.
+    """
+    debug_info = DebugLog(log_level, max_sample_rows, rows_path=debug_rows_path, defer_rows=True)
+    engine = LaborTimeEngine(use_cache=False, sheet2_format=sheet2_format, debug_info=debug_info,
+                             sampling_plan=sampling_plan)
+    result = {
+        'file': test_file_path,
+        'success': False,
+        'sheet1': None,
+        'sheet2': None,
+        'rows': (0, 0),
+        'output': output_file_path or '',
+        'error': '',
+        'debug_info': engine.debug_info,
+    }
+    try:
+        sheet1_data, sheet2_data, _ = engine.compute_file(test_file_path, user_batch_size, _worker_references)
+        if output_file_path:
+            engine.write_output(output_file_path, sheet1_data, sheet2_data)
+        else:
+            result['sheet1'], result['sheet2'] = sheet1_data, sheet2_data
+        result['rows'] = (len(sheet1_data), len(sheet2_data))
+        result['success'] = True
+    except Exception as e:
+        engine.debug_info.append({
+            '时间戳': engine.current_time,
+            '类别': '错误',
+            '信息': f"处理数据时出错：{e}\n{traceback.format_exc()}"
+        })
+        result['error'] = str(e)
+    return result
+
+
+def run_batch(input_pattern: str, output_path: str, user_batch_size: float | None = None, per_file: bool = False,
+              max_workers: int | None = None, data_dir: str | None = None, cache_dir: str | None = None,
+              use_cache: bool = True, sheet2_format: str = 'xlsx', log_level: str = '分布信息',
+              max_sample_rows: int = DEFAULT_MAX_SAMPLE_ROWS, tool_hours_version: str | None = None,
+              tool_hours_dir: str | None = None, sampling_plan: str | None = None,
+              debug_rows_path: str | None = None, parallel_load: bool = True) -> pd.DataFrame:
+    """Process many inspection-card files in a process pool and return the per-file summary.
+
+    Reference workbooks are loaded once in the parent and handed to each worker process at
+    start-up. With per_file, output_path is a directory receiving one workbook per input plus
+    批处理汇总.xlsx; otherwise all results are consolidated into the output_path workbook. The
+    debug-rows sidecar at debug_rows_path collects the full row sets of every file, tagged with 源文件.
+    A consolidated Sheet2 too large for an xlsx worksheet goes to a CSV side file (see write_output);
+    a consolidated Sheet1 that large raises ValueError, as per_file output is needed then.
+    """
+    engine = LaborTimeEngine(data_dir=data_dir, cache_dir=cache_dir, use_cache=use_cache, sheet2_format=sheet2_format,
+                             log_level=log_level, max_sample_rows=max_sample_rows,
+                             tool_hours_version=tool_hours_version, tool_hours_dir=tool_hours_dir,
+                             sampling_plan=sampling_plan, debug_rows_path=debug_rows_path, parallel_load=parallel_load)
+    inputs = expand_inputs(input_pattern)
+    if not inputs:
+        raise FileNotFoundError(f"未找到匹配的检验卡文件：{input_pattern}")
+    references = engine.load_references()
+    # 在启动进程池之前校验抽样方案
+    engine.load_sampling_plan()
+
+    output_paths = {}
+    if per_file:
+        os.makedirs(output_path, exist_ok=True)
+        output_paths = per_file_output_paths(inputs, output_path)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(references,)) as executor:
+        futures = [executor.submit(process_file, f, user_batch_size, output_paths.get(f), sheet2_format, log_level,
+                                   max_sample_rows, sampling_plan, debug_rows_path) for f in inputs]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['file']] = result
+    ordered = [results[f] for f in inputs]
+
+    summary = pd.DataFrame([{
+        '源文件': r['file'],
+        '状态': '成功' if r['success'] else '失败',
+        'Sheet1行数': r['rows'][0],
+        'Sheet2行数': r['rows'][1],
+        '输出文件': r['output'] if per_file else output_path,
+        '错误信息': r['error'],
+    } for r in ordered], columns=SUMMARY_COLUMNS)
+
+    for r in ordered:
+        engine.debug_info.merge(r['debug_info'], 源文件=r['file'])
+    engine.debug_info.append({
+        '时间戳': engine.current_time,
+        '类别': '信息',
+        '信息': f"批量处理完成：共 {len(ordered)} 个文件，成功 {int((summary['状态'] == '成功').sum())} 个"
+    })
+
+    succeeded = [r for r in ordered if r['success']]
+    try:
+        if per_file or not succeeded:
+            summary_path = os.path.join(output_path, '批处理汇总.xlsx') if per_file else output_path
+            write_workbook(summary_path, {'Summary': summary,
+                                          'DebugInfo': engine.debug_info.to_frame(engine.current_time)})
+        else:
+            sheet1_data = pd.concat([r['sheet1'].assign(源文件=r['file']) for r in succeeded], ignore_index=True)
+            if not fits_xlsx(sheet1_data):
+                raise ValueError(f"合并后的 Sheet1 有 {len(sheet1_data)} 行，超过 xlsx 工作表的上限 {XLSX_MAX_ROWS - 1} 行，"
+                                 f"请使用 --per-file 分别输出")
+            sheet2_data = pd.concat([r['sheet2'].assign(源文件=r['file']) for r in succeeded], ignore_index=True)
+            engine.write_output(output_path, sheet1_data, sheet2_data, extra_sheets={'Summary': summary})
+    finally:
+        engine.debug_info.close()
+    return summary
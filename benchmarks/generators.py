@@ -0,0 +1,128 @@
+"""Seeded generators for synthetic batch, tool-database, BOM and inspection-card data.
+
+All generators are vectorized so that inspection-card frames of several million rows can be built
+in seconds, and take a numpy Generator so that the same seed always yields the same data.
+"""
+import numpy as np
+import pandas as pd
+
+from engine import SPECIAL_TOOLS
+
+# 抽样频率分布：覆盖首末件、1件/批、全检、各级 AQL、大小写/空格变体以及无效写法
+FREQUENCY_MIX = {
+    'AQL1.0 C=0': 0.18,
+    'AQL2.5 C=0': 0.18,
+    'AQL4.0 C=0': 0.12,
+    'AQL 0.65': 0.05,
+    'aql 6.5': 0.04,
+    'AQL10': 0.03,
+    '首末件': 0.12,
+    '1件/批': 0.10,
+    '100%': 0.12,
+    'AQLX': 0.02,
+    '随机': 0.02,
+    '巡检': 0.02,
+}
+OPERATION_NAMES = ['车削', '铣削', '磨削', '钻孔', '终检', '外协处理', '热处理后检验']
+CARD_COLUMNS = ['产品编码', '检验卡编号', '版本', '工艺编号', '工序号', '工序名称', '量具1层编码', '量具2层编码',
+                '抽样频率', '是否检验', '尺寸内容']
+
+
+def _codes(prefix: str, values: np.ndarray, width: int = 6) -> pd.Series:
+    return prefix + pd.Series(values).astype(str).str.zfill(width)
+
+
+def generate_tool_database(n_tools: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Return a database.xlsx frame: tool name, category and base hours, including every special tool."""
+    names = pd.concat([pd.Series(SPECIAL_TOOLS), _codes('GAGE TYPE ', np.arange(n_tools)) + '通用量具'],
+                      ignore_index=True)
+    hours = rng.choice([0.002, 0.004, 0.006, 0.01, 0.02, 0.05], size=len(names))
+    # 少量工时为0的量具，用于覆盖相应警告
+    hours[rng.random(len(names)) < 0.01] = 0
+    category = np.where(names.isin(SPECIAL_TOOLS), '特殊量具', '非特殊量具')
+    return pd.DataFrame({'量具1层': names, '量具分类': category, '工时基数': hours})
+
+
+def generate_batch(n_materials: int, n_rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Return a batch_num.xlsx frame of historical order quantities for n_materials material numbers."""
+    materials = _codes('', rng.integers(0, n_materials, size=n_rows) + 100000)
+    quantity = np.maximum(1, rng.lognormal(mean=3.5, sigma=1.0, size=n_rows).round()).astype(int)
+    return pd.DataFrame({
+        'Material Number': materials,
+        'Batch': _codes('ZB', np.arange(n_rows), width=7),
+        'Order quantity (GMEIN)': quantity,
+    })
+
+
+def generate_cards(n_rows: int, n_materials: int, tool_names: pd.Series, rng: np.random.Generator,
+                   duplicate_ratio: float = 0.5, unmatched_tool_ratio: float = 0.03,
+                   unmatched_material_ratio: float = 0.05, empty_tool_ratio: float = 0.01) -> pd.DataFrame:
+    """Return an inspection-card frame with n_rows rows.
+
+    duplicate_ratio of the rows repeat an earlier (工艺编号, 工序号) with another 尺寸内容, as the extra
+    dimensions of one operation do in real exports. Tool codes get random case and spacing noise,
+    and a share of rows use tools missing from the database, empty tools or unknown product codes.
+    """
+    n_unique = max(1, int(n_rows * (1 - duplicate_ratio)))
+    operation = np.concatenate([np.arange(n_unique), rng.integers(0, n_unique, size=n_rows - n_unique)])
+    rng.shuffle(operation)
+    # 每个工艺编号约 5 道工序，每张检验卡约 4 个工艺编号
+    routing = operation // 5
+    card = routing // 4
+
+    material_ids = card % n_materials + 100000
+    materials = _codes('', material_ids)
+    unknown_material = rng.random(n_rows) < unmatched_material_ratio
+    materials[unknown_material] = _codes('9', material_ids[unknown_material]).to_numpy()
+
+    tools = pd.Series(tool_names.to_numpy()[rng.integers(0, len(tool_names), size=n_rows)])
+    noisy = rng.random(n_rows) < 0.2
+    tools[noisy] = ' ' + tools[noisy].str.lower().str.replace(' ', '  ') + ' '
+    unknown_tool = rng.random(n_rows) < unmatched_tool_ratio
+    tools[unknown_tool] = _codes('UNKNOWN GAGE ', rng.integers(0, 1000, size=int(unknown_tool.sum())),
+                                 width=4).to_numpy()
+    tools[rng.random(n_rows) < empty_tool_ratio] = np.nan
+
+    frequencies = np.array(list(FREQUENCY_MIX))
+    weights = np.array(list(FREQUENCY_MIX.values()))
+    return pd.DataFrame({
+        '产品编码': materials,
+        '检验卡编号': _codes('QC', card),
+        '版本': rng.choice(['A', 'B', 'C'], size=n_rows, p=[0.7, 0.2, 0.1]),
+        '工艺编号': _codes('r', routing, width=8),
+        '工序号': (operation % 5 + 1) * 10,
+        '工序名称': rng.choice(OPERATION_NAMES, size=n_rows),
+        '量具1层编码': tools,
+        '量具2层编码': 'N/A',
+        '抽样频率': frequencies[rng.choice(len(frequencies), size=n_rows, p=weights / weights.sum())],
+        '是否检验': np.where(rng.random(n_rows) < 0.9, '是', '否'),
+        '尺寸内容': _codes('D', np.arange(n_rows), width=8),
+    }, columns=CARD_COLUMNS)
+
+
+def generate_bom(cards: pd.DataFrame, rng: np.random.Generator, match_ratio: float = 0.8) -> pd.DataFrame:
+    """Return a BOM.xlsx frame covering match_ratio of the cards' operations, plus a few duplicate rows."""
+    operations = cards[['工艺编号', '工序号']].drop_duplicates()
+    operations = operations[rng.random(len(operations)) < match_ratio]
+    n = len(operations)
+    bom = pd.DataFrame({
+        'Material': 'M',
+        'Production Version': rng.choice(['0001', '0002'], size=n),
+        'Description': operations['工艺编号'].str.upper().to_numpy(),
+        'Operation/Activity N': operations['工序号'].to_numpy(),
+        'Operation short text': 'op',
+        'Setup Personal time': rng.choice([0.1, 0.2, 0.3], size=n),
+        'Labor time': rng.choice([0.01, 0.02, 0.05, 0.1], size=n),
+    })
+    return pd.concat([bom, bom.sample(n=min(n, max(1, n // 100)), random_state=rng)], ignore_index=True)
+
+
+def generate_dataset(n_rows: int, seed: int = 0) -> dict:
+    """Return every input frame for one benchmark scale: batch, database, bom and cards."""
+    rng = np.random.default_rng(seed)
+    n_materials = max(50, n_rows // 200)
+    database = generate_tool_database(max(100, min(2000, n_rows // 100)), rng)
+    batch = generate_batch(n_materials, max(1000, min(200_000, n_rows // 5)), rng)
+    cards = generate_cards(n_rows, n_materials, database['量具1层'], rng)
+    bom = generate_bom(cards, rng)
+    return {'batch': batch, 'database': database, 'bom': bom, 'cards': cards}
@@ -0,0 +1,209 @@
+"""Benchmark the labor time pipeline on synthetic data.
+
+Run from the repository root:
+
+    python -m benchmarks.run --scales 10000 100000
+    python -m benchmarks.run --scales 10000 100000 --compare benchmarks/baseline.json
+    python -m benchmarks.run --scales 10000 100000 --output benchmarks/baseline.json
+
+For every scale the seeded dataset is written to a temporary directory. The hot paths are timed in
+memory (best of --repeat runs), then the whole pipeline runs end to end with the engine's stage
+profiler. Inspection cards above --max-xlsx-rows are written as CSV and run in streaming mode,
+since an xlsx sheet holds at most 1,048,576 rows.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.generators import generate_dataset
+from dedup import TEST_DEDUP_COLUMNS, KeyDeduplicator
+from engine import LaborTimeEngine
+from writer import write_workbook
+
+DEFAULT_SCALES = [10_000, 100_000]
+DEFAULT_MAX_XLSX_ROWS = 1_000_000
+DEFAULT_TOLERANCE = 0.25
+# 基线耗时低于该值的指标只做参考，不判定为退化
+NOISE_FLOOR_SECONDS = 0.25
+
+
+def best_of(repeat: int, make_input, func) -> float:
+    """Return the fastest of repeat runs of func(make_input()), excluding the input preparation."""
+    best = None
+    for _ in range(repeat):
+        data = make_input()
+        start = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def write_inputs(dataset: dict, data_dir: str, cards_as_csv: bool) -> str:
+    """Write the reference workbooks and the inspection cards, returning the inspection-card path."""
+    write_workbook(os.path.join(data_dir, 'batch_num.xlsx'), {'Sheet1': dataset['batch']})
+    write_workbook(os.path.join(data_dir, 'database.xlsx'), {'Sheet1': dataset['database']})
+    write_workbook(os.path.join(data_dir, 'BOM.xlsx'), {'Sheet1': dataset['bom']})
+    if cards_as_csv:
+        cards_path = os.path.join(data_dir, 'whole_rawdata.csv')
+        dataset['cards'].to_csv(cards_path, index=False, encoding='utf-8-sig')
+    else:
+        cards_path = os.path.join(data_dir, 'whole_rawdata.xlsx')
+        write_workbook(cards_path, {'Sheet1': dataset['cards']})
+    return cards_path
+
+
+def time_kernels(dataset: dict, data_dir: str, repeat: int) -> dict:
+    """Time the in-memory hot paths of the pipeline on one dataset."""
+    engine = LaborTimeEngine(data_dir=data_dir, use_cache=False)
+    references = engine.load_references()
+    cards = dataset['cards']
+
+    normalized = engine.normalize_test_data(cards.copy())
+    deduped = normalized[KeyDeduplicator(TEST_DEDUP_COLUMNS).keep_mask(normalized)]
+    assigned = engine.assign_batch_size(deduped.copy(), references['lot_size_stats'],
+                                        references['default_lot_size'], None)
+    enriched = engine.enrich_test_data(deduped.copy(), None, references)
+    return {
+        'normalize': best_of(repeat, cards.copy, engine.normalize_test_data),
+        'dedup': best_of(repeat, lambda: normalized,
+                         lambda df: df[KeyDeduplicator(TEST_DEDUP_COLUMNS, report=False).keep_mask(df)]),
+        'sampling': best_of(repeat, assigned.copy, engine.calculate_sampling_quantity),
+        'enrich': best_of(repeat, deduped.copy, lambda df: engine.enrich_test_data(df, None, references)),
+        'sheet1': best_of(repeat, enriched.copy, lambda df: engine.create_sheet1_data(df, None)),
+        'sheet2': best_of(repeat, enriched.copy, engine.create_sheet2_data),
+    }
+
+
+def run_end_to_end(cards_path: str, data_dir: str, streaming: bool, sheet2_format: str) -> dict:
+    """Run the whole pipeline with stage profiling and return the stage and total timings."""
+    engine = LaborTimeEngine(data_dir=data_dir, use_cache=False, sheet2_format=sheet2_format, log_level='警告',
+                             profile=True)
+    output_path = os.path.join(data_dir, 'output.xlsx')
+    if streaming:
+        success, message = engine.process_data_streaming(cards_path, None, output_path)
+    else:
+        success, message, _, _ = engine.process_data(cards_path, None, output_path)
+    if not success:
+        raise RuntimeError(message)
+    report = engine.profiler.report()
+    return {
+        'stages': {stage['stage']: stage['wall_seconds'] for stage in report['stages']},
+        'stage_rows': {stage['stage']: stage['rows'] for stage in report['stages']},
+        'end_to_end': report['total']['wall_seconds'],
+        'peak_rss_bytes': report['total']['peak_rss_bytes'],
+    }
+
+
+def run_scale(n_rows: int, seed: int, repeat: int, max_xlsx_rows: int, sheet2_format: str) -> dict:
+    start = time.perf_counter()
+    dataset = generate_dataset(n_rows, seed)
+    generate_seconds = time.perf_counter() - start
+    streaming = n_rows > max_xlsx_rows
+    with tempfile.TemporaryDirectory(prefix='labor_time_bench_') as data_dir:
+        start = time.perf_counter()
+        cards_path = write_inputs(dataset, data_dir, cards_as_csv=streaming)
+        write_inputs_seconds = time.perf_counter() - start
+        kernels = time_kernels(dataset, data_dir, repeat)
+        end_to_end = run_end_to_end(cards_path, data_dir, streaming, sheet2_format)
+    return {
+        'rows': n_rows,
+        'mode': 'stream' if streaming else 'xlsx',
+        'generate_seconds': generate_seconds,
+        'write_inputs_seconds': write_inputs_seconds,
+        'kernels': kernels,
+        **end_to_end,
+    }
+
+
+def metrics(result: dict) -> dict:
+    """Flatten one scale's timings into {'kernels.sampling': seconds, ...} for comparison."""
+    flat = {f"kernels.{name}": value for name, value in result['kernels'].items()}
+    flat.update({f"stages.{name}": value for name, value in result['stages'].items()})
+    flat['end_to_end'] = result['end_to_end']
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print current vs baseline timings per scale and return the metrics that regressed."""
+    regressions = []
+    for scale, result in results['results'].items():
+        base = baseline.get('results', {}).get(scale)
+        if base is None:
+            print(f"[{scale} 行] 基线中无此规模，跳过比较")
+            continue
+        print(f"[{scale} 行] 与基线比较：")
+        base_metrics = metrics(base)
+        for name, value in metrics(result).items():
+            base_value = base_metrics.get(name)
+            if base_value is None:
+                continue
+            ratio = value / base_value if base_value else float('inf')
+            regressed = base_value >= NOISE_FLOOR_SECONDS and ratio > 1 + tolerance
+            flag = '  <-- 退化' if regressed else ''
+            print(f"  {name:<24} {base_value:>10.4f}s -> {value:>10.4f}s  x{ratio:.2f}{flag}")
+            if regressed:
+                regressions.append(f"{scale}:{name}")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="批次检验工时计算性能基准")
+    parser.add_argument("--scales", type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="检验卡行数（可多个，如 10000 100000 1000000 5000000）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子生成相同数据")
+    parser.add_argument("--repeat", type=int, default=3, help="内存中热点路径的重复次数，取最快一次")
+    parser.add_argument("--max-xlsx-rows", type=int, default=DEFAULT_MAX_XLSX_ROWS,
+                        help="超过该行数时检验卡写为 CSV 并以流式模式运行")
+    parser.add_argument("--sheet2-format", choices=('xlsx', 'csv', 'parquet'), default='xlsx',
+                        help="端到端运行时 Sheet2 的输出格式")
+    parser.add_argument("--output", default=None, help="将结果保存为 JSON（如 benchmarks/baseline.json）")
+    parser.add_argument("--compare", default=None, help="与该 JSON 基线比较，出现退化时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="允许的相对变慢比例，默认 0.25 即 25%%")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    results = {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': {},
+    }
+    for n_rows in args.scales:
+        print(f"[{n_rows} 行] 生成数据并运行……", flush=True)
+        result = run_scale(n_rows, args.seed, args.repeat, args.max_xlsx_rows, args.sheet2_format)
+        results['results'][str(n_rows)] = result
+        print(f"[{n_rows} 行] 端到端 {result['end_to_end']:.2f} 秒（{result['mode']}），"
+              + "，".join(f"{name} {seconds:.3f}s" for name, seconds in result['kernels'].items()), flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至 {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能退化：{', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
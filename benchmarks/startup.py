@@ -0,0 +1,89 @@
+"""Measure GUI cold start: interpreter start to the main window being rendered.
+
+Run from the repository root:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 10 --target 1.5
+
+Every run starts a fresh interpreter that imports main, creates the window and processes pending
+Tk events once, so the time includes Python start-up as on a shop PC. Without a display only the
+import of main is measured. The run fails (exit code 1) when the median exceeds --target or when
+pandas, numpy or an Excel engine was imported before the window appeared.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# 首屏目标（秒）：从启动解释器到主窗口渲染完成
+DEFAULT_TARGET_SECONDS = 1.0
+# 窗口显示前不应加载的模块
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'xlsxwriter', 'pyarrow', 'engine')
+
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import main
+result = {'import_seconds': time.perf_counter() - start}
+try:
+    import tkinter as tk
+    root = tk.Tk()
+except Exception:
+    root = None
+if root is not None:
+    app = main.BatchLaborTimeProcessor(root)
+    root.update()
+    result['window_seconds'] = time.perf_counter() - start
+    root.destroy()
+result['heavy_modules'] = [name for name in HEAVY_MODULES if name in sys.modules]
+print(json.dumps(result))
+'''
+
+
+def measure_once() -> dict:
+    """Start one interpreter, returning its probe result plus the wall time including Python start-up."""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{PROBE}"],
+                               capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = time.perf_counter() - start
+    return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="批次检验工时计算界面启动时间基准")
+    parser.add_argument("--repeat", type=int, default=5, help="启动次数，取中位数")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET_SECONDS,
+                        help="首屏时间目标（秒），中位数超过该值时退出码为 1")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    runs = [measure_once() for _ in range(args.repeat)]
+    has_window = all('window_seconds' in run for run in runs)
+    import_median = statistics.median(run['import_seconds'] for run in runs)
+    print(f"导入 main：中位数 {import_median:.3f} 秒")
+    if has_window:
+        window_median = statistics.median(run['window_seconds'] for run in runs)
+        print(f"主窗口显示（导入后）：中位数 {window_median:.3f} 秒")
+    # 无显示环境时进程时间只含解释器启动和导入，作为首屏时间的下限
+    first_screen = statistics.median(run['process_seconds'] for run in runs)
+    print(f"{'首屏' if has_window else '启动并导入'}（含解释器启动）：中位数 {first_screen:.3f} 秒，目标 {args.target:.3f} 秒"
+          + ("" if has_window else "（无显示环境，未创建窗口）"))
+
+    failures = []
+    heavy = sorted({name for run in runs for name in run['heavy_modules']})
+    if heavy:
+        failures.append(f"窗口显示前加载了 {', '.join(heavy)}")
+    if first_screen > args.target:
+        failures.append(f"首屏时间 {first_screen:.3f} 秒超过目标 {args.target:.3f} 秒")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
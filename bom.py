@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# BOM 连接键（已归一化）及连接到检验卡的列
+BOM_KEY_COLUMNS = ['Description', 'Operation/Activity N']
+BOM_VALUE_COLUMNS = ['Production Version', 'Setup Personal time', 'Labor time']
+# 未匹配 BOM 的位置
+NO_MATCH = -1
+
+
+class BomIndex:
+    """BOM rows compiled into an integer-coded index on (Description, Operation/Activity N).
+
+    matches holds the BOM value columns grouped by key, keeping BOM order within a key, so key k
+    owns rows starts[k]:starts[k] + counts[k] and its first match is matches.iloc[starts[k]]. The
+    time columns keep their numeric dtypes; unmatched keys are reported as position NO_MATCH
+    instead of being filled with a text placeholder.
+    """
+
+    def __init__(self, keys: pd.DataFrame, matches: pd.DataFrame):
+        self.keys = keys
+        self.matches = matches
+        self.starts = keys['start'].to_numpy()
+        self.counts = keys['count'].to_numpy()
+        self.index = pd.MultiIndex.from_frame(keys[BOM_KEY_COLUMNS])
+
+    @classmethod
+    def from_frame(cls, df_bom: pd.DataFrame) -> 'BomIndex':
+        """Compile a normalized, deduplicated BOM frame."""
+        codes, uniques = pd.MultiIndex.from_frame(df_bom[BOM_KEY_COLUMNS]).factorize()
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes, minlength=len(uniques))
+        keys = uniques.to_frame(index=False, name=BOM_KEY_COLUMNS)
+        keys['start'] = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        keys['count'] = counts.astype(np.int64)
+        matches = df_bom[BOM_VALUE_COLUMNS].iloc[order].reset_index(drop=True)
+        return cls(keys, matches)
+
+    def to_entry(self) -> dict:
+        """Return the frames to store in the reference cache."""
+        return {'bom_keys': self.keys, 'bom_matches': self.matches}
+
+    @classmethod
+    def from_entry(cls, entry: dict) -> 'BomIndex':
+        return cls(entry['bom_keys'], entry['bom_matches'])
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    def positions(self, routing: pd.Series, operation: pd.Series) -> np.ndarray:
+        """Return the key position of each (工艺编号, 工序号) pair, NO_MATCH where the BOM has none."""
+        return self.index.get_indexer(pd.MultiIndex.from_arrays([routing, operation]))
+
+    def multiplicity(self, positions: np.ndarray) -> np.ndarray:
+        """Return how many BOM rows match each position (1 for NO_MATCH, which keeps a single row)."""
+        return np.where(positions == NO_MATCH, 1, self.counts[positions])
+
+    def first_values(self, positions: np.ndarray) -> pd.DataFrame:
+        """Return the first matching BOM row's values for each position, NaN where unmatched."""
+        return self.take(np.where(positions == NO_MATCH, NO_MATCH, self.starts[positions]))
+
+    def expand(self, positions: np.ndarray) -> tuple[np.ndarray, pd.DataFrame]:
+        """Return (row, values): each input row repeated once per matching BOM row with that row's values.
+
+        This reproduces a left merge against the BOM, including the extra rows of one-to-many keys.
+        """
+        repeats = self.multiplicity(positions)
+        rows = np.repeat(np.arange(len(positions)), repeats)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        row_positions = positions[rows]
+        match_rows = np.where(row_positions == NO_MATCH, NO_MATCH, self.starts[row_positions] + offsets)
+        return rows, self.take(match_rows)
+
+    def take(self, match_rows: np.ndarray) -> pd.DataFrame:
+        """Return the values of the given match rows, NaN for NO_MATCH."""
+        matched = match_rows != NO_MATCH
+        if not len(self.matches):
+            return pd.DataFrame(np.nan, index=range(len(match_rows)), columns=BOM_VALUE_COLUMNS)
+        values = self.matches.iloc[np.where(matched, match_rows, 0)].reset_index(drop=True)
+        if not matched.all():
+            values.loc[~matched, :] = np.nan
+        return values
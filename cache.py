@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import pickle
+import uuid
+
+import pandas as pd
+
+# 归一化逻辑变化时递增，使旧缓存全部失效
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.batch_labor_time_cache')
+
+
+def file_fingerprint(file_path: str) -> dict:
+    """Return path, mtime, size and SHA-256 content hash of a file."""
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return {
+        'path': file_path,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': sha.hexdigest(),
+        'version': CACHE_VERSION,
+    }
+
+
+def _replace_atomic(tmp_path: str, final_path: str) -> None:
+    try:
+        os.replace(tmp_path, final_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_frame(directory: str, key: str, df: pd.DataFrame) -> str:
+    """Write df to directory as <key>.feather (or <key>.pkl as a fallback) and return the file name."""
+    tmp_path = os.path.join(directory, f"{key}.{uuid.uuid4().hex}.tmp")
+    try:
+        df.to_feather(tmp_path)
+        file_name = f"{key}.feather"
+    except (ImportError, ValueError, TypeError):
+        # pyarrow 不可用或存在混合类型列时退回 pickle
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        file_name = f"{key}.pkl"
+    _replace_atomic(tmp_path, os.path.join(directory, file_name))
+    return file_name
+
+
+def read_frame(file_path: str) -> pd.DataFrame:
+    """Read a frame written by write_frame."""
+    if file_path.endswith('.feather'):
+        return pd.read_feather(file_path)
+    with open(file_path, 'rb') as f:
+        return pickle.load(f)
+
+
+class ReferenceCache:
+    """On-disk columnar cache of normalized reference workbooks.
+
+    Each entry holds DataFrames (Arrow IPC / feather, pickle when pyarrow is unavailable or the
+    frame cannot be converted), dicts (stored as two-column frames) and plain JSON values. An
+    entry is only valid while the source workbook's fingerprint is unchanged.
+    """
+
+    def __init__(self, cache_dir: str | None = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+
+    def entry_dir(self, source_path: str, name: str) -> str:
+        path_key = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{name}-{path_key}")
+
+    def is_fresh(self, source_path: str, name: str, fingerprint: dict | None = None) -> bool:
+        """Return True if load would serve source_path from the cache, without reading the entry's frames."""
+        try:
+            with open(os.path.join(self.entry_dir(source_path, name), 'manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return manifest.get('fingerprint') == (fingerprint or file_fingerprint(source_path))
+
+    def load(self, source_path: str, name: str, fingerprint: dict | None = None) -> dict | None:
+        """Return the cached entry for source_path, or None if missing or stale."""
+        entry_dir = self.entry_dir(source_path, name)
+        manifest_path = os.path.join(entry_dir, 'manifest.json')
+        if not os.path.isfile(manifest_path):
+            return None
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('fingerprint') != (fingerprint or file_fingerprint(source_path)):
+                return None
+            entry = dict(manifest.get('values', {}))
+            for key, (kind, file_name) in manifest.get('items', {}).items():
+                df = read_frame(os.path.join(entry_dir, file_name))
+                entry[key] = dict(zip(df['key'].tolist(), df['value'].tolist())) if kind == 'dict' else df
+            return entry
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError, ImportError):
+            return None
+
+    def store(self, source_path: str, name: str, entry: dict, fingerprint: dict | None = None) -> None:
+        """Store DataFrames, dicts and JSON-serializable values for source_path.
+
+        Pass the fingerprint taken before parsing so that a workbook modified mid-parse is not
+        cached under its new fingerprint.
+        """
+        entry_dir = self.entry_dir(source_path, name)
+        os.makedirs(entry_dir, exist_ok=True)
+        items = {}
+        values = {}
+        for key, value in entry.items():
+            if isinstance(value, pd.DataFrame):
+                kind, df = 'frame', value.reset_index(drop=True)
+            elif isinstance(value, dict):
+                kind, df = 'dict', pd.DataFrame({'key': list(value.keys()), 'value': list(value.values())})
+            else:
+                values[key] = value.item() if hasattr(value, 'item') else value
+                continue
+            items[key] = (kind, write_frame(entry_dir, key, df))
+
+        manifest = {'fingerprint': fingerprint or file_fingerprint(source_path), 'items': items, 'values': values}
+        tmp_path = os.path.join(entry_dir, f"manifest.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        _replace_atomic(tmp_path, os.path.join(entry_dir, 'manifest.json'))
@@ -0,0 +1,157 @@
+import argparse
+import multiprocessing
+import sys
+
+from batch import run_batch
+from debuglog import DEFAULT_MAX_SAMPLE_ROWS, LEVEL_NAMES
+from engine import LaborTimeEngine
+from streaming import DEFAULT_CHUNK_SIZE
+from sweep import parse_batch_sizes
+from writer import SHEET2_FORMATS, format_write_stats
+
+
+def parse_batch_size(value: str) -> float:
+    """Parse and validate the --batch-size argument."""
+    try:
+        batch_size = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"批量大小必须是数字：{value}")
+    if batch_size <= 0:
+        raise argparse.ArgumentTypeError("批量大小必须是正数。")
+    return batch_size
+
+
+def parse_sweep(value: str) -> list[int]:
+    """Parse and validate the --sweep argument."""
+    try:
+        return parse_batch_sizes(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser for headless runs."""
+    parser = argparse.ArgumentParser(description="批次检验工时计算（无界面模式）")
+    parser.add_argument("input", help="检验卡文件路径 (.xlsx)；批量模式下为目录或通配符")
+    parser.add_argument("-o", "--output", required=True, help="输出文件路径 (.xlsx)；--per-file 时为输出目录")
+    parser.add_argument("-b", "--batch-size", type=parse_batch_size, default=None,
+                        help="批量大小，留空将使用历史开单批次大小的中位数")
+    parser.add_argument("--data-dir", default=None,
+                        help="batch_num.xlsx / database.xlsx / BOM.xlsx 所在目录，默认为程序目录")
+    parser.add_argument("--cache-dir", default=None, help="参考数据缓存目录，默认为 ~/.batch_labor_time_cache")
+    parser.add_argument("--no-cache", action="store_true", help="不使用参考数据缓存，每次重新解析 Excel")
+    parser.add_argument("--tool-hours-version", default=None, metavar="VERSION",
+                        help="使用指定的量具工时版本：版本名（如 v3）或日期/时间（如 2026-03-01，取当时生效的版本），"
+                             "用于复现历史结果；默认使用当前 database.xlsx 对应的版本")
+    parser.add_argument("--tool-hours-dir", default=None,
+                        help="量具工时版本库目录，默认位于参考数据缓存目录中（--no-cache 时不保存版本）")
+    parser.add_argument("--sampling-plan", default=None, metavar="PLAN",
+                        help="抽样方案：已注册的方案名称或方案数据文件 (.csv/.xlsx) 路径，默认使用内置 AQL 抽样表；方案文件格式见 README")
+    parser.add_argument("--serial-load", action="store_true",
+                        help="依次读取输入文件；默认在需要解析的文件不少于两个时多进程并行读取")
+    parser.add_argument("--sheet2-format", choices=SHEET2_FORMATS, default='xlsx',
+                        help="Sheet2 输出格式：xlsx 写入输出工作簿；csv / parquet 另存为 <输出文件名>_Sheet2.<格式>")
+    parser.add_argument("--log-level", choices=LEVEL_NAMES, default='debug',
+                        help="DebugInfo 最低记录级别：debug（分布信息）/ info / warning / error，低于该级别的条目只计数")
+    parser.add_argument("--max-sample-rows", type=int, default=DEFAULT_MAX_SAMPLE_ROWS,
+                        help="每条警告在 DebugInfo 中最多显示的记录行数")
+    parser.add_argument("--debug-rows", default=None,
+                        help="将警告涉及的完整记录另存为 .jsonl 或 .parquet 文件（仅在出现警告时生成；批量模式下汇总所有文件的记录并增加“源文件”字段）")
+    parser.add_argument("--profile", action="store_true",
+                        help="记录各阶段墙钟时间、CPU 时间、内存和行数，输出 Timings 工作表并打印到命令行（批量模式不支持）")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="同时使用 tracemalloc 统计各阶段内存分配（会明显变慢），隐含 --profile")
+    parser.add_argument("--profile-json", default=None, help="将阶段统计另存为 JSON 报告，隐含 --profile")
+    parser.add_argument("--snapshot", metavar="SNAPSHOT_DIR", default=None,
+                        help="将本次的 Sheet1 另存为列式快照（覆盖目录中已有的快照），可用 delta.py 比较两次运行（批量和扫描模式不支持）")
+    parser.add_argument("--incremental", metavar="STATE_DIR", default=None,
+                        help="增量模式：与 STATE_DIR 中上次运行的状态比较，只重新计算新增或变更的检验卡")
+    parser.add_argument("--sweep", type=parse_sweep, default=None, metavar="SIZES",
+                        help="批量扫描：一次计算多个批量大小下的单件工时曲线，如 50,100,200 或 10:1000:10（含终点），"
+                             "输出曲线表、批量汇总和曲线图")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式模式：分块读取超大检验卡文件 (.xlsx/.csv)，Sheet2 另存为旁路文件（默认 CSV）")
+    parser.add_argument("--chunk-size", type=int, default=None, help=f"流式模式每块行数，默认 {DEFAULT_CHUNK_SIZE}")
+    parser.add_argument("--batch", action="store_true",
+                        help="批量模式：将 input 视为目录或通配符（如 'cards/*.xlsx'），多进程处理多个检验卡文件")
+    parser.add_argument("--per-file", action="store_true", help="批量模式下每个输入文件单独输出一个工作簿")
+    parser.add_argument("--workers", type=int, default=None, help="批量模式的进程数，默认为 CPU 核数")
+    return parser
+
+
+def main_batch(args: argparse.Namespace) -> int:
+    """Run batch mode and print the per-file summary."""
+    try:
+        summary = run_batch(args.input, args.output, args.batch_size, per_file=args.per_file,
+                            max_workers=args.workers, data_dir=args.data_dir, cache_dir=args.cache_dir,
+                            use_cache=not args.no_cache, sheet2_format=args.sheet2_format,
+                            log_level=LEVEL_NAMES[args.log_level], max_sample_rows=args.max_sample_rows,
+                            tool_hours_version=args.tool_hours_version, tool_hours_dir=args.tool_hours_dir,
+                            sampling_plan=args.sampling_plan, debug_rows_path=args.debug_rows,
+                            parallel_load=not args.serial_load)
+    except Exception as e:
+        print(f"错误：批量处理失败：{e}", file=sys.stderr)
+        return 1
+
+    for row in summary.itertuples(index=False):
+        line = f"[{row.状态}] {row.源文件}"
+        print(line if row.状态 == '成功' else f"{line}：{row.错误信息}")
+    failed = int((summary['状态'] != '成功').sum())
+    print(f"共 {len(summary)} 个文件，成功 {len(summary) - failed} 个，失败 {failed} 个，结果已保存至 {args.output}")
+    return 1 if failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.batch:
+        unsupported = [flag for flag, value in (('--profile', args.profile), ('--profile-memory', args.profile_memory),
+                                                ('--profile-json', args.profile_json), ('--snapshot', args.snapshot),
+                                                ('--sweep', args.sweep), ('--incremental', args.incremental),
+                                                ('--stream', args.stream), ('--chunk-size', args.chunk_size is not None))
+                       if value]
+        if unsupported:
+            print(f"错误：批量模式不支持 {'、'.join(unsupported)}。", file=sys.stderr)
+            return 1
+        return main_batch(args)
+    allowed_extensions = ('.xlsx', '.csv') if args.stream else ('.xlsx',)
+    if not args.input.lower().endswith(allowed_extensions):
+        print(f"错误：文件必须是 {' / '.join(allowed_extensions)} 格式。", file=sys.stderr)
+        return 1
+
+    chunk_size = DEFAULT_CHUNK_SIZE if args.chunk_size is None else args.chunk_size
+    engine = LaborTimeEngine(data_dir=args.data_dir, cache_dir=args.cache_dir, use_cache=not args.no_cache,
+                             sheet2_format=args.sheet2_format, log_level=LEVEL_NAMES[args.log_level],
+                             max_sample_rows=args.max_sample_rows, debug_rows_path=args.debug_rows,
+                             profile=args.profile or bool(args.profile_json), profile_memory=args.profile_memory,
+                             parallel_load=not args.serial_load, tool_hours_version=args.tool_hours_version,
+                             tool_hours_dir=args.tool_hours_dir, snapshot_dir=args.snapshot,
+                             sampling_plan=args.sampling_plan)
+    if args.sweep:
+        success, result = engine.process_data_sweep(args.input, args.sweep, args.output)
+    elif args.incremental:
+        success, result = engine.process_data_incremental(args.input, args.batch_size, args.output, args.incremental)
+    elif args.stream:
+        success, result = engine.process_data_streaming(args.input, args.batch_size, args.output, chunk_size)
+    else:
+        success, result, _, _ = engine.process_data(args.input, args.batch_size, args.output)
+    if engine.profiler is not None:
+        print(engine.profiler.to_frame().to_string(index=False))
+        if args.profile_json:
+            engine.profiler.write_json(args.profile_json, input=args.input, output=args.output, stream=args.stream,
+                                       chunk_size=chunk_size if args.stream else None, success=success)
+    if not success:
+        print(result, file=sys.stderr)
+        for entry in engine.debug_info:
+            if entry['类别'] == '错误':
+                print(entry['信息'], file=sys.stderr)
+        return 1
+
+    for stats in engine.write_stats:
+        print(format_write_stats(stats))
+    print(f"处理完成，结果已保存至 {result}")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from benchmarks.generators import generate_dataset
+from benchmarks.run import write_inputs
+
+
+@pytest.fixture
+def dataset():
+    """A small seeded dataset whose inspection cards have blank 工序号 and 工艺编号 cells."""
+    data = generate_dataset(400, seed=1)
+    cards = data['cards']
+    cards['工序号'] = cards['工序号'].astype(float)
+    cards.loc[cards.index[::37], '工序号'] = np.nan
+    cards.loc[cards.index[5::53], '工艺编号'] = np.nan
+    return data
+
+
+@pytest.fixture
+def data_dir(tmp_path, dataset):
+    """A data directory holding the reference workbooks and the cards as whole_rawdata.xlsx."""
+    write_inputs(dataset, str(tmp_path), cards_as_csv=False)
+    return str(tmp_path)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import Counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# DebugInfo 类别按严重程度排序，低于最低级别的条目只计数不保存
+DEBUG_LEVELS = {'分布信息': 10, '信息': 20, '警告': 30, '错误': 40}
+# 命令行使用的级别名称
+LEVEL_NAMES = {'debug': '分布信息', 'info': '信息', 'warning': '警告', 'error': '错误'}
+DEFAULT_MAX_SAMPLE_ROWS = 20
+DEFAULT_MAX_ENTRIES = 5000
+
+
+class DebugRowsSidecar:
+    """Lazily created JSONL or Parquet file receiving the full row sets behind row warnings.
+
+    Nothing is created until the first row set arrives. Each row is stored with the timestamp,
+    category and message of its warning; Parquet stores the row itself as a JSON string so that
+    warnings with different columns share one schema. A deferred sidecar (in a loader or batch
+    worker) only keeps its row sets in pending; the log it is merged into writes them to its own file.
+    """
+
+    def __init__(self, file_path: str, deferred: bool = False):
+        self.file_path = file_path
+        self.format = 'parquet' if file_path.lower().endswith('.parquet') else 'jsonl'
+        self.rows_written = 0
+        self.writer = None
+        self.deferred = deferred
+        self.pending = []
+
+    def write(self, timestamp: str, category: str, message: str, rows: pd.DataFrame) -> None:
+        if self.deferred:
+            self.pending.append((timestamp, category, message, rows))
+            return
+        lines = rows.to_json(orient='records', lines=True, force_ascii=False, date_format='iso').splitlines()
+        if self.format == 'parquet':
+            self._write_parquet(timestamp, category, message, lines)
+        else:
+            prefix = json.dumps({'时间戳': timestamp, '类别': category, '信息': message}, ensure_ascii=False)[:-1]
+            with open(self.file_path, 'w' if self.rows_written == 0 else 'a', encoding='utf-8') as f:
+                for line in lines:
+                    f.write(f"{prefix}, \"记录\": {line}}}\n")
+        self.rows_written += len(lines)
+
+    def _write_parquet(self, timestamp: str, category: str, message: str, lines: list) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            schema = pa.schema([(col, pa.string()) for col in ('时间戳', '类别', '信息', '记录')])
+            self.writer = pq.ParquetWriter(self.file_path, schema)
+        count = len(lines)
+        self.writer.write_table(pa.table({'时间戳': [timestamp] * count, '类别': [category] * count,
+                                          '信息': [message] * count, '记录': lines}, schema=self.writer.schema))
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class DebugLog(list):
+    """The debug_info list with a level filter, per-category counters and bounded row samples.
+
+    Entries keep the {'时间戳', '类别', '信息'} shape, so existing append/extend callers work unchanged.
+    Every entry is counted by category, but only entries at or above min_level are kept, and at most
+    max_entries of them. log_rows puts at most max_sample_rows rows into the message and sends the full
+    row set to the optional sidecar file (kept until merged with defer_rows, see DebugRowsSidecar).
+    """
+
+    def __init__(self, min_level: str = '分布信息', max_sample_rows: int = DEFAULT_MAX_SAMPLE_ROWS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, rows_path: str | None = None, defer_rows: bool = False):
+        super().__init__()
+        if min_level not in DEBUG_LEVELS:
+            raise ValueError(f"未知的日志级别：{min_level}")
+        self.min_level = min_level
+        self.max_sample_rows = max_sample_rows
+        self.max_entries = max_entries
+        self.counts = Counter()
+        self.filtered = 0
+        self.dropped = 0
+        self.sidecar = DebugRowsSidecar(rows_path, defer_rows) if rows_path else None
+
+    def append(self, entry: dict) -> None:
+        category = entry.get('类别')
+        self.counts[category] += 1
+        if DEBUG_LEVELS.get(category, DEBUG_LEVELS['信息']) < DEBUG_LEVELS[self.min_level]:
+            self.filtered += 1
+        elif len(self) >= self.max_entries:
+            self.dropped += 1
+        else:
+            super().append(entry)
+
+    def extend(self, entries) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def merge(self, other: 'DebugLog', **fields) -> None:
+        """Add the kept entries of another log, tagged with fields, together with its counters.
+
+        Row sets the other log deferred go to this log's sidecar, with fields added as columns.
+        """
+        if other.sidecar is not None and other.sidecar is not self.sidecar and other.sidecar.pending:
+            if self.sidecar is not None:
+                for timestamp, category, message, rows in other.sidecar.pending:
+                    self.sidecar.write(timestamp, category, message, rows.assign(**fields) if fields else rows)
+            other.sidecar.pending = []
+        for entry in other:
+            if len(self) >= self.max_entries:
+                self.dropped += 1
+            else:
+                super().append({**entry, **fields})
+        self.counts.update(other.counts)
+        self.filtered += other.filtered
+        self.dropped += other.dropped
+
+    def keeps(self, category: str) -> bool:
+        """Return True if entries of category are kept rather than only counted."""
+        return DEBUG_LEVELS.get(category, DEBUG_LEVELS['信息']) >= DEBUG_LEVELS[self.min_level]
+
+    def child(self) -> 'DebugLog':
+        """Return an empty log with the same level, limits and sidecar, for entries to be merged back later."""
+        log = DebugLog(self.min_level, self.max_sample_rows, self.max_entries)
+        log.sidecar = self.sidecar
+        return log
+
+    def log_rows(self, timestamp: str, category: str, message: str, rows: pd.DataFrame) -> None:
+        """Log a warning about rows, embedding only the first max_sample_rows of them."""
+        if not self.keeps(category):
+            self.append({'时间戳': timestamp, '类别': category, '信息': message})
+            return
+        text = f"{message}\n{rows.head(self.max_sample_rows).to_string(index=False)}"
+        if len(rows) > self.max_sample_rows:
+            text += f"\n……共 {len(rows)} 行，仅显示前 {self.max_sample_rows} 行"
+            if self.sidecar is not None:
+                text += f"，完整记录见 {os.path.basename(self.sidecar.file_path)}"
+        if self.sidecar is not None:
+            self.sidecar.write(timestamp, category, message, rows)
+        self.append({'时间戳': timestamp, '类别': category, '信息': text})
+
+    def log_values(self, timestamp: str, category: str, message: str, values) -> None:
+        """Log a list of values, embedding only the first max_sample_rows of them."""
+        values = list(values)
+        text = f"{message}{values[:self.max_sample_rows]}"
+        if len(values) > self.max_sample_rows:
+            text += f"（共 {len(values)} 个，仅显示前 {self.max_sample_rows} 个）"
+        self.append({'时间戳': timestamp, '类别': category, '信息': text})
+
+    def summary(self) -> str:
+        counts = '，'.join(f"{category} {count}" for category, count in self.counts.items())
+        text = f"各类别条目数：{counts or '无'}"
+        if self.filtered:
+            text += f"；低于级别 {self.min_level} 未保存 {self.filtered} 条"
+        if self.dropped:
+            text += f"；超过 {self.max_entries} 条上限未保存 {self.dropped} 条"
+        return text
+
+    def to_frame(self, timestamp: str) -> pd.DataFrame:
+        """Return the kept entries followed by a summary row with the per-category counters."""
+        import pandas as pd
+
+        return pd.DataFrame([*self, {'时间戳': timestamp, '类别': '统计', '信息': self.summary()}])
+
+    def close(self) -> None:
+        if self.sidecar is not None:
+            self.sidecar.close()
+
+    @property
+    def rows_path(self) -> str | None:
+        return self.sidecar.file_path if self.sidecar is not None else None
+
+    def __reduce__(self):
+        # 批量模式下日志需跨进程传回；先恢复属性再填充条目，且不重复计数
+        return _rebuild_debug_log, (list(self), self.__dict__)
+
+
+def _rebuild_debug_log(entries: list, state: dict) -> DebugLog:
+    log = DebugLog.__new__(DebugLog)
+    log.__dict__.update(state)
+    list.extend(log, entries)
+    return log
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# 检验卡去重键：每个（工艺编号, 工序号）只保留第一行
+TEST_DEDUP_COLUMNS = ['工艺编号', '工序号']
+# BOM 去重键
+BOM_DEDUP_COLUMNS = ['Material', 'Production Version', 'Description', 'Operation/Activity N', 'Operation short text',
+                     'Setup Personal time', 'Labor time']
+# 重复报告中键列之后的列
+REPORT_COLUMNS = ['出现次数', '首行序号', '内容不同行数']
+
+
+def hash_keys(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Return a uint64 hash per row of the given columns.
+
+    Categorical and repeated text columns are hashed per distinct value, and a value hashes the
+    same in every frame, so hashes of separate chunks can be compared.
+    """
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+class KeyDeduplicator:
+    """Keep the first row of each key, hashing the key columns once for detection, dropping and reporting.
+
+    keep_mask() may be called on successive chunks of one file (across_chunks=True): a key kept in
+    an earlier chunk is dropped from later ones. The report lists each repeated key once with its
+    total number of rows, the 1-based position of the kept row among all rows passed in, and how
+    many of the dropped rows differ from the kept row in any column. Rows sharing a hash within a
+    frame are checked to hold equal keys; on a collision that frame falls back to exact matching.
+    With report=False only the row counts are kept, which skips hashing the duplicate rows' contents.
+    """
+
+    def __init__(self, key_columns: list, across_chunks: bool = False, report: bool = True):
+        self.key_columns = list(key_columns)
+        self.across_chunks = across_chunks
+        self.keep_report = report
+        self.rows_seen = 0
+        self.kept_rows = 0
+        self.collisions = 0
+        self.pieces = []
+        # 分块去重时已保留的键（按键哈希索引），记录报告时另存保留行的内容哈希和首行序号
+        self.kept = pd.DataFrame(index=pd.Index([], dtype=np.uint64))
+
+    def keep_mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Return a boolean mask of the rows of df to keep (first occurrence of each key) and record the duplicates."""
+        hashes = hash_keys(df, self.key_columns)
+        codes, uniques = pd.factorize(hashes)
+        first_rows = self.first_rows(codes)
+        counts = np.bincount(codes, minlength=len(uniques))
+        collided = self.count_collisions(df, codes, first_rows, counts)
+        if collided:
+            self.collisions += collided
+            # sort=False 时组号同样按首次出现顺序编号
+            codes = df.groupby(self.key_columns, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+            first_rows = self.first_rows(codes)
+            counts = np.bincount(codes, minlength=len(first_rows))
+            uniques = hashes[first_rows]
+
+        earlier = np.zeros(len(first_rows), dtype=bool)
+        earlier_at = np.full(len(first_rows), -1)
+        if self.across_chunks and len(self.kept):
+            earlier_at = self.kept.index.get_indexer(uniques)
+            earlier = earlier_at >= 0
+        keep = np.zeros(len(df), dtype=bool)
+        keep[first_rows[~earlier]] = True
+
+        kept = {}
+        if self.keep_report:
+            kept = self.record_duplicates(df, codes, uniques, first_rows, counts, keep, earlier, earlier_at)
+        if self.across_chunks and not earlier.all():
+            # 哈希冲突时不同的键可能共用一个哈希，索引中只保留第一个
+            new = ~earlier & ~pd.Index(uniques).duplicated()
+            added = pd.DataFrame({name: values[new] for name, values in kept.items()}, index=uniques[new])
+            self.kept = pd.concat([self.kept, added]) if len(self.kept) else added
+        self.rows_seen += len(df)
+        self.kept_rows += int(keep.sum())
+        return keep
+
+    def record_duplicates(self, df: pd.DataFrame, codes: np.ndarray, uniques: np.ndarray, first_rows: np.ndarray,
+                          counts: np.ndarray, keep: np.ndarray, earlier: np.ndarray, earlier_at: np.ndarray) -> dict:
+        """Add the repeated keys of one frame to the report and return the content hash and position of each key's kept row."""
+        reported = (counts > 1) | earlier
+        content_rows = np.flatnonzero(reported[codes] | (keep if self.across_chunks else False))
+        contents = np.zeros(len(df), dtype=np.uint64)
+        if len(content_rows):
+            contents[content_rows] = pd.util.hash_pandas_object(df.iloc[content_rows], index=False).to_numpy()
+        kept_contents = contents[first_rows]
+        kept_positions = self.rows_seen + first_rows + 1
+        if earlier.any():
+            kept_contents[earlier] = self.kept['content'].to_numpy()[earlier_at[earlier]]
+            kept_positions[earlier] = self.kept['position'].to_numpy()[earlier_at[earlier]]
+
+        if reported.any():
+            dropped = ~keep
+            differs = dropped & (contents != kept_contents[codes])
+            keys = np.flatnonzero(reported)
+            piece = df[self.key_columns].iloc[first_rows[keys]].reset_index(drop=True)
+            piece = piece.astype({col: object for col in self.key_columns})
+            piece['key_hash'] = uniques[keys]
+            piece['删除行数'] = np.bincount(codes[dropped], minlength=len(first_rows))[keys]
+            piece['首行序号'] = kept_positions[keys]
+            piece['内容不同行数'] = np.bincount(codes[differs], minlength=len(first_rows))[keys]
+            self.pieces.append(piece)
+        return {'content': kept_contents, 'position': kept_positions}
+
+    @staticmethod
+    def first_rows(codes: np.ndarray) -> np.ndarray:
+        """Return the row of each code's first occurrence, for codes numbered in order of first appearance."""
+        # 编号按首次出现顺序递增，某行是该编号的首行当且仅当它大于之前所有编号
+        is_first = codes > np.maximum.accumulate(np.concatenate([[-1], codes[:-1]]))
+        return np.flatnonzero(is_first)
+
+    def count_collisions(self, df: pd.DataFrame, codes: np.ndarray, first_rows: np.ndarray,
+                         counts: np.ndarray) -> int:
+        """Return the number of rows whose key differs from the first row sharing its hash."""
+        rows = np.flatnonzero(counts[codes] > 1)
+        if not len(rows):
+            return 0
+        firsts = first_rows[codes[rows]]
+        differs = np.zeros(len(rows), dtype=bool)
+        for col in self.key_columns:
+            # 按列编码比较，缺失值编码相同
+            values = df[col]
+            value_codes = values.cat.codes.to_numpy() if isinstance(values.dtype, pd.CategoricalDtype) \
+                else pd.factorize(values)[0]
+            differs |= value_codes[rows] != value_codes[firsts]
+        return int(differs.sum())
+
+    @property
+    def dropped_rows(self) -> int:
+        return self.rows_seen - self.kept_rows
+
+    def report(self) -> pd.DataFrame:
+        """Return one row per repeated key: the key columns and REPORT_COLUMNS, most repeated keys first."""
+        if not self.pieces:
+            return pd.DataFrame(columns=self.key_columns + REPORT_COLUMNS)
+        pieces = pd.concat(self.pieces, ignore_index=True)
+        aggregations = {**{col: 'first' for col in self.key_columns},
+                        '删除行数': 'sum', '首行序号': 'min', '内容不同行数': 'sum'}
+        report = pieces.groupby('key_hash', sort=False).agg(aggregations).reset_index(drop=True)
+        report['出现次数'] = report.pop('删除行数') + 1
+        report = report[self.key_columns + REPORT_COLUMNS]
+        return report.sort_values(['出现次数', '首行序号'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+    def summary(self, label: str) -> str:
+        text = (f"{label}去重（按 {', '.join(self.key_columns)}）：共 {self.rows_seen} 行，保留 {self.kept_rows} 行，"
+                f"删除 {self.dropped_rows} 行重复记录")
+        if self.pieces:
+            report = self.report()
+            text += f"，涉及 {len(report)} 个键，其中 {int((report['内容不同行数'] > 0).sum())} 个键的重复行内容与保留行不同"
+        if self.collisions:
+            text += f"；发现 {self.collisions} 行哈希冲突，已改为逐列比较"
+        return text
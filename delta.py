@@ -0,0 +1,267 @@
+"""Run snapshots of Sheet1 and the delta report between two of them.
+
+A snapshot keeps one run's Sheet1 as a compact columnar frame (key columns as text categories,
+hours as float64, a 64-bit key hash per operation) next to a small manifest.json, so comparing
+two runs never re-reads an output workbook. Sheet1 rows sharing one operation key are summed into
+a single snapshot row, so removing one of them shows up as a change of that operation only. Compare two snapshots from the repository root:
+
+    python delta.py 上月快照目录 本月快照目录 -o 工时差异.xlsx
+
+Only added, removed and changed operations are written; a 差异 sheet too large for xlsx is saved
+as a CSV file next to the workbook.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from cache import _replace_atomic, read_frame, write_frame
+from writer import XLSX_MAX_ROWS, fits_xlsx, format_write_stats, write_stats, write_workbook
+
+# 快照格式变化时递增，旧快照需重新生成（2：同一工序的多行合并为一行）
+SNAPSHOT_VERSION = 2
+# 一个工序（Sheet1 中的一行）
+DELTA_KEY_COLUMNS = ['产品编码', '检验卡编号', '版本', '工艺编号', '工序号', '工序名称']
+# 比较的工时列
+DELTA_VALUE_COLUMNS = ['变更后Setup Personal time批量准备工时', '变更后Labor time单件工时', '批次工时']
+# 快照中另外保存、在差异表中一并列出的列
+CONTEXT_COLUMNS = ['批次大小']
+# 工时差的绝对值不超过该值视为未变更（批次工时未取整，避免浮点误差）
+DEFAULT_TOLERANCE = 1e-6
+# 差异表中变更类型的顺序
+CHANGE_TYPES = ['新增', '删除', '变更']
+# 缺失的键值参与哈希时使用的值
+MISSING_KEY_HASH = np.uint64(0)
+
+
+def text_categorical(values: pd.Series) -> pd.Categorical:
+    """Return values as a categorical of their text form, so 10 and '10' are the same key; missing stays missing.
+
+    Only the distinct values are converted to text.
+    """
+    codes, uniques = pd.factorize(values)
+    label_codes, categories = pd.factorize(pd.Index(uniques).astype(str))
+    return pd.Categorical.from_codes(np.append(label_codes, -1)[codes], categories=categories)
+
+
+def key_hashes(keys: pd.DataFrame) -> np.ndarray:
+    """Return a uint64 hash per row of the text-categorical key columns of a snapshot.
+
+    Each column's categories are hashed once and gathered by code.
+    """
+    parts = {}
+    for col in DELTA_KEY_COLUMNS:
+        values = keys[col].cat
+        category_hashes = pd.util.hash_array(values.categories.to_numpy(dtype=object))
+        parts[col] = np.append(category_hashes, MISSING_KEY_HASH)[values.codes.to_numpy()]
+    return pd.util.hash_pandas_object(pd.DataFrame(parts), index=False).to_numpy()
+
+
+def merge_repeated_keys(frame: pd.DataFrame) -> pd.DataFrame:
+    """Return frame with the rows of each repeated operation key merged into the key's first row.
+
+    Hours are summed (missing only when missing in every row) and the context columns keep their
+    first value. Matching repeated keys by their position instead would report every later
+    repetition as changed once an earlier one disappears.
+    """
+    if not frame.duplicated(DELTA_KEY_COLUMNS).any():
+        return frame
+    grouped = frame.groupby(DELTA_KEY_COLUMNS, observed=True, dropna=False, sort=False)
+    merged = pd.concat([grouped[DELTA_VALUE_COLUMNS].sum(min_count=1), grouped[CONTEXT_COLUMNS].first()], axis=1)
+    return merged.reset_index()
+
+
+def snapshot_frame(sheet1_data: pd.DataFrame) -> pd.DataFrame:
+    """Return the compact frame saved for a Sheet1: key hash, key columns as text categories and hours.
+
+    Rows sharing one operation key are merged (see merge_repeated_keys), so every key hash is unique.
+    """
+    frame = pd.DataFrame({col: text_categorical(sheet1_data[col]) for col in DELTA_KEY_COLUMNS})
+    for col in DELTA_VALUE_COLUMNS + CONTEXT_COLUMNS:
+        frame[col] = pd.to_numeric(sheet1_data[col], errors='coerce').to_numpy(dtype=float)
+    frame = merge_repeated_keys(frame)
+    frame.insert(0, 'key_hash', key_hashes(frame))
+    return frame
+
+
+def save_snapshot(snapshot_dir: str, sheet1_data: pd.DataFrame, **metadata) -> dict:
+    """Save sheet1_data as a snapshot in snapshot_dir, replacing any snapshot there, and return its write statistics.
+
+    metadata (creation time, output file, tool-hours version, ...) is kept in the manifest and
+    shown in the delta report.
+    """
+    start = time.perf_counter()
+    os.makedirs(snapshot_dir, exist_ok=True)
+    frame = snapshot_frame(sheet1_data)
+    # 文件名带随机后缀，清单替换前旧快照保持可读
+    file_name = write_frame(snapshot_dir, f"sheet1.{uuid.uuid4().hex[:8]}", frame)
+    manifest_path = os.path.join(snapshot_dir, 'manifest.json')
+    previous = read_manifest(snapshot_dir)
+    manifest = {'version': SNAPSHOT_VERSION, 'file': file_name, 'rows': len(frame), **metadata}
+    tmp_path = os.path.join(snapshot_dir, f"manifest.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    _replace_atomic(tmp_path, manifest_path)
+    if previous and previous.get('file') not in (None, file_name):
+        try:
+            os.remove(os.path.join(snapshot_dir, previous['file']))
+        except OSError:
+            pass
+    file_path = os.path.join(snapshot_dir, file_name)
+    return write_stats(file_path, len(frame), time.perf_counter() - start)
+
+
+def read_manifest(snapshot_dir: str) -> dict | None:
+    try:
+        with open(os.path.join(snapshot_dir, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(snapshot_dir: str) -> tuple[pd.DataFrame, dict]:
+    """Return (frame, manifest) of the snapshot in snapshot_dir."""
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        raise ValueError(f"{snapshot_dir} 不是工时快照目录（缺少 manifest.json）")
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"{snapshot_dir} 的快照格式版本为 {manifest.get('version')}，"
+                         f"当前为 {SNAPSHOT_VERSION}，请重新运行计算生成快照")
+    return read_frame(os.path.join(snapshot_dir, manifest['file'])), manifest
+
+
+def take_keys(frame: pd.DataFrame, rows: np.ndarray) -> dict:
+    return {col: np.asarray(frame[col].array.take(rows), dtype=object) for col in DELTA_KEY_COLUMNS}
+
+
+def diff_snapshots(previous: pd.DataFrame, current: pd.DataFrame,
+                   tolerance: float = DEFAULT_TOLERANCE) -> pd.DataFrame:
+    """Return the added, removed and changed operations between two snapshot frames.
+
+    The snapshots are joined on their key hashes through a hash index. An operation has changed
+    when any of DELTA_VALUE_COLUMNS moved by more than tolerance or became (or stopped being)
+    missing. Each value column appears as 上次 / 本次 / 差值, the missing side of an added or
+    removed operation counting as 0 in the difference. Rows are grouped by CHANGE_TYPES, in
+    Sheet1 order within each group (the previous snapshot's order for removed operations).
+    """
+    matched = pd.Index(previous['key_hash'].to_numpy()).get_indexer(current['key_hash'].to_numpy())
+    found = matched >= 0
+    kept = np.zeros(len(previous), dtype=bool)
+    kept[matched[found]] = True
+
+    previous_values = previous[DELTA_VALUE_COLUMNS].to_numpy()[matched[found]]
+    current_values = current[DELTA_VALUE_COLUMNS].to_numpy()[found]
+    previous_missing, current_missing = np.isnan(previous_values), np.isnan(current_values)
+    moved = np.abs(np.nan_to_num(current_values) - np.nan_to_num(previous_values)) > tolerance
+    changed = np.flatnonzero(found)[(moved | (previous_missing != current_missing)).any(axis=1)]
+
+    added = np.flatnonzero(~found)
+    removed = np.flatnonzero(~kept)
+    parts = [
+        ('新增', take_keys(current, added), None, added),
+        ('删除', take_keys(previous, removed), removed, None),
+        ('变更', take_keys(current, changed), matched[changed], changed),
+    ]
+    frames = []
+    for change_type, keys, previous_rows, current_rows in parts:
+        rows = len(current_rows if current_rows is not None else previous_rows)
+        frame = pd.DataFrame({'变更类型': np.full(rows, change_type, dtype=object), **keys})
+        for col in CONTEXT_COLUMNS + DELTA_VALUE_COLUMNS:
+            before = previous[col].to_numpy()[previous_rows] if previous_rows is not None else np.full(rows, np.nan)
+            after = current[col].to_numpy()[current_rows] if current_rows is not None else np.full(rows, np.nan)
+            frame[f"上次{col}"] = before
+            frame[f"本次{col}"] = after
+            if col in DELTA_VALUE_COLUMNS:
+                frame[f"{col}差值"] = np.round(np.nan_to_num(after) - np.nan_to_num(before), 6)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_delta(delta: pd.DataFrame, previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """Return the operation count and summed differences per change type, then the totals of both snapshots."""
+    difference_columns = [f"{col}差值" for col in DELTA_VALUE_COLUMNS]
+    grouped = delta.groupby('变更类型', sort=False)
+    counts = grouped.size().reindex(CHANGE_TYPES, fill_value=0)
+    sums = grouped[difference_columns].sum().reindex(CHANGE_TYPES, fill_value=0.0)
+    summary = pd.DataFrame({'项目': CHANGE_TYPES, '工序数': counts.to_numpy()})
+    for col, difference in zip(DELTA_VALUE_COLUMNS, difference_columns):
+        summary[col] = sums[difference].round(6).to_numpy()
+    totals = pd.DataFrame([{'项目': label, '工序数': len(frame), **frame[DELTA_VALUE_COLUMNS].sum().round(6)}
+                           for label, frame in (('上次合计', previous), ('本次合计', current))])
+    return pd.concat([summary, totals], ignore_index=True)
+
+
+def snapshot_info(previous_manifest: dict, current_manifest: dict) -> pd.DataFrame:
+    """Return the two manifests side by side, one metadata field per row."""
+    fields = [key for key in dict.fromkeys([*previous_manifest, *current_manifest]) if key != 'file']
+    return pd.DataFrame({'项目': fields,
+                         '上次': [previous_manifest.get(key) for key in fields],
+                         '本次': [current_manifest.get(key) for key in fields]}).astype({'上次': str, '本次': str})
+
+
+def delta_csv_path(output_file_path: str) -> str:
+    """Return the CSV file used for the 差异 sheet when it does not fit in the workbook."""
+    return f"{os.path.splitext(output_file_path)[0]}_差异.csv"
+
+
+def write_delta(previous_dir: str, current_dir: str, output_file_path: str,
+                tolerance: float = DEFAULT_TOLERANCE) -> tuple[pd.DataFrame, list]:
+    """Diff the snapshots in previous_dir and current_dir and write the delta workbook.
+
+    A 差异 sheet beyond the xlsx row limit is written to delta_csv_path instead. Returns the
+    per-type summary and the write statistics of every file written, the workbook last.
+    """
+    previous, previous_manifest = load_snapshot(previous_dir)
+    current, current_manifest = load_snapshot(current_dir)
+    delta = diff_snapshots(previous, current, tolerance)
+    summary = summarize_delta(delta, previous, current)
+    stats = []
+    sheets = {}
+    if fits_xlsx(delta):
+        sheets['差异'] = delta
+    else:
+        start = time.perf_counter()
+        csv_path = delta_csv_path(output_file_path)
+        delta.to_csv(csv_path, index=False, encoding='utf-8-sig')
+        stats.append(write_stats(csv_path, len(delta), time.perf_counter() - start))
+    sheets.update({'差异汇总': summary, '快照信息': snapshot_info(previous_manifest, current_manifest)})
+    stats.append(write_workbook(output_file_path, sheets, text_sheets=('差异',)))
+    return summary, stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="比较两次运行的 Sheet1 快照，输出新增、删除和变更的工序")
+    parser.add_argument("previous", help="上次运行的快照目录（计算时 --snapshot 指定的目录）")
+    parser.add_argument("current", help="本次运行的快照目录")
+    parser.add_argument("-o", "--output", required=True, help="差异工作簿路径 (.xlsx)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="工时差的绝对值不超过该值时视为未变更")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.output.lower().endswith('.xlsx'):
+        print("错误：差异文件必须是 .xlsx 格式。", file=sys.stderr)
+        return 1
+    try:
+        summary, stats = write_delta(args.previous, args.current, args.output, args.tolerance)
+    except Exception as e:
+        print(f"错误：比较快照失败：{e}", file=sys.stderr)
+        return 1
+    print(summary.to_string(index=False))
+    if len(stats) > 1:
+        print(f"警告：差异超过 xlsx 工作表的上限 {XLSX_MAX_ROWS - 1} 行，明细另存为 {stats[0]['path']}")
+    for item in stats:
+        print(format_write_stats(item))
+    print(f"差异已保存至 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
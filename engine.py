@@ -0,0 +1,1352 @@
+import sys
+import os
+import pandas as pd
+from datetime import datetime
+import numpy as np
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from bom import NO_MATCH, BomIndex
+from cache import ReferenceCache, file_fingerprint
+from debuglog import DEFAULT_MAX_SAMPLE_ROWS, DebugLog
+from dedup import BOM_DEDUP_COLUMNS, TEST_DEDUP_COLUMNS, KeyDeduplicator
+from delta import save_snapshot
+from incremental import CARD_KEY_COLUMNS, ROW_KEY_COLUMNS, IncrementalState, diff_cards, hash_columns, row_hashes
+from lotstats import LotSizeStats, LotSizeStore, build_stats
+from memo import ResultCache, copy_frames
+from pipeline import PIPELINE_STAGES, ProcessingCancelled
+from profiling import StageProfiler
+from sampling import (RULE_AQL, RULE_AQL_INVALID, RULE_FIXED, RULE_FULL, RULE_INVALID, SAMPLING_PLANS, SAMPLING_RULES,
+                      CompiledAQLTable)
+from streaming import DEFAULT_CHUNK_SIZE, iter_test_chunks
+from sweep import build_curves, curve_charts, group_hours_matrix
+from toolhours import ALIAS_SHEET, ToolHours, ToolHoursStore, normalize_tool_code
+from writer import XLSX_MAX_ROWS, fits_xlsx, format_write_stats, make_sheet2_sink, write_workbook
+
+
+TEST_REQUIRED_COLUMNS = ['产品编码', '检验卡编号', '版本', '工艺编号', '工序号', '工序名称', '量具1层编码',
+                         '量具2层编码', '抽样频率', '是否检验', '尺寸内容']
+
+SHEET1_COLUMNS = ['产品编码', '检验卡编号', '版本', '工艺编号', 'Production Version', '工序号', '工序名称',
+                  '变更前Setup Personal time批量准备工时', '变更前Labor time单件工时', '变更后Setup Personal time批量准备工时',
+                  '变更后Labor time单件工时', '批次工时', '批次大小', 'BOM匹配']
+
+# 输出时未匹配 BOM（或 BOM 中为空）的单元格显示为 N/A
+OUTPUT_MISSING_VALUES = {
+    'Sheet1': {'Production Version': 'N/A', '变更前Setup Personal time批量准备工时': 'N/A', '变更前Labor time单件工时': 'N/A'},
+    'Sheet2': {'Production Version': 'N/A'},
+}
+
+# Sheet1 汇总键
+SHEET1_GROUP_KEYS = ['产品编码', '检验卡编号', '版本', '工艺编号', '工序号', '工序名称']
+
+# 特殊量具：每种不同的特殊量具增加 0.1H 批量准备工时
+SPECIAL_TOOLS = [
+    'OPTICAL MEASURING INSTRUMENT光学影像仪',
+    'MYLAR / OVERLAY数字投影纸',
+    'MYLAR / OVERLAY投影纸',
+    'AIR COLUMN / AIR GAGE气动量具',
+    'ROUGHNESS TESTER粗糙度仪',
+    'CONTOURGRAPH轮廓仪'
+]
+SPECIAL_TOOL_KEYWORDS = {
+    '光学影像仪', '数字投影纸', '投影纸', '气动量具', '粗糙度仪', '轮廓仪'
+}
+
+# 可并行读取的输入：任务 -> (流水线阶段, 参考文件名, 校验时的文件描述)；检验卡文件由调用方指定
+INPUT_TASKS = {
+    'batch': ('load_batch', 'batch_num.xlsx', 'Batch Size'),
+    'database': ('load_database', 'database.xlsx', 'Database'),
+    'bom': ('load_bom', 'BOM.xlsx', 'BOM'),
+    'test': ('load_test', None, 'Test Data'),
+}
+
+# 并行读取输入文件时检查取消请求的间隔（秒）
+CANCEL_POLL_SECONDS = 0.1
+
+# 检验卡中重复度高的文本列，归一化后以 category 保存
+CATEGORY_COLUMNS = ['产品编码', '工艺编号', '工序号', '工序名称', '量具1层编码', '量具2层编码', '抽样频率', '是否检验']
+BLANK_KEY_COLUMNS = ['工艺编号', '工序号', '量具1层编码']
+
+
+def is_special_tool(tool: str) -> bool:
+    """Return True if a stripped tool code is a special tool."""
+    tool_lower = tool.lower()
+    return tool in SPECIAL_TOOLS or any(keyword.lower() in tool_lower for keyword in SPECIAL_TOOL_KEYWORDS)
+
+
+def cell_text(value) -> str:
+    """Return the text of a cell value, writing integer-valued floats as integers.
+
+    pd.read_excel upcasts an integer column with blank cells to float while the streaming reader
+    keeps the cells as int, so 10 and 10.0 must both read as '10'.
+    """
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalized_category(values: pd.Series, normalize=None) -> pd.Series:
+    """Convert values to a category, applying normalize to the text of the unique values only.
+
+    Categories that become equal after normalization are merged, and the result's categories are
+    sorted so that groupby orders groups as it does for plain strings. When normalize is given,
+    missing values are normalized as the text 'nan', as astype(str) did before, so that rows with a
+    blank key still form their own group instead of being dropped by groupby.
+    """
+    categorical = values.astype('category')
+    if normalize is None:
+        return categorical
+    codes = categorical.cat.codes.to_numpy()
+    texts = [cell_text(value) for value in categorical.cat.categories]
+    if (codes < 0).any():
+        texts.append('nan')
+    new_codes, new_categories = pd.factorize(normalize(pd.Series(texts).astype(str)), sort=True)
+    codes = new_codes[codes]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=new_categories), index=values.index,
+                     name=values.name)
+
+
+def available_cpus() -> int:
+    """Return the number of CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def load_input_in_worker(settings: dict, current_time: str, task: str, test_file_path: str | None) -> dict:
+    """Worker: load one input with a fresh engine built from LaborTimeEngine.loader_settings.
+
+    Full row sets for the debug-rows sidecar are kept in the returned log and written when it is merged.
+    """
+    settings = dict(settings)
+    debug_info = DebugLog(settings['log_level'], settings['max_sample_rows'], rows_path=settings.pop('debug_rows_path'),
+                          defer_rows=True)
+    engine = LaborTimeEngine(**settings, debug_info=debug_info)
+    engine.current_time = current_time
+    return engine.load_input(task, test_file_path)
+
+
+def resource_path(relative_path):
+    """获取运行时文件的绝对路径（支持 PyInstaller 打包）"""
+    try:
+        # PyInstaller 创建的临时文件夹路径
+        base_path = sys._MEIPASS
+    except AttributeError:
+        # 非打包环境，直接使用当前目录
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+class LaborTimeEngine:
+    """Headless labor time computation engine, independent of the Tkinter GUI."""
+
+    def __init__(self, data_dir: str | None = None, cache_dir: str | None = None, use_cache: bool = True,
+                 sheet2_format: str = 'xlsx', log_level: str = '分布信息',
+                 max_sample_rows: int = DEFAULT_MAX_SAMPLE_ROWS, debug_rows_path: str | None = None,
+                 profile: bool = False, profile_memory: bool = False, debug_info: DebugLog | None = None,
+                 parallel_load: bool = True, tool_hours_version: str | None = None, tool_hours_dir: str | None = None,
+                 snapshot_dir: str | None = None, result_cache: ResultCache | None = None,
+                 sampling_plan: str | None = None):
+        self.current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 完整的问题记录仅在提供 debug_rows_path 时写入旁路 JSONL / Parquet 文件；
+        # 界面在引擎加载前已创建日志时传入 debug_info 共用
+        self.debug_info = debug_info if debug_info is not None else DebugLog(log_level, max_sample_rows,
+                                                                            rows_path=debug_rows_path)
+        self.data_dir = data_dir
+        self.cache = ReferenceCache(cache_dir) if use_cache else None
+        # Sheet2 输出格式：xlsx 写入工作簿，csv / parquet 另存为旁路文件
+        self.sheet2_format = sheet2_format
+        self.write_stats = []
+        # progress_callback(completed_stages, total_stages, stage_label) 可能在工作线程中调用
+        self.progress_callback = None
+        self.cancel_event = threading.Event()
+        self.tool_to_hours_base = None
+        self.bom = None
+        # 可选的阶段耗时/内存统计，启用时输出 Timings 工作表
+        self.profiler = StageProfiler(profile_memory) if profile or profile_memory else None
+        # 需要解析的输入文件不少于两个且有多个 CPU 时在进程池中并行读取
+        self.parallel_load = parallel_load
+        # 量具工时版本库：默认位于缓存目录；tool_hours_version 为版本名（如 v3）或日期，固定使用该版本
+        self.tool_hours_version = tool_hours_version
+        self.tool_hours_dir = tool_hours_dir
+        # 提供时每次写出 Sheet1 后将其另存为列式快照，供 delta.py 比较两次运行
+        self.snapshot_dir = snapshot_dir
+        # 界面会话内的结果缓存：再次提交时只重新计算输入有变化的阶段
+        self.result_cache = result_cache
+        # 抽样方案：已注册的名称或方案数据文件路径，默认为内置 AQL 抽样表
+        self.sampling_plan = sampling_plan
+        self.sampling_plan_logged = False
+
+    def cancel(self) -> None:
+        """Request cancellation; the pipeline stops at the next stage boundary."""
+        self.cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise ProcessingCancelled("用户取消了处理")
+
+    def begin_stage(self, stage: str) -> None:
+        """Check for cancellation and report the start of a pipeline stage."""
+        self.check_cancelled()
+        stage_keys = [key for key, _ in PIPELINE_STAGES]
+        index = stage_keys.index(stage)
+        if self.profiler is not None:
+            self.profiler.start(stage, PIPELINE_STAGES[index][1])
+        if self.progress_callback is not None:
+            self.progress_callback(index, len(PIPELINE_STAGES), PIPELINE_STAGES[index][1])
+
+    def record_rows(self, rows: int) -> None:
+        """Attribute processed rows to the running stage when profiling."""
+        if self.profiler is not None:
+            self.profiler.add_rows(rows)
+
+    def finish_profile(self) -> None:
+        """Close the last profiled stage."""
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def reference_path(self, file_name: str) -> str:
+        """Resolve a reference workbook path, preferring the configured data directory."""
+        if self.data_dir:
+            return os.path.abspath(os.path.join(self.data_dir, file_name))
+        return resource_path(file_name)
+
+    def validate_file(self, file_path: str, description: str) -> tuple[bool, str]:
+        """Validate if a file exists and is readable."""
+        try:
+            file_path = resource_path(file_path)  # 使用动态路径
+            if not os.path.isfile(file_path):
+                raise FileNotFoundError(f"{description} 文件 {file_path} 不存在。")
+            if not os.access(file_path, os.R_OK):
+                raise PermissionError(f"无权限读取 {description} 文件 {file_path}。")
+            return True, ""
+        except (FileNotFoundError, PermissionError) as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '错误',
+                '信息': str(e)
+            })
+            return False, str(e)
+
+    def check_unmatched_records(self, df: pd.DataFrame, key_column: str, key_dict: dict, display_columns: list,
+                                unmatched_message: str, matched_message: str, default_value=None) -> pd.DataFrame:
+        """Check for unmatched records in a DataFrame and log results."""
+        try:
+            key_set = set(key_dict.keys())
+            unmatched_df = df[~df[key_column].isin(key_set)]
+            if not unmatched_df.empty:
+                message = unmatched_message.format(default_value) if default_value is not None else unmatched_message
+                self.debug_info.log_rows(self.current_time, '警告', message, unmatched_df[display_columns])
+            else:
+                self.debug_info.append({
+                    '时间戳': self.current_time,
+                    '类别': '信息',
+                    '信息': matched_message
+                })
+            return unmatched_df
+        except Exception as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '错误',
+                '信息': f"检查未匹配记录时出错：{e}"
+            })
+            raise
+
+    def load_sampling_plan(self) -> CompiledAQLTable:
+        """Return the compiled sampling plan, logging a plan other than the built-in one when first used."""
+        plan = SAMPLING_PLANS.get(self.sampling_plan)
+        if self.sampling_plan is not None and not self.sampling_plan_logged:
+            self.sampling_plan_logged = True
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"使用{plan.describe()}"
+            })
+        return plan
+
+    def get_aql_sample_size(self, aql_level: float, lot_size: int) -> int:
+        """Determine AQL sample size based on lot size and AQL level."""
+        try:
+            aql_table = self.load_sampling_plan()
+            if not aql_table.has_level(aql_level):
+                nearest_level = aql_table.nearest_level(aql_level)
+                self.debug_info.append({
+                    '时间戳': self.current_time,
+                    '类别': '警告',
+                    '信息': f"AQL级别 {aql_level} 未在抽样表中，使用最近的AQL级别 {nearest_level}"
+                })
+                aql_level = nearest_level
+            return aql_table.lookup(aql_level, [lot_size])[0].item()
+        except Exception as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '错误',
+                '信息': f"获取AQL抽样量时出错：{e}"
+            })
+            return 0
+
+    def load_reference(self, file_name: str, parse) -> dict:
+        """Return the normalized entry for a reference workbook, served from the cache while it is fresh."""
+        path = self.reference_path(file_name)
+        if self.cache is None:
+            return parse(path)
+        fingerprint = file_fingerprint(path)
+        entry = self.cache.load(path, file_name, fingerprint)
+        if entry is not None:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"{file_name} 未变化，从缓存加载"
+            })
+            return entry
+        entry = parse(path)
+        try:
+            self.cache.store(path, file_name, entry, fingerprint)
+        except OSError as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '警告',
+                '信息': f"写入 {file_name} 缓存失败：{e}"
+            })
+        return entry
+
+    def load_batch_stats(self, path: str) -> LotSizeStats:
+        """Return the lot-size statistics of batch_num.xlsx, from the statistics store while caching is enabled."""
+        if self.cache is None:
+            return build_stats(path)
+        store = LotSizeStore(self.cache.entry_dir(path, 'lot_size_stats'))
+        try:
+            stats, how, new_rows = store.load(path)
+        except OSError as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '警告',
+                '信息': f"写入 batch_num.xlsx 开单数量统计库失败：{e}"
+            })
+            return build_stats(path)
+        messages = {
+            'cached': "batch_num.xlsx 未变化，从开单数量统计库加载",
+            'appended': f"batch_num.xlsx 新增 {new_rows} 条记录，已增量更新开单数量统计库",
+            'rebuilt': "batch_num.xlsx 已变化，重建开单数量统计库",
+        }
+        self.debug_info.append({'时间戳': self.current_time, '类别': '信息', '信息': messages[how]})
+        return stats
+
+    def load_and_validate_batch_data(self) -> tuple[LotSizeStats, float]:
+        """Load and validate batch_num.xlsx, returning per-material lot-size statistics and the default lot size."""
+        stats = self.load_batch_stats(self.reference_path('batch_num.xlsx'))
+        default_lot_size = stats.default_lot_size
+        if default_lot_size == 0 or pd.isna(default_lot_size):
+            raise ValueError("batch_num.xlsx 开单数量数据无效或全为0，默认批量大小无法计算。")
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '分布信息',
+            '信息': f"开单数量分布（描述性统计）：\n{stats.describe().to_string()}"
+        })
+        return stats, default_lot_size
+
+    def parse_database(self, path: str) -> ToolHours:
+        """Parse database.xlsx (and its optional 别名 sheet) into the normalized tool hours."""
+        with pd.ExcelFile(path) as workbook:
+            df_database = workbook.parse(workbook.sheet_names[0])
+            df_aliases = workbook.parse(ALIAS_SHEET) if ALIAS_SHEET in workbook.sheet_names else None
+        if df_database.empty:
+            raise ValueError("database.xlsx 文件为空。")
+        return ToolHours.from_frames(df_database, df_aliases)
+
+    def tool_hours_store(self, path: str) -> ToolHoursStore | None:
+        """Return the tool-hours version store for database.xlsx, or None when it is disabled."""
+        if self.tool_hours_dir is not None:
+            return ToolHoursStore(self.tool_hours_dir)
+        if self.cache is not None:
+            return ToolHoursStore(self.cache.entry_dir(path, 'tool_hours'))
+        return None
+
+    def load_and_validate_database(self) -> ToolHours:
+        """Load and validate database.xlsx, returning the latest (or the pinned) tool-hours snapshot."""
+        path = self.reference_path('database.xlsx')
+        store = self.tool_hours_store(path)
+        if store is None:
+            if self.tool_hours_version is not None:
+                raise ValueError("未启用量具工时版本库（已禁用缓存且未指定版本库目录），无法使用指定的量具工时版本")
+            tool_to_hours_base = self.parse_database(path)
+        else:
+            tool_to_hours_base, imported = store.load(path, self.parse_database, self.tool_hours_version)
+            if imported is not None:
+                self.debug_info.append({
+                    '时间戳': self.current_time,
+                    '类别': '信息',
+                    '信息': f"database.xlsx 已变化，保存为量具工时版本 {imported}"
+                })
+        self.debug_info.append({'时间戳': self.current_time, '类别': '信息', '信息': tool_to_hours_base.describe()})
+        zero_hours_tools = {k: v for k, v in tool_to_hours_base.items() if v == 0}
+        if zero_hours_tools:
+            self.debug_info.log_values(self.current_time, '警告', "以下量具编码的工时值为0：", zero_hours_tools)
+        return tool_to_hours_base
+
+    def validate_test_columns(self, df_test: pd.DataFrame, test_file_path: str) -> None:
+        """Raise if the test data lacks any required column."""
+        if not all(col in df_test.columns for col in TEST_REQUIRED_COLUMNS):
+            missing = [col for col in TEST_REQUIRED_COLUMNS if col not in df_test.columns]
+            raise ValueError(f"{test_file_path} 中缺少必要列：{missing}")
+
+    def normalize_test_data(self, df_test: pd.DataFrame) -> pd.DataFrame:
+        """Normalize tool codes, operation numbers, routing numbers and sampling frequencies.
+
+        The repeated text columns become categories and the string clean-up runs on the unique
+        values only; the memory saved is logged.
+        """
+        normalizers = {
+            '量具1层编码': normalize_tool_code,
+            '工序号': lambda s: s.str.zfill(4),
+            '工艺编号': lambda s: s.str.strip().str.upper(),
+            '抽样频率': lambda s: s.str.strip().str.upper(),
+        }
+        before = df_test[CATEGORY_COLUMNS].memory_usage(index=False, deep=True).sum()
+        for col in CATEGORY_COLUMNS:
+            df_test[col] = normalized_category(df_test[col], normalizers.get(col))
+        after = df_test[CATEGORY_COLUMNS].memory_usage(index=False, deep=True).sum()
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '分布信息',
+            '信息': f"检验卡文本列转换为 category：{before / 1024 / 1024:.2f} MB → {after / 1024 / 1024:.2f} MB，"
+                    f"节省 {(before - after) / 1024 / 1024:.2f} MB"
+        })
+        return df_test
+
+    def load_and_validate_test_data(self, test_file_path: str) -> pd.DataFrame:
+        """Load and validate test data from the specified file."""
+        valid, msg = self.validate_file(test_file_path, "Test Data")
+        if not valid:
+            raise FileNotFoundError(msg)
+        df_test = pd.read_excel(test_file_path, dtype={'产品编码': str})
+        return self.prepare_test_data(df_test, test_file_path)
+
+    def prepare_test_data(self, df_test: pd.DataFrame, source: str) -> pd.DataFrame:
+        """Validate, normalize and deduplicate inspection-card rows read from source."""
+        if df_test.empty:
+            raise ValueError("whole_rawdata.xlsx 文件为空。")
+        self.validate_test_columns(df_test, source)
+        self.log_blank_keys(df_test)
+
+        df_test = self.normalize_test_data(df_test)
+        deduplicator = KeyDeduplicator(TEST_DEDUP_COLUMNS, report=self.debug_info.keeps('分布信息'))
+        df_test = df_test[deduplicator.keep_mask(df_test)]
+        self.log_duplicates(deduplicator, '检验卡')
+        self.debug_info.log_values(self.current_time, '信息', "量具1层编码唯一值：", df_test['量具1层编码'].unique())
+        return df_test
+
+    def log_blank_keys(self, df_test: pd.DataFrame) -> None:
+        """Log the inspection-card rows whose normalized key columns are blank.
+
+        Such rows are kept and grouped under the key 'NAN' (工序号 '0nan'), as before.
+        """
+        blank = df_test[BLANK_KEY_COLUMNS].isna().any(axis=1)
+        if blank.any():
+            self.debug_info.log_rows(self.current_time, '警告',
+                                     f"以下 {int(blank.sum())} 行的工艺编号/工序号/量具1层编码为空，"
+                                     f"按 'NAN' 键保留：", df_test[blank])
+
+    def log_duplicates(self, deduplicator: KeyDeduplicator, label: str) -> None:
+        """Log the row counts of a deduplication and, when rows were dropped, its per-key duplicate report."""
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '信息',
+            '信息': deduplicator.summary(label)
+        })
+        if deduplicator.pieces:
+            self.debug_info.log_rows(self.current_time, '分布信息', f"{label}重复的键（仅保留首行，首行序号为数据行序号）：",
+                                     deduplicator.report())
+
+    def parse_bom(self, path: str) -> dict:
+        """Parse BOM.xlsx into the normalized, deduplicated DataFrame."""
+        df_bom = pd.read_excel(path)
+        if df_bom.empty:
+            raise ValueError("BOM.xlsx 文件为空。")
+        bom_required_columns = ['Description', 'Operation/Activity N', 'Production Version', 'Setup Personal time',
+                                'Labor time']
+        if not all(col in df_bom.columns for col in bom_required_columns):
+            missing = [col for col in bom_required_columns if col not in df_bom.columns]
+            raise ValueError(f"BOM.xlsx 中缺少必要列：{missing}")
+
+        df_bom['Description'] = df_bom['Description'].astype(str).str.strip().str.upper()
+        df_bom['Operation/Activity N'] = df_bom['Operation/Activity N'].astype(str).str.zfill(4)
+        deduplicator = KeyDeduplicator(BOM_DEDUP_COLUMNS, report=self.debug_info.keeps('分布信息'))
+        df_bom = df_bom[deduplicator.keep_mask(df_bom)]
+        self.log_duplicates(deduplicator, 'BOM')
+        return BomIndex.from_frame(df_bom).to_entry()
+
+    def load_and_validate_bom(self) -> BomIndex:
+        """Load and validate BOM.xlsx, returning it compiled into a keyed index."""
+        return BomIndex.from_entry(self.load_reference('BOM.xlsx', self.parse_bom))
+
+    def assign_batch_size(self, df_test: pd.DataFrame, lot_size_stats: LotSizeStats, default_lot_size: float,
+                          user_batch_size: int | None) -> pd.DataFrame:
+        """Assign batch size to test data."""
+        if user_batch_size is not None:
+            df_test['lot_size_median'] = int(float(user_batch_size))
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"使用用户提供的批量大小：{user_batch_size}"
+            })
+        else:
+            medians = lot_size_stats.lookup(df_test['产品编码'])
+            df_test['lot_size_median'] = np.where(np.isnan(medians), default_lot_size, medians)
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"用户未提供批量大小，使用默认批量大小：{default_lot_size}"
+            })
+        return df_test
+
+    def calculate_sampling_quantity(self, df_test: pd.DataFrame) -> pd.DataFrame:
+        """Calculate sampling quantity based on sampling frequency.
+
+        Each distinct 抽样频率 is compiled once into a SamplingRule (see sampling.SAMPLING_RULES) and
+        the rows are resolved from the rules gathered by code.
+        """
+        kinds, fixed_quantities, aql_levels = SAMPLING_RULES.row_rules(df_test['抽样频率'])
+        inspected = (df_test['是否检验'] == '是').to_numpy()
+        lot_size_median = df_test['lot_size_median'].to_numpy()
+        quantities = np.zeros(len(df_test), dtype=np.int64)
+
+        fixed_rows = kinds == RULE_FIXED
+        quantities[fixed_rows] = fixed_quantities[fixed_rows]
+        full_rows = kinds == RULE_FULL
+        if (lot_size_median[full_rows] % 1 != 0).any():
+            # 非整数批量（历史中位数）需要浮点列，与旧版 pandas 的自动升级一致
+            quantities = quantities.astype(float)
+        quantities[full_rows] = lot_size_median[full_rows]
+
+        aql_rows_invalid = inspected & (kinds == RULE_AQL_INVALID)
+        if aql_rows_invalid.any():
+            invalid_freq = df_test.loc[aql_rows_invalid, '抽样频率'].iloc[0]
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '警告',
+                '信息': f"警告：无法提取有效的AQL级别，抽样频率 {invalid_freq}，抽样数量设为0 | "
+                        f"{self.describe_first_row(df_test, aql_rows_invalid)}"
+            })
+
+        aql_rows_valid = inspected & (kinds == RULE_AQL)
+        if aql_rows_valid.any():
+            lot_sizes = df_test.loc[aql_rows_valid, 'lot_size_median'].round(0).astype(int)
+            sample_sizes = self.load_sampling_plan().lookup(aql_levels[aql_rows_valid], lot_sizes.to_numpy())
+            out_of_range = sample_sizes == 0
+            if out_of_range.any():
+                out_of_range_rows = aql_rows_valid.copy()
+                out_of_range_rows[aql_rows_valid] = out_of_range
+                self.debug_info.append({
+                    '时间戳': self.current_time,
+                    '类别': '警告',
+                    '信息': f"警告：批次大小 {lot_sizes[out_of_range].iloc[0]} 超出范围，返回0 | "
+                            f"{self.describe_first_row(df_test, out_of_range_rows)}"
+                })
+            quantities[aql_rows_valid] = sample_sizes
+
+        invalid_freq_rows = inspected & (kinds == RULE_INVALID)
+        if invalid_freq_rows.any():
+            invalid_freq = df_test.loc[invalid_freq_rows, '抽样频率'].iloc[0]
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '警告',
+                '信息': f"警告：无效的抽样频率 {invalid_freq}，抽样数量设为0 | "
+                        f"{self.describe_first_row(df_test, invalid_freq_rows)}"
+            })
+        df_test['抽样数量'] = quantities
+        return df_test
+
+    @staticmethod
+    def describe_first_row(df_test: pd.DataFrame, mask: np.ndarray) -> str:
+        """Return the card, operation and tool of the first masked row for a warning message."""
+        row = df_test.loc[mask].iloc[0]
+        tool = row['量具1层编码'] if pd.notna(row['量具1层编码']) else '无量具'
+        return f"检验卡编号: {row['检验卡编号']}, 工序名称: {row['工序名称']}, 量具1层编码: {tool}"
+
+    def count_special_tools(self, df_test: pd.DataFrame, group_ids: np.ndarray, n_groups: int) -> np.ndarray:
+        """Count distinct special tools per group id, classifying each unique tool code only once.
+
+        Rows with a negative group id (missing group keys) belong to no group.
+        """
+        codes, uniques = pd.factorize(df_test['量具1层编码'])
+        stripped = pd.Series([tool.strip() if isinstance(tool, str) and tool else '' for tool in uniques], dtype=object)
+        # 末尾追加的元素供 factorize 的缺失值编码 -1 使用
+        is_special = np.append([bool(tool) and is_special_tool(tool) for tool in stripped], False).astype(bool)
+        tool_ids = np.append(pd.factorize(stripped)[0], -1)
+        row_special = is_special[codes] & (group_ids >= 0)
+        n_tools = max(len(tool_ids), 1)
+        pairs = np.unique(group_ids[row_special] * n_tools + tool_ids[codes][row_special])
+        return np.bincount(pairs // n_tools, minlength=n_groups)
+
+    def create_sheet1_data(self, df_test: pd.DataFrame, user_batch_size: int | None) -> pd.DataFrame:
+        """Create data for Sheet1 from processed test data, including setup time calculation."""
+        grouper = df_test.groupby(SHEET1_GROUP_KEYS, observed=True)
+        grouped_hours = grouper.agg({
+            '工时': 'sum',
+            '批次大小': 'first',
+            'bom_position': 'first'
+        }).reset_index().rename(columns={'工时': '批次工时'})
+
+        # 在汇总后按组连接 BOM；一个键对应多行 BOM 时与逐行合并一致，批次工时按匹配行数累计
+        positions = grouped_hours.pop('bom_position').to_numpy()
+        grouped_hours['批次工时'] = grouped_hours['批次工时'] * self.bom.multiplicity(positions)
+        bom_values = self.bom.first_values(positions)
+        grouped_hours['Production Version'] = bom_values['Production Version'].to_numpy()
+        grouped_hours['变更前Setup Personal time批量准备工时'] = bom_values['Setup Personal time'].to_numpy()
+        grouped_hours['变更前Labor time单件工时'] = bom_values['Labor time'].to_numpy()
+        grouped_hours['BOM匹配'] = positions != NO_MATCH
+
+        # 批量准备工时 = 0.1 + 0.1 × 不同特殊量具数，工序名称含“外协”再加 0.1
+        # ngroup 的编号与汇总结果的行顺序一致；按编号计数，避免以 category 多级索引做 reindex
+        group_ids = grouper.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        setup_time = 0.1 + 0.1 * self.count_special_tools(df_test, group_ids, len(grouped_hours))
+        is_outsourced = grouped_hours['工序名称'].astype(str).str.contains('外协', regex=False).to_numpy()
+        grouped_hours['变更后Setup Personal time批量准备工时'] = np.where(is_outsourced, setup_time + 0.1, setup_time)
+
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '信息',
+            '信息': f"准备工时计算完成，基于特殊量具：{SPECIAL_TOOLS}，并为包含‘外协’的工序名称增加0.1工时"
+        })
+
+        if user_batch_size is not None:
+            grouped_hours['批次大小'] = int(float(user_batch_size))
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"使用用户提供的批量大小 {user_batch_size} 计算'变更后Labor time单件工时'"
+            })
+
+        return self.set_unit_labor_time(grouped_hours)[SHEET1_COLUMNS]
+
+    def set_unit_labor_time(self, grouped_hours: pd.DataFrame) -> pd.DataFrame:
+        """Derive 变更后Labor time单件工时 from 批次工时 and 批次大小 (0 when the batch size is 0)."""
+        grouped_hours['变更后Labor time单件工时'] = (grouped_hours['批次工时'] / grouped_hours['批次大小'].replace(0, 1)).round(3)
+        grouped_hours.loc[grouped_hours['批次大小'] == 0, '变更后Labor time单件工时'] = 0
+        return grouped_hours
+
+    def create_sheet2_data(self, df_test: pd.DataFrame) -> pd.DataFrame:
+        """Create data for Sheet2 from processed test data, one row per matching BOM row."""
+        sheet2_columns = ['产品编码', '检验卡编号', '版本', '工艺编号', 'Production Version', '工序号', '工序名称',
+                          '尺寸内容', '量具1层编码', '量具2层编码', '批次大小', '抽样频率', '是否检验', '抽样数量',
+                          '单件工时', '工时']
+        rows, bom_values = self.bom.expand(df_test['bom_position'].to_numpy())
+        sheet2_data = df_test.iloc[rows].reset_index(drop=True)
+        sheet2_data['Production Version'] = bom_values['Production Version'].to_numpy()
+        return sheet2_data[sheet2_columns]
+
+    def validate_reference_files(self) -> tuple[bool, str]:
+        """Validate that all reference workbooks exist and are readable."""
+        for file, desc in [("batch_num.xlsx", "Batch Size"), ("database.xlsx", "Database"), ("BOM.xlsx", "BOM")]:
+            valid, msg = self.validate_file(self.reference_path(file), desc)
+            if not valid:
+                return False, msg
+        return True, ""
+
+    def load_references(self) -> dict:
+        """Validate and load the reference workbooks shared by every inspection-card file."""
+        return self.load_inputs()[0]
+
+    def loader_settings(self) -> dict:
+        """Return the engine arguments with which another process loads inputs as this engine would."""
+        return {
+            'data_dir': self.data_dir,
+            'cache_dir': self.cache.cache_dir if self.cache is not None else None,
+            'use_cache': self.cache is not None,
+            'log_level': self.debug_info.min_level,
+            'max_sample_rows': self.debug_info.max_sample_rows,
+            'debug_rows_path': self.debug_info.rows_path,
+            'tool_hours_version': self.tool_hours_version,
+            'tool_hours_dir': self.tool_hours_dir,
+        }
+
+    def input_cached(self, task: str) -> bool:
+        """Return True if an input will be served from the cache or statistics store without parsing Excel."""
+        if task == 'test':
+            return False
+        path = self.reference_path(INPUT_TASKS[task][1])
+        if task == 'database':
+            store = self.tool_hours_store(path)
+            return store is not None and store.is_current(path)
+        if self.cache is None:
+            return False
+        if task == 'batch':
+            return LotSizeStore(self.cache.entry_dir(path, 'lot_size_stats')).is_current(path)
+        return self.cache.is_fresh(path, INPUT_TASKS[task][1])
+
+    def load_input(self, task: str, test_file_path: str | None = None) -> dict:
+        """Load one input of INPUT_TASKS, returning its value, row count and timings, or the error it raised."""
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = {'task': task, 'value': None, 'rows': 0, 'error': None, 'debug_info': self.debug_info}
+        try:
+            if task == 'batch':
+                result['value'] = self.load_and_validate_batch_data()
+                result['rows'] = result['value'][0].rows
+            elif task == 'database':
+                result['value'] = self.load_and_validate_database()
+                result['rows'] = len(result['value'])
+            elif task == 'bom':
+                result['value'] = self.load_and_validate_bom()
+                result['rows'] = len(result['value'])
+            else:
+                result['value'] = self.load_and_validate_test_data(test_file_path)
+                result['rows'] = len(result['value'])
+        except Exception as e:
+            result['error'] = e
+        result['wall_seconds'] = time.perf_counter() - wall_start
+        result['cpu_seconds'] = time.process_time() - cpu_start
+        return result
+
+    def report_load_progress(self, tasks: list, results: dict) -> None:
+        """Report one pipeline step per loaded input, labelled with the next input still being read."""
+        pending = [task for task in tasks if task not in results]
+        if self.progress_callback is not None and pending:
+            index = [key for key, _ in PIPELINE_STAGES].index('load_inputs') + len(results)
+            self.progress_callback(index, len(PIPELINE_STAGES), dict(PIPELINE_STAGES)[INPUT_TASKS[pending[0]][0]])
+
+    def load_inputs(self, test_file_path: str | None = None) -> tuple[dict, pd.DataFrame | None]:
+        """Validate and load the reference workbooks and, if given, the inspection-card file.
+
+        Returns the references and the prepared inspection-card rows (None without a file). openpyxl
+        parses in pure Python and holds the GIL, so when parallel_load is set and at least two inputs
+        have to be parsed from Excel they are read in a process pool (one input per worker, at most
+        one worker per available CPU), while the inputs served from the cache load in this process.
+        Each input is loaded by its own engine and its debug entries are merged back in the serial
+        order. Every failing input is logged as an error before the first failure is raised. Progress
+        advances as each input finishes, and a cancellation stops waiting for the pool and cancels the
+        inputs not yet started.
+        """
+        tasks = list(INPUT_TASKS) if test_file_path is not None else [task for task in INPUT_TASKS if task != 'test']
+        paths = {task: test_file_path if task == 'test' else self.reference_path(INPUT_TASKS[task][1]) for task in tasks}
+        missing = [msg for valid, msg in (self.validate_file(paths[task], INPUT_TASKS[task][2]) for task in tasks)
+                   if not valid]
+        if missing:
+            raise FileNotFoundError("\n".join(missing))
+
+        self.begin_stage('load_inputs')
+        settings = self.loader_settings()
+        parsed = [task for task in tasks if not self.input_cached(task)]
+        workers = min(len(parsed), available_cpus()) if self.parallel_load else 1
+        results = {}
+        if workers > 1:
+            executor = None
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                futures = {executor.submit(load_input_in_worker, settings, self.current_time, task,
+                                           test_file_path): task for task in parsed}
+                for task in tasks:
+                    if task not in parsed:
+                        self.check_cancelled()
+                        results[task] = load_input_in_worker(settings, self.current_time, task, test_file_path)
+                        self.report_load_progress(tasks, results)
+                pending = set(futures)
+                while pending:
+                    self.check_cancelled()
+                    done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[futures[future]] = future.result()
+                        self.report_load_progress(tasks, results)
+            except (OSError, BrokenProcessPool) as e:
+                self.debug_info.append({
+                    '时间戳': self.current_time,
+                    '类别': '警告',
+                    '信息': f"并行读取输入文件失败，改为依次读取：{e}"
+                })
+            finally:
+                if executor is not None:
+                    # 取消时不等待仍在解析的文件
+                    executor.shutdown(wait=not self.cancel_event.is_set(), cancel_futures=True)
+        for task in tasks:
+            if task not in results:
+                self.check_cancelled()
+                self.report_load_progress(tasks, results)
+                results[task] = load_input_in_worker(settings, self.current_time, task, test_file_path)
+
+        timings = []
+        for task in tasks:
+            result = results[task]
+            stage, file_name, _ = INPUT_TASKS[task]
+            self.debug_info.merge(result['debug_info'])
+            if result['error'] is not None:
+                self.debug_info.append({
+                    '时间戳': self.current_time,
+                    '类别': '错误',
+                    '信息': f"读取 {file_name or test_file_path} 失败：{result['error']}"
+                })
+            elif self.profiler is not None:
+                self.profiler.record(stage, dict(PIPELINE_STAGES)[stage], result['wall_seconds'],
+                                     result['cpu_seconds'], result['rows'])
+            timings.append(f"{file_name or os.path.basename(test_file_path)} {result['wall_seconds']:.2f} 秒")
+        self.record_rows(sum(result['rows'] for result in results.values()))
+        mode = f"{workers} 个进程并行读取 {len(parsed)} 个文件" if workers > 1 else "依次读取"
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '信息',
+            '信息': f"输入文件读取完成（{mode}）：{'，'.join(timings)}"
+        })
+        for task in tasks:
+            if results[task]['error'] is not None:
+                raise results[task]['error']
+
+        lot_size_stats, default_lot_size = results['batch']['value']
+        references = {
+            'lot_size_stats': lot_size_stats,
+            'default_lot_size': default_lot_size,
+            'tool_to_hours_base': results['database']['value'],
+            'bom': results['bom']['value'],
+        }
+        return references, results['test']['value'] if test_file_path is not None else None
+
+    def compute(self, test_file_path: str, user_batch_size: int | None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Run the full calculation pipeline and return Sheet1 data, Sheet2 data and the processed test data.
+
+        With a result_cache, the results are looked up under the versions of their inputs and only
+        the stages whose inputs changed since an earlier call are recomputed (see load_matched).
+        """
+        if self.result_cache is None:
+            references, df_test = self.load_inputs(test_file_path)
+            return self.compute_test_data(df_test, user_batch_size, references)
+        references = self.load_references()
+        keys = self.input_keys(test_file_path, references)
+        if keys is None:
+            return self.compute_file(test_file_path, user_batch_size, references)
+        reused = []
+        self.use_references(references)
+        result_key = ('result', *keys, self.load_sampling_plan().digest, user_batch_size)
+        result = self.memoized(result_key, '计算结果', reused, lambda: self.summarize_test_data(
+            self.apply_batch_size(self.load_matched(test_file_path, references, keys, reused), user_batch_size,
+                                  references), user_batch_size))
+        self.log_reuse(reused)
+        return result
+
+    def input_keys(self, test_file_path: str, references: dict) -> tuple | None:
+        """Return the result-cache keys of the inspection-card file and the loaded reference data.
+
+        Files are identified by their content hashes and the tool hours by their snapshot's contents,
+        as in incremental_context(). Returns None if the inspection-card file cannot be read.
+        """
+        try:
+            test_key = ('test', os.path.abspath(test_file_path), file_fingerprint(test_file_path)['sha256'])
+        except OSError:
+            # 文件缺失或不可读时按常规流程校验并报告
+            return None
+        reference_key = ('references', references['tool_to_hours_base'].digest,
+                         *(file_fingerprint(self.reference_path(name))['sha256'] for name in ('batch_num.xlsx', 'BOM.xlsx')))
+        return test_key, reference_key
+
+    def memoized(self, key: tuple, label: str, reused: list, compute):
+        """Return compute() through the result cache, replaying the DebugInfo entries it logged when reused.
+
+        Returned DataFrames are copies, so callers may modify them. label is appended to reused on a hit.
+        """
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            value, log = cached
+            self.debug_info.merge(log)
+            reused.append(label)
+            return copy_frames(value)
+        parent, self.debug_info = self.debug_info, self.debug_info.child()
+        try:
+            value = compute()
+        finally:
+            log, self.debug_info = self.debug_info, parent
+        self.debug_info.merge(log)
+        self.result_cache.put(key, (value, log))
+        return copy_frames(value)
+
+    def load_matched(self, test_file_path: str, references: dict, keys: tuple, reused: list) -> pd.DataFrame:
+        """Return the prepared inspection-card rows matched to the tool hours and BOM, through the result cache.
+
+        The prepared rows are keyed on the file's contents and the matched rows also on the reference data.
+        """
+        test_key, reference_key = keys
+        self.use_references(references)
+        return self.memoized(('matched', test_key, reference_key), '量具工时和BOM匹配', reused, lambda: self.match_references(
+            self.memoized(test_key, '检验卡数据', reused, lambda: self.load_test_stage(test_file_path)), references))
+
+    def log_reuse(self, reused: list) -> None:
+        """Log which stages were taken from the result cache and its occupancy."""
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '信息',
+            '信息': (f"复用缓存的{'、'.join(reused)}；" if reused else "") + self.result_cache.describe()
+        })
+
+    def enrich_test_data(self, df_test: pd.DataFrame, user_batch_size: int | None, references: dict) -> pd.DataFrame:
+        """Assign batch sizes, sampling quantities and hours, and join the BOM times onto normalized test rows."""
+        df_test = self.match_references(df_test, references)
+        return self.apply_batch_size(df_test, user_batch_size, references)
+
+    def use_references(self, references: dict) -> None:
+        """Make references the tool hours and BOM used by the aggregation and output steps."""
+        self.tool_to_hours_base = references['tool_to_hours_base']
+        self.bom = references['bom']
+
+    def match_references(self, df_test: pd.DataFrame, references: dict) -> pd.DataFrame:
+        """Resolve tool codes to their hours and locate each row in the BOM index; independent of the batch size."""
+        self.use_references(references)
+        self.begin_stage('merge')
+        empty_tools = df_test[df_test['量具1层编码'].isna() | (df_test['量具1层编码'] == '')][
+            ['检验卡编号', '工序名称']]
+        if not empty_tools.empty:
+            self.debug_info.log_rows(self.current_time, '警告', "以下记录的量具1层编码为空：", empty_tools)
+
+        # 未精确匹配的量具编码再按别名和近似编码（全角/半角、空格、组合顺序）匹配
+        df_test['量具匹配编码'] = self.tool_to_hours_base.resolve(df_test['量具1层编码'])
+        near_miss = df_test[df_test['量具匹配编码'].notna().to_numpy() &
+                            (df_test['量具匹配编码'].to_numpy() != df_test['量具1层编码'].astype(object).to_numpy())]
+        if not near_miss.empty:
+            self.debug_info.log_rows(self.current_time, '警告', "以下量具1层编码未精确匹配，已按别名或近似编码匹配：",
+                                     near_miss[['量具1层编码', '量具匹配编码']].drop_duplicates())
+
+        unmatched_tools = df_test[df_test['量具匹配编码'].isna() &
+                                  df_test['抽样频率'].isin(['AQL1.0 C=0', 'AQL2.5 C=0', 'AQL4.0 C=0'])][
+            ['产品编码', '检验卡编号', '工序名称', '量具1层编码']]
+        if not unmatched_tools.empty:
+            self.debug_info.log_rows(self.current_time, '警告', "以下记录的量具1层编码未在 tool_to_hours_base 中找到：",
+                                     unmatched_tools)
+        df_test['单件工时'] = df_test['量具匹配编码'].map(self.tool_to_hours_base.hours).astype(float).fillna(0)
+
+        # 只记录每行在 BOM 索引中的位置，BOM 各列在 Sheet1 汇总和 Sheet2 输出时再取
+        df_test['bom_position'] = self.bom.positions(df_test['工艺编号'], df_test['工序号'])
+        self.record_rows(len(df_test))
+
+        self.check_unmatched_records(
+            df_test, '量具匹配编码', self.tool_to_hours_base,
+            ['产品编码', '检验卡编号', '工序名称', '量具1层编码'],
+            "警告：发现未匹配的量具编码：", "所有量具编码均已匹配，无未匹配量具编码。"
+        )
+        return df_test
+
+    def apply_batch_size(self, df_test: pd.DataFrame, user_batch_size: int | None, references: dict) -> pd.DataFrame:
+        """Assign the batch size and compute sampling quantities and 工时 for rows prepared by match_references."""
+        lot_size_stats = references['lot_size_stats']
+        default_lot_size = references['default_lot_size']
+
+        self.begin_stage('sampling')
+        df_test = self.assign_batch_size(df_test, lot_size_stats, default_lot_size, user_batch_size)
+        df_test = self.calculate_sampling_quantity(df_test)
+        self.record_rows(len(df_test))
+
+        df_test['工时'] = df_test['抽样数量'] * df_test['单件工时']
+        zero_hours_records = df_test[df_test['工时'] == 0][
+            ['产品编码', '检验卡编号', '工序名称', '量具1层编码', '抽样数量', '单件工时', '工时']]
+        if not zero_hours_records.empty:
+            self.debug_info.log_rows(self.current_time, '警告', "以下记录的工时为0：", zero_hours_records)
+
+        self.check_unmatched_records(
+            df_test, '产品编码', lot_size_stats if user_batch_size is None else {},
+            ['产品编码', '检验卡编号', '工序名称', '量具1层编码'],
+            "警告：发现未匹配的产品编码（使用默认批次大小 {}）：", "所有产品编码均已匹配，无未匹配产品编码。",
+            default_value=user_batch_size if user_batch_size is not None else default_lot_size
+        )
+
+        df_test = df_test.rename(columns={'lot_size_median': '批次大小'})
+        return df_test
+
+    def compute_file(self, test_file_path: str, user_batch_size: int | None,
+                     references: dict) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Calculate one inspection-card file against already loaded reference data."""
+        return self.compute_test_data(self.load_test_stage(test_file_path), user_batch_size, references)
+
+    def load_test_stage(self, test_file_path: str) -> pd.DataFrame:
+        """Load and prepare one inspection-card file as the load_test stage."""
+        self.begin_stage('load_test')
+        df_test = self.load_and_validate_test_data(test_file_path)
+        self.record_rows(len(df_test))
+        return df_test
+
+    def compute_test_data(self, df_test: pd.DataFrame, user_batch_size: int | None,
+                          references: dict) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Calculate Sheet1 and Sheet2 for prepared inspection-card rows against loaded reference data."""
+        return self.summarize_test_data(self.enrich_test_data(df_test, user_batch_size, references), user_batch_size)
+
+    def summarize_test_data(self, df_test: pd.DataFrame,
+                            user_batch_size: int | None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Aggregate enriched rows into Sheet1 and Sheet2, returning them with the rows."""
+        self.begin_stage('aggregate')
+        sheet1_data = self.create_sheet1_data(df_test, user_batch_size)
+        sheet2_data = self.create_sheet2_data(df_test)
+
+        unmatched_bom = sheet1_data[~sheet1_data['BOM匹配']][['工艺编号', '工序号']]
+        if not unmatched_bom.empty:
+            self.debug_info.log_rows(self.current_time, '警告', "以下记录未在 BOM.xlsx 中找到匹配：", unmatched_bom)
+
+        zero_lot_size = sheet1_data[sheet1_data['批次大小'] == 0][
+            ['产品编码', '检验卡编号', '工序名称', '批次工时', '批次大小']]
+        if not zero_lot_size.empty:
+            self.debug_info.log_rows(self.current_time, '警告', "以下记录的默认批次大小为0，变更后Labor time单件工时设为0：",
+                                     zero_lot_size)
+        self.record_rows(len(sheet1_data))
+        return sheet1_data, sheet2_data, df_test
+
+    def compute_file_streaming(self, test_file_path: str, user_batch_size: int | None, references: dict,
+                               chunk_size: int = DEFAULT_CHUNK_SIZE, sheet2_sink=None) -> pd.DataFrame:
+        """Calculate Sheet1 for one inspection-card file read in row chunks, bounding memory by chunk size.
+
+        Each chunk is normalized, deduplicated against the (工艺编号, 工序号) keys kept so far, sampled
+        and aggregated on its own; Sheet2 rows are passed to sheet2_sink chunk by chunk instead of being
+        kept. Because only the first row of each (工艺编号, 工序号) survives and both are Sheet1 group
+        keys, every Sheet1 group is complete within one chunk and the partial results only need to be
+        concatenated and put back in group order.
+        """
+        self.begin_stage('load_test')
+        valid, msg = self.validate_file(test_file_path, "Test Data")
+        if not valid:
+            raise FileNotFoundError(msg)
+
+        deduplicator = KeyDeduplicator(TEST_DEDUP_COLUMNS, across_chunks=True,
+                                       report=self.debug_info.keeps('分布信息'))
+        partials = []
+        total_rows = 0
+        for chunk in iter_test_chunks(test_file_path, chunk_size):
+            self.validate_test_columns(chunk, test_file_path)
+            total_rows += len(chunk)
+            chunk = self.normalize_test_data(chunk)
+            chunk = chunk[deduplicator.keep_mask(chunk)]
+            self.record_rows(len(chunk))
+            if chunk.empty:
+                continue
+            chunk = self.enrich_test_data(chunk, user_batch_size, references)
+            self.begin_stage('aggregate')
+            partials.append(self.create_sheet1_data(chunk, user_batch_size))
+            self.record_rows(len(partials[-1]))
+            if sheet2_sink is not None:
+                sheet2_sink(self.create_sheet2_data(chunk))
+            # 下一块的读取计入 load_test 阶段
+            self.begin_stage('load_test')
+
+        self.begin_stage('aggregate')
+        if total_rows == 0:
+            raise ValueError("whole_rawdata.xlsx 文件为空。")
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '信息',
+            '信息': f"流式读取完成：共 {total_rows} 行，去重后保留 {deduplicator.kept_rows} 个工艺编号/工序号"
+        })
+        self.log_duplicates(deduplicator, '检验卡')
+
+        return self.combine_sheet1_partials(partials)
+
+    def combine_sheet1_partials(self, partials: list) -> pd.DataFrame:
+        """Merge Sheet1 frames computed on separate row subsets back into one frame in group order."""
+        sheet1_data = pd.concat(partials, ignore_index=True)
+        aggregations = {col: 'first' for col in SHEET1_COLUMNS if col not in SHEET1_GROUP_KEYS}
+        aggregations['批次工时'] = 'sum'
+        sheet1_data = sheet1_data.groupby(SHEET1_GROUP_KEYS, observed=True).agg(aggregations).reset_index()
+        return self.set_unit_labor_time(sheet1_data)[SHEET1_COLUMNS]
+
+    def incremental_context(self, user_batch_size: int | None, references: dict) -> dict:
+        """Return what stored per-card results depend on besides the cards themselves.
+
+        The tool hours are identified by their snapshot's contents, so runs pinned to an older
+        version do not reuse results of the current one.
+        """
+        return {
+            'references': {name: file_fingerprint(self.reference_path(name))['sha256']
+                           for name in ('batch_num.xlsx', 'BOM.xlsx')},
+            'tool_hours': references['tool_to_hours_base'].digest,
+            'sampling_plan': self.load_sampling_plan().digest,
+            'user_batch_size': None if user_batch_size is None else float(user_batch_size),
+        }
+
+    def compute_file_incremental(self, test_file_path: str, user_batch_size: int | None, references: dict,
+                                 state: IncrementalState) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+        """Calculate one inspection-card file, recomputing only the cards that changed since the stored run.
+
+        Rows are hashed per (产品编码, 检验卡编号, 版本, 工艺编号, 工序号) after normalization and the
+        global (工艺编号, 工序号) deduplication, so a card whose surviving rows change because of
+        another card is recomputed as well. Added and changed cards go through sampling and Sheet1
+        aggregation; their results replace the stored ones, removed cards are dropped, and the new
+        results are stored for the next run. Returns Sheet1, Sheet2 and the per-status card counts.
+        """
+        context = self.incremental_context(user_batch_size, references)
+        self.begin_stage('load_test')
+        df_test = self.load_and_validate_test_data(test_file_path)
+        self.record_rows(len(df_test))
+        rows = row_hashes(df_test, TEST_REQUIRED_COLUMNS)
+
+        previous = state.load(context)
+        if previous is None:
+            added, changed, removed = set(rows['card_hash']), set(), set()
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': "未找到可用的增量状态（首次运行或参考数据/抽样方案/批量大小已变化），全部重新计算"
+            })
+        else:
+            added, changed, removed = diff_cards(previous['rows'], rows)
+        recompute = added | changed
+        counts = {'added': len(added), 'changed': len(changed), 'removed': len(removed),
+                  'unchanged': rows['card_hash'].nunique() - len(recompute)}
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '信息',
+            '信息': f"增量计算：新增 {counts['added']} 张、变更 {counts['changed']} 张、删除 {counts['removed']} 张、"
+                    f"未变化 {counts['unchanged']} 张检验卡"
+        })
+
+        sheet1_partials, sheet2_partials = [], []
+        if previous is not None:
+            stale = recompute | removed
+            sheet1_partials.append(previous['sheet1'][~np.isin(hash_columns(previous['sheet1'], CARD_KEY_COLUMNS),
+                                                               list(stale))])
+            sheet2_partials.append(previous['sheet2'][~np.isin(hash_columns(previous['sheet2'], CARD_KEY_COLUMNS),
+                                                               list(stale))])
+        subset = df_test[rows['card_hash'].isin(recompute).to_numpy()]
+        if not subset.empty:
+            subset = self.enrich_test_data(subset, user_batch_size, references)
+            self.begin_stage('aggregate')
+            sheet1_partials.append(self.create_sheet1_data(subset, user_batch_size))
+            sheet2_partials.append(self.create_sheet2_data(subset))
+        else:
+            self.begin_stage('aggregate')
+
+        sheet1_data = self.combine_sheet1_partials(sheet1_partials)
+        # Sheet2 按本次输入的行顺序排列
+        sheet2_data = pd.concat(sheet2_partials, ignore_index=True)
+        position = pd.Series(np.arange(len(rows)), index=rows['key_hash'].to_numpy())
+        order = position.reindex(hash_columns(sheet2_data, ROW_KEY_COLUMNS)).to_numpy()
+        sheet2_data = sheet2_data.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+        self.record_rows(len(sheet1_data))
+
+        state.store(context, rows, sheet1_data, sheet2_data)
+        return sheet1_data, sheet2_data, counts
+
+    def compute_sweep(self, test_file_path: str, batch_sizes: list[int],
+                      references: dict | None = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Calculate the labor-hour curves of one inspection-card file over many batch sizes in one pass.
+
+        Loading, normalization, sampling rules, tool hours, the BOM join and the Sheet1 setup times do
+        not depend on the batch size and run once (sampling and Sheet1 at the smallest size); the
+        sampling quantities and 工时 sums are then computed for every size as one matrix. Returns the
+        per-operation curve table, the per-size summary and the processed test data.
+        """
+        batch_sizes = sorted({int(float(size)) for size in batch_sizes})
+        keys = None
+        if references is None and self.result_cache is not None:
+            references = self.load_references()
+            keys = self.input_keys(test_file_path, references)
+        if keys is not None:
+            reused = []
+            df_test = self.apply_batch_size(self.load_matched(test_file_path, references, keys, reused),
+                                            batch_sizes[0], references)
+            self.log_reuse(reused)
+        else:
+            if references is None:
+                references, df_test = self.load_inputs(test_file_path)
+            else:
+                df_test = self.load_test_stage(test_file_path)
+            df_test = self.enrich_test_data(df_test, batch_sizes[0], references)
+
+        self.begin_stage('aggregate')
+        sheet1_data = self.create_sheet1_data(df_test, batch_sizes[0])
+        group_ids = df_test.groupby(SHEET1_GROUP_KEYS, observed=True).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        hours, out_of_range = group_hours_matrix(df_test, group_ids, len(sheet1_data), batch_sizes,
+                                                 self.load_sampling_plan())
+        # 每组第一行的 BOM 位置决定匹配行数，与 create_sheet1_data 一致
+        first_rows = np.unique(group_ids[group_ids >= 0], return_index=True)[1]
+        first_positions = df_test['bom_position'].to_numpy()[np.flatnonzero(group_ids >= 0)[first_rows]]
+        curves, summary = build_curves(sheet1_data, hours * self.bom.multiplicity(first_positions)[:, None],
+                                       batch_sizes)
+        self.record_rows(len(sheet1_data) * len(batch_sizes))
+        if out_of_range:
+            self.debug_info.log_values(self.current_time, '警告', "以下批量大小超出 AQL 抽样表范围，相应 AQL 抽样数量为0：",
+                                       out_of_range)
+        self.debug_info.append({
+            '时间戳': self.current_time,
+            '类别': '信息',
+            '信息': f"批量扫描完成：{len(sheet1_data)} 个工序 × {len(batch_sizes)} 个批量大小"
+                    f"（{batch_sizes[0]} ~ {batch_sizes[-1]}）"
+        })
+        return curves, summary, df_test
+
+    def write_sweep_output(self, output_file_path: str, curves: pd.DataFrame, summary: pd.DataFrame) -> list[dict]:
+        """Write the curve table, the per-size summary, their chart sheets and DebugInfo."""
+        self.begin_stage('write')
+        if os.path.exists(output_file_path):
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '警告',
+                '信息': f"输出文件 {output_file_path} 已存在，将被覆盖"
+            })
+        if not os.access(os.path.dirname(output_file_path) or '.', os.W_OK):
+            raise PermissionError(f"无权限写入文件 {output_file_path}")
+        sheets = {'曲线': curves, '批量汇总': summary, 'DebugInfo': self.debug_info.to_frame(self.current_time)}
+        if self.profiler is not None:
+            sheets['Timings'] = self.profiler.to_frame()
+        stats = [write_workbook(output_file_path, sheets, text_sheets=('曲线',),
+                                fill_values={'曲线': OUTPUT_MISSING_VALUES['Sheet1']},
+                                charts=curve_charts('批量汇总', summary))]
+        self.record_rows(stats[0]['rows'])
+        self.log_write_stats(stats)
+        return stats
+
+    def write_output(self, output_file_path: str, sheet1_data: pd.DataFrame, sheet2_data: pd.DataFrame | None,
+                     extra_sheets: dict | None = None) -> list[dict]:
+        """Write Sheet1, Sheet2 (unless None), any extra sheets and DebugInfo, returning per-file write statistics.
+
+        With sheet2_format 'csv' or 'parquet', Sheet2 goes to a side file and the workbook stays small;
+        a Sheet2 too large for an xlsx worksheet also goes to a CSV side file, with a warning.
+        With snapshot_dir, Sheet1 is also saved there as a snapshot for delta reports.
+        When profiling, a Timings sheet lists the stages up to the start of the workbook write.
+        """
+        self.begin_stage('write')
+        if os.path.exists(output_file_path):
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '警告',
+                '信息': f"输出文件 {output_file_path} 已存在，将被覆盖"
+            })
+        if not os.access(os.path.dirname(output_file_path) or '.', os.W_OK):
+            raise PermissionError(f"无权限写入文件 {output_file_path}")
+
+        stats = []
+        sheets = {'Sheet1': sheet1_data}
+        if sheet2_data is not None:
+            sheet2_format = self.sheet2_format
+            if sheet2_format == 'xlsx' and not fits_xlsx(sheet2_data):
+                sheet2_format = 'csv'
+                self.debug_info.append({
+                    '时间戳': self.current_time,
+                    '类别': '警告',
+                    '信息': f"Sheet2 有 {len(sheet2_data)} 行，超过 xlsx 工作表的上限 {XLSX_MAX_ROWS - 1} 行，"
+                            f"改为另存为 CSV 文件"
+                })
+            if sheet2_format == 'xlsx':
+                sheets['Sheet2'] = sheet2_data
+            else:
+                sink = make_sheet2_sink(sheet2_format, output_file_path, OUTPUT_MISSING_VALUES['Sheet2'])
+                sink(sheet2_data)
+                stats.append(sink.close())
+        sheets.update(extra_sheets or {})
+        sheets['DebugInfo'] = self.debug_info.to_frame(self.current_time)
+        if self.profiler is not None:
+            sheets['Timings'] = self.profiler.to_frame()
+        stats.insert(0, write_workbook(output_file_path, sheets, fill_values=OUTPUT_MISSING_VALUES))
+        if self.snapshot_dir is not None:
+            stats.append(save_snapshot(self.snapshot_dir, sheet1_data, created=self.current_time,
+                                       output=os.path.abspath(output_file_path),
+                                       tool_hours_version=getattr(self.tool_to_hours_base, 'version', None)))
+        self.record_rows(sum(item['rows'] for item in stats))
+        self.log_write_stats(stats)
+        return stats
+
+    def log_write_stats(self, stats: list[dict]) -> None:
+        """Record rows and bytes written per second for each output file."""
+        self.write_stats.extend(stats)
+        for item in stats:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': format_write_stats(item)
+            })
+
+    def process_data(self, test_file_path: str, user_batch_size: int | None,
+                     output_file_path: str) -> tuple[bool, str, pd.DataFrame, dict]:
+        """Process input data, calculate labor hours, and save results to output_file_path."""
+        try:
+            sheet1_data, sheet2_data, df_test = self.compute(test_file_path, user_batch_size)
+            self.write_output(output_file_path, sheet1_data, sheet2_data)
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"处理完成，结果已保存至 {output_file_path}"
+            })
+            return True, output_file_path, df_test, self.tool_to_hours_base
+
+        except Exception as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '错误',
+                '信息': f"处理数据时出错：{e}\n{traceback.format_exc()}"
+            })
+            return False, f"错误：处理数据失败：{e}", None, None
+        finally:
+            self.finish_profile()
+            self.debug_info.close()
+
+    def process_data_streaming(self, test_file_path: str, user_batch_size: int | None, output_file_path: str,
+                               chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[bool, str]:
+        """Stream one large inspection-card file: Sheet1 to output_file_path, Sheet2 to a CSV or Parquet file next to it."""
+        try:
+            # 流式模式不在内存中保留 Sheet2，xlsx 格式时退回 CSV 旁路文件
+            sheet2_sink = make_sheet2_sink('csv' if self.sheet2_format == 'xlsx' else self.sheet2_format,
+                                           output_file_path, OUTPUT_MISSING_VALUES['Sheet2'])
+            try:
+                sheet1_data = self.compute_file_streaming(test_file_path, user_batch_size, self.load_references(),
+                                                          chunk_size, sheet2_sink)
+            finally:
+                sheet2_stats = sheet2_sink.close()
+            self.log_write_stats([sheet2_stats])
+            self.write_output(output_file_path, sheet1_data, None)
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"处理完成，结果已保存至 {output_file_path}，Sheet2 共 {sheet2_sink.rows_written} 行已保存至 {sheet2_sink.file_path}"
+            })
+            return True, output_file_path
+
+        except Exception as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '错误',
+                '信息': f"处理数据时出错：{e}\n{traceback.format_exc()}"
+            })
+            return False, f"错误：处理数据失败：{e}"
+        finally:
+            self.finish_profile()
+            self.debug_info.close()
+
+    def process_data_sweep(self, test_file_path: str, batch_sizes: list[int],
+                           output_file_path: str) -> tuple[bool, str]:
+        """Calculate labor-hour curves over batch_sizes and save them with charts to output_file_path."""
+        try:
+            curves, summary, _ = self.compute_sweep(test_file_path, batch_sizes)
+            self.write_sweep_output(output_file_path, curves, summary)
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"处理完成，结果已保存至 {output_file_path}"
+            })
+            return True, output_file_path
+
+        except Exception as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '错误',
+                '信息': f"处理数据时出错：{e}\n{traceback.format_exc()}"
+            })
+            return False, f"错误：处理数据失败：{e}"
+        finally:
+            self.finish_profile()
+            self.debug_info.close()
+
+    def process_data_incremental(self, test_file_path: str, user_batch_size: int | None, output_file_path: str,
+                                 state_dir: str) -> tuple[bool, str]:
+        """Process input data incrementally against the state in state_dir and save the full results."""
+        try:
+            sheet1_data, sheet2_data, _ = self.compute_file_incremental(
+                test_file_path, user_batch_size, self.load_references(), IncrementalState(state_dir))
+            self.write_output(output_file_path, sheet1_data, sheet2_data)
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '信息',
+                '信息': f"处理完成，结果已保存至 {output_file_path}"
+            })
+            return True, output_file_path
+
+        except Exception as e:
+            self.debug_info.append({
+                '时间戳': self.current_time,
+                '类别': '错误',
+                '信息': f"处理数据时出错：{e}\n{traceback.format_exc()}"
+            })
+            return False, f"错误：处理数据失败：{e}"
+        finally:
+            self.finish_profile()
+            self.debug_info.close()
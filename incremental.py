@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache import ReferenceCache
+
+# 状态格式或计算逻辑变化时递增，使旧状态全部失效
+STATE_VERSION = 2
+# 一张检验卡
+CARD_KEY_COLUMNS = ['产品编码', '检验卡编号', '版本']
+# 检验卡中的一行（去重后唯一）
+ROW_KEY_COLUMNS = ['产品编码', '检验卡编号', '版本', '工艺编号', '工序号']
+
+
+def hash_columns(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Return a uint64 hash per row of the given columns, compared as text so dtypes do not matter."""
+    return pd.util.hash_pandas_object(df[columns].astype(str), index=False).to_numpy()
+
+
+def row_hashes(df_test: pd.DataFrame, value_columns: list) -> pd.DataFrame:
+    """Return card, row-key and row-content hashes for normalized, deduplicated inspection-card rows."""
+    return pd.DataFrame({
+        'card_hash': hash_columns(df_test, CARD_KEY_COLUMNS),
+        'key_hash': hash_columns(df_test, ROW_KEY_COLUMNS),
+        'row_hash': hash_columns(df_test, value_columns),
+    })
+
+
+def diff_cards(previous: pd.DataFrame, current: pd.DataFrame) -> tuple[set, set, set]:
+    """Compare two row_hashes frames and return the (added, changed, removed) card hashes.
+
+    A card has changed when any of its rows was added, removed or edited.
+    """
+    merged = previous.merge(current, on=['card_hash', 'key_hash'], how='outer', suffixes=('_old', '_new'),
+                            indicator=True)
+    previous_cards = set(previous['card_hash'])
+    current_cards = set(current['card_hash'])
+    differs = (merged['_merge'] != 'both') | (merged['row_hash_old'] != merged['row_hash_new'])
+    touched = set(merged.loc[differs, 'card_hash'])
+    added = current_cards - previous_cards
+    removed = previous_cards - current_cards
+    return added, (touched & previous_cards & current_cards), removed
+
+
+class IncrementalState:
+    """Persisted per-row hashes and per-card Sheet1/Sheet2 results of the last run.
+
+    Stored with ReferenceCache in state_dir; the entry is only valid for the same context (reference
+    workbook contents, user batch size and STATE_VERSION), otherwise everything is recomputed.
+    """
+
+    NAME = 'incremental'
+
+    def __init__(self, state_dir: str):
+        self.state_dir = os.path.abspath(state_dir)
+        self.cache = ReferenceCache(self.state_dir)
+
+    def load(self, context: dict) -> dict | None:
+        return self.cache.load(self.state_dir, self.NAME, {**context, 'version': STATE_VERSION})
+
+    def store(self, context: dict, rows: pd.DataFrame, sheet1_data: pd.DataFrame, sheet2_data: pd.DataFrame) -> None:
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.cache.store(self.state_dir, self.NAME, {'rows': rows, 'sheet1': sheet1_data, 'sheet2': sheet2_data},
+                         {**context, 'version': STATE_VERSION})
@@ -0,0 +1,324 @@
+import hashlib
+import json
+import os
+import uuid
+from collections.abc import Mapping
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from cache import _replace_atomic, file_fingerprint
+from streaming import DEFAULT_CHUNK_SIZE, iter_excel_chunks
+
+# 统计库格式或统计口径变化时递增，使旧统计库全部失效（重建）
+STORE_VERSION = 1
+BATCH_REQUIRED_COLUMNS = ['Material Number', 'Batch', 'Order quantity (GMEIN)']
+# 每个物料的统计列（stats 数组的列顺序）
+STAT_COLUMNS = ['count', 'median', 'q25', 'q75', 'min', 'max', 'mean']
+# 统计库中以 .npy 保存、以内存映射方式打开的数组
+ARRAY_NAMES = ('materials', 'stats', 'hist_material', 'hist_value', 'hist_count')
+# 物料编码为空的记录在直方图中的物料序号（只计入全局统计）
+NO_MATERIAL = -1
+
+
+def iter_batch_records(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield batch_num.xlsx in order as chunks of 'Material Number' (text) and 开单数量 (float, 0 when invalid)."""
+    empty = True
+    for chunk in iter_excel_chunks(path, chunk_size):
+        if empty:
+            missing = [col for col in BATCH_REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"batch_num.xlsx 中缺少必要列：{missing}")
+            empty = False
+        yield pd.DataFrame({
+            'Material Number': chunk['Material Number'].map(lambda value: value if pd.isna(value) else str(value)),
+            '开单数量': pd.to_numeric(chunk['Order quantity (GMEIN)'], errors='coerce').fillna(0).astype(float),
+        })
+    if empty:
+        raise ValueError("batch_num.xlsx 文件为空。")
+
+
+def record_hashes(records: pd.DataFrame) -> bytes:
+    """Return the per-row hashes of batch records as bytes, fed in file order into the prefix digest."""
+    return pd.util.hash_pandas_object(records, index=False).to_numpy().tobytes()
+
+
+def value_counts(records: pd.DataFrame) -> pd.DataFrame:
+    """Return the (Material Number, 开单数量, count) histogram of batch records."""
+    counts = records.groupby(['Material Number', '开单数量'], dropna=False, sort=False).size()
+    return counts.rename('count').reset_index()
+
+
+def merge_histograms(histograms: list) -> pd.DataFrame:
+    histogram = pd.concat(histograms, ignore_index=True)
+    counts = histogram.groupby(['Material Number', '开单数量'], dropna=False, sort=False)['count'].sum()
+    return counts.reset_index()
+
+
+def ranked_values(values: np.ndarray, cumulative: np.ndarray, base: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """Return the value of 0-based rank ranks[k] within group k of a histogram sorted by (group, value).
+
+    cumulative is the running total of the histogram counts and base[k] the total before group k.
+    """
+    return values[np.searchsorted(cumulative, base + ranks, side='right')]
+
+
+def group_quantiles(values: np.ndarray, counts: np.ndarray, group_starts: np.ndarray,
+                    totals: np.ndarray, quantiles: list) -> list[np.ndarray]:
+    """Return per-group linearly interpolated quantiles (as pandas computes them) of a sorted histogram."""
+    cumulative = np.cumsum(counts)
+    base = np.concatenate([[0], cumulative])[group_starts]
+    results = []
+    for q in quantiles:
+        position = (totals - 1) * q
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        low = ranked_values(values, cumulative, base, lower)
+        high = ranked_values(values, cumulative, base, upper)
+        if q == 0.5:
+            # 与 pandas median 相同：偶数个时取中间两个值的平均
+            results.append((low + high) / 2)
+        else:
+            results.append(low + (high - low) * (position - lower))
+    return results
+
+
+class LotSizeStats(Mapping):
+    """Per-material lot-size statistics of the batch history, read as a mapping of material to median lot size.
+
+    The statistics are derived from a (material, 开单数量) histogram sorted by material then value,
+    which keeps medians and quantiles exact and lets appended records be merged without the
+    original rows. materials is sorted; stats has one row per material with STAT_COLUMNS.
+    rows and digest describe the batch records aggregated so far (count and SHA-256 of their
+    row hashes), so the store can tell an append from an edited history.
+    """
+
+    def __init__(self, materials: np.ndarray, stats: np.ndarray, hist_material: np.ndarray,
+                 hist_value: np.ndarray, hist_count: np.ndarray, rows: int, digest: str):
+        self.materials = materials
+        self.stats = stats
+        self.hist_material = hist_material
+        self.hist_value = hist_value
+        self.hist_count = hist_count
+        self.rows = rows
+        self.digest = digest
+        self.index = pd.Index(materials.astype(object))
+        self.medians = stats[:, STAT_COLUMNS.index('median')]
+        self._overall = None
+
+    @classmethod
+    def from_histogram(cls, histogram: pd.DataFrame, rows: int, digest: str) -> 'LotSizeStats':
+        """Compile a value_counts histogram into sorted histogram arrays and per-material statistics."""
+        codes, materials = pd.factorize(histogram['Material Number'], sort=True)
+        values = histogram['开单数量'].to_numpy(dtype=float)
+        order = np.lexsort((values, codes))
+        hist_material = codes[order].astype(np.int32)
+        hist_value = values[order]
+        hist_count = histogram['count'].to_numpy(dtype=np.int64)[order]
+
+        named = hist_material != NO_MATERIAL
+        material_ids = hist_material[named]
+        counts = hist_count[named]
+        material_values = hist_value[named]
+        n = len(materials)
+        totals = np.bincount(material_ids, weights=counts, minlength=n).astype(np.int64)
+        stats = np.full((n, len(STAT_COLUMNS)), np.nan)
+        if n:
+            starts = np.flatnonzero(np.r_[True, np.diff(material_ids) != 0])
+            ends = np.r_[starts[1:], len(material_ids)] - 1
+            median, q25, q75 = group_quantiles(material_values, counts, starts, totals, [0.5, 0.25, 0.75])
+            stats[:, STAT_COLUMNS.index('count')] = totals
+            stats[:, STAT_COLUMNS.index('median')] = median
+            stats[:, STAT_COLUMNS.index('q25')] = q25
+            stats[:, STAT_COLUMNS.index('q75')] = q75
+            stats[:, STAT_COLUMNS.index('min')] = material_values[starts]
+            stats[:, STAT_COLUMNS.index('max')] = material_values[ends]
+            stats[:, STAT_COLUMNS.index('mean')] = np.bincount(
+                material_ids, weights=material_values * counts, minlength=n) / totals
+        return cls(np.asarray(materials, dtype=str), stats, hist_material, hist_value, hist_count, rows, digest)
+
+    def __getitem__(self, material) -> float:
+        position = self.index.get_indexer([material])[0]
+        if position < 0:
+            raise KeyError(material)
+        return float(self.medians[position])
+
+    def __contains__(self, material) -> bool:
+        return material in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def lookup(self, materials: pd.Series) -> np.ndarray:
+        """Return the median lot size of each material, NaN where the history has none.
+
+        Only the distinct values (the categories of a categorical column) are looked up in the
+        material index; rows then take their value by code.
+        """
+        if isinstance(materials.dtype, pd.CategoricalDtype):
+            codes, uniques = materials.cat.codes.to_numpy(), materials.cat.categories
+        else:
+            codes, uniques = pd.factorize(materials)
+        positions = self.index.get_indexer(uniques)
+        medians = np.where(positions >= 0, self.medians[positions], np.nan)
+        return np.append(medians, np.nan)[codes]
+
+    def frame(self) -> pd.DataFrame:
+        """Return the per-material statistics as a DataFrame indexed by Material Number."""
+        return pd.DataFrame(np.asarray(self.stats), index=self.index.rename('Material Number'), columns=STAT_COLUMNS)
+
+    def overall(self) -> dict:
+        """Return count, mean, std, min, quartiles and max of 开单数量 over all batch records."""
+        if self._overall is None:
+            values, inverse = np.unique(self.hist_value, return_inverse=True)
+            counts = np.bincount(inverse, weights=self.hist_count).astype(np.int64)
+            total = int(counts.sum())
+            mean = float((values * counts).sum() / total) if total else np.nan
+            std = float(np.sqrt((counts * (values - mean) ** 2).sum() / (total - 1))) if total > 1 else np.nan
+            starts, totals = np.array([0]), np.array([total])
+            q25, median, q75 = (float(q[0]) for q in group_quantiles(values, counts, starts, totals, [0.25, 0.5, 0.75]))
+            self._overall = {'count': float(total), 'mean': mean, 'std': std, 'min': float(values[0]),
+                             '25%': q25, '50%': median, '75%': q75, 'max': float(values[-1])}
+        return self._overall
+
+    @property
+    def default_lot_size(self) -> float:
+        """The median 开单数量 over all batch records, used for materials without history."""
+        return self.overall()['50%']
+
+    def describe(self) -> pd.Series:
+        """Return the same summary as df_batch['开单数量'].describe()."""
+        return pd.Series(self.overall(), name='开单数量')
+
+    def arrays(self) -> dict:
+        return {name: getattr(self, name) for name in ARRAY_NAMES}
+
+
+def build_stats(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> LotSizeStats:
+    """Aggregate the whole batch history in chunks, without keeping its rows."""
+    digest = hashlib.sha256()
+    histograms = []
+    rows = 0
+    for records in iter_batch_records(path, chunk_size):
+        digest.update(record_hashes(records))
+        histograms.append(value_counts(records))
+        rows += len(records)
+    return LotSizeStats.from_histogram(merge_histograms(histograms), rows, digest.hexdigest())
+
+
+class LotSizeStore:
+    """Persistent lot-size statistics of batch_num.xlsx, kept as memory-mapped .npy arrays in store_dir.
+
+    While the workbook's fingerprint is unchanged the arrays are opened with mmap_mode='r' and
+    nothing is parsed. When records were appended, the workbook is read once in chunks: the
+    already aggregated rows are only hashed to confirm they are unchanged, and the new rows are
+    merged into the stored histogram. Any other change (edited, reordered or removed rows)
+    rebuilds the store from the whole history.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.store_dir, 'manifest.json')
+
+    def read_manifest(self) -> dict | None:
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get('version') == STORE_VERSION else None
+
+    def open(self, manifest: dict) -> LotSizeStats | None:
+        """Open the arrays listed in manifest memory-mapped, or return None if any is missing or unreadable."""
+        try:
+            arrays = {name: np.load(os.path.join(self.store_dir, file_name), mmap_mode='r')
+                      for name, file_name in manifest['arrays'].items()}
+            return LotSizeStats(rows=manifest['rows'], digest=manifest['digest'], **arrays)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def is_current(self, path: str) -> bool:
+        """Return True if load would open the stored statistics without reading the workbook."""
+        manifest = self.read_manifest()
+        return manifest is not None and manifest.get('fingerprint') == file_fingerprint(path)
+
+    def load(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[LotSizeStats, str, int]:
+        """Return (stats, how, new_rows) for batch_num.xlsx at path, updating the store first if needed.
+
+        how is 'cached' (unchanged, opened memory-mapped), 'appended' (new_rows merged into the
+        stored statistics) or 'rebuilt' (aggregated from the whole history).
+        """
+        fingerprint = file_fingerprint(path)
+        manifest = self.read_manifest()
+        previous = self.open(manifest) if manifest is not None else None
+        if previous is not None and manifest.get('fingerprint') == fingerprint:
+            return previous, 'cached', 0
+
+        stats = self.append(path, previous, chunk_size) if previous is not None else None
+        if stats is None:
+            stats, how, new_rows = build_stats(path, chunk_size), 'rebuilt', 0
+        else:
+            how, new_rows = 'appended', stats.rows - previous.rows
+        self.save(stats, fingerprint)
+        return stats, how, new_rows
+
+    @staticmethod
+    def append(path: str, previous: LotSizeStats, chunk_size: int = DEFAULT_CHUNK_SIZE) -> LotSizeStats | None:
+        """Merge the records after previous.rows into previous, or return None if the earlier rows changed."""
+        digest = hashlib.sha256()
+        histograms = [pd.DataFrame({
+            'Material Number': np.where(previous.hist_material == NO_MATERIAL, None,
+                                        np.asarray(previous.materials, dtype=object)[previous.hist_material]),
+            '开单数量': np.asarray(previous.hist_value),
+            'count': np.asarray(previous.hist_count),
+        })]
+        rows = 0
+        for records in iter_batch_records(path, chunk_size):
+            if rows < previous.rows:
+                head = records.iloc[:previous.rows - rows]
+                digest.update(record_hashes(head))
+                rows += len(head)
+                records = records.iloc[len(head):]
+                if rows == previous.rows and digest.hexdigest() != previous.digest:
+                    return None
+            if len(records):
+                digest.update(record_hashes(records))
+                histograms.append(value_counts(records))
+                rows += len(records)
+        if rows <= previous.rows:
+            # 记录减少，或指纹变化但记录未变（如仅修改了其他列）时同样重建，保证与全量统计一致
+            return None
+        return LotSizeStats.from_histogram(merge_histograms(histograms), rows, digest.hexdigest())
+
+    def save(self, stats: LotSizeStats, fingerprint: dict) -> None:
+        """Write the arrays under new names, then switch the manifest to them and remove the old files."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        generation = uuid.uuid4().hex
+        arrays = {}
+        for name, array in stats.arrays().items():
+            file_name = f"{name}.{generation}.npy"
+            tmp_path = os.path.join(self.store_dir, f"{file_name}.tmp")
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(array))
+            _replace_atomic(tmp_path, os.path.join(self.store_dir, file_name))
+            arrays[name] = file_name
+        manifest = {'version': STORE_VERSION, 'fingerprint': fingerprint, 'rows': stats.rows,
+                    'digest': stats.digest, 'arrays': arrays}
+        tmp_path = os.path.join(self.store_dir, f"manifest.{generation}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        _replace_atomic(tmp_path, self.manifest_path)
+        for file_name in os.listdir(self.store_dir):
+            if file_name.endswith('.npy') and file_name not in arrays.values():
+                try:
+                    os.remove(os.path.join(self.store_dir, file_name))
+                except OSError:
+                    # 其他进程仍映射着旧数组时（Windows）留待下次清理
+                    pass
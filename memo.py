@@ -0,0 +1,114 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# 界面会话内结果缓存的默认内存预算，可由环境变量 BUDGET_ENV 调整（MB，0 表示不缓存）
+DEFAULT_BUDGET_MB = 512
+BUDGET_ENV = 'BATCH_LABOR_TIME_CACHE_MB'
+# 估算文本列内存时抽样的行数，避免逐个字符串计算大表的内存
+SIZE_SAMPLE_ROWS = 2000
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Estimate the memory held by df, measuring object columns on a sample of rows."""
+    total = int(df.index.memory_usage())
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == object and len(values) > SIZE_SAMPLE_ROWS:
+            sample = values.iloc[np.linspace(0, len(values) - 1, SIZE_SAMPLE_ROWS).astype(np.int64)]
+            total += int(sample.memory_usage(index=False, deep=True) * len(values) / SIZE_SAMPLE_ROWS)
+        else:
+            total += int(values.memory_usage(index=False, deep=True))
+    return total
+
+
+def value_nbytes(value) -> int:
+    """Estimate the memory held by a cached value: frames, arrays and containers of them."""
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(value_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_nbytes(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+def copy_frames(value):
+    """Return value with its DataFrames copied, so callers may modify them without changing the cached ones."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(copy_frames(item) for item in value)
+    return value
+
+
+def budget_from_environment() -> int:
+    """Return the cache budget in bytes from BUDGET_ENV, DEFAULT_BUDGET_MB if unset or invalid."""
+    try:
+        budget_mb = float(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB))
+    except ValueError:
+        budget_mb = DEFAULT_BUDGET_MB
+    return int(max(budget_mb, 0) * 1024 * 1024)
+
+
+class ResultCache:
+    """In-process LRU cache of intermediate results, bounded by an estimated memory budget.
+
+    Used by the GUI to carry results across submissions within one session. Reading or storing an
+    entry makes it the most recently used; storing evicts least recently used entries until the
+    total fits max_bytes, and a value larger than the whole budget is not stored. Thread-safe.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value stored under key, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value) -> bool:
+        """Store value under key, returning False if it exceeds the budget on its own."""
+        nbytes = value_nbytes(value)
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return False
+            while self.entries and self.total_bytes + nbytes > self.max_bytes:
+                self.total_bytes -= self.entries.popitem(last=False)[1][1]
+                self.evictions += 1
+            self.entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            return True
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def describe(self) -> str:
+        return (f"会话缓存：{len(self.entries)} 项，约 {self.total_bytes / 1024 / 1024:.1f} MB / "
+                f"{self.max_bytes / 1024 / 1024:.0f} MB，命中 {self.hits} 次，未命中 {self.misses} 次，"
+                f"淘汰 {self.evictions} 项")
@@ -0,0 +1,22 @@
+"""Pipeline stage names and the cancellation exception.
+
+Kept free of pandas/numpy imports so the GUI can show its window and progress bar before the
+calculation engine is loaded.
+"""
+
+# 流水线阶段（键, 显示名称），用于进度报告和取消检查
+PIPELINE_STAGES = [
+    ('load_inputs', '读取输入文件'),
+    ('load_batch', '加载批次数据'),
+    ('load_database', '加载量具工时数据库'),
+    ('load_bom', '加载BOM数据'),
+    ('load_test', '加载检验卡数据'),
+    ('merge', '匹配量具工时和BOM'),
+    ('sampling', '计算抽样数量'),
+    ('aggregate', '汇总工时'),
+    ('write', '写入输出文件'),
+]
+
+
+class ProcessingCancelled(Exception):
+    """Raised at a stage boundary after cancellation has been requested."""
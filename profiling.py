@@ -0,0 +1,143 @@
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+TIMINGS_COLUMNS = ['阶段', '名称', '次数', '墙钟时间(秒)', 'CPU时间(秒)', '行数', '峰值RSS(MB)', 'RSS峰值增量(MB)',
+                   'tracemalloc峰值(MB)', 'tracemalloc增量(MB)']
+
+
+def peak_rss_bytes() -> int | None:
+    """Return the process's peak resident set size, or None when it cannot be determined."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 为单位，macOS 以字节为单位
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        # Windows 提供峰值工作集，其他平台退回当前 RSS
+        return getattr(info, 'peak_wset', info.rss)
+    except ImportError:
+        return None
+
+
+def _mb(value: int | None) -> float | None:
+    return None if value is None else round(value / 1024 / 1024, 3)
+
+
+class StageProfiler:
+    """Record wall time, CPU time, memory and row counts for each pipeline stage.
+
+    A stage runs from its start() until the next start() or stop(). Stages entered more than once
+    (streaming mode repeats sampling and merge per chunk) are accumulated under one key. With
+    trace_memory, tracemalloc is running for the whole profile, which slows pandas noticeably.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.current = None
+        self.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.wall_total = None
+        self.cpu_total = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stage_record(self, stage: str, label: str) -> dict:
+        return self.stages.setdefault(stage, {
+            'stage': stage, 'label': label, 'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows': 0,
+            'peak_rss_bytes': None, 'rss_increase_bytes': 0, 'tracemalloc_peak_bytes': None,
+            'tracemalloc_delta_bytes': 0,
+        })
+
+    def start(self, stage: str, label: str = '') -> None:
+        self._close_current()
+        record = self._stage_record(stage, label)
+        record['calls'] += 1
+        self.current = {
+            'record': record,
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+            'rss': peak_rss_bytes(),
+            'traced': None,
+        }
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self.current['traced'] = tracemalloc.get_traced_memory()[0]
+
+    def record(self, stage: str, label: str, wall_seconds: float, cpu_seconds: float, rows: int) -> None:
+        """Add work timed elsewhere (such as an input read in a worker process) as a call of stage.
+
+        Such stages may overlap the running stage, so their times are not part of the stage sum.
+        """
+        record = self._stage_record(stage, label)
+        record['calls'] += 1
+        record['wall_seconds'] += wall_seconds
+        record['cpu_seconds'] += cpu_seconds
+        record['rows'] += int(rows)
+
+    def add_rows(self, rows: int) -> None:
+        """Attribute rows processed to the running stage."""
+        if self.current is not None:
+            self.current['record']['rows'] += int(rows)
+
+    def stop(self) -> None:
+        """Close the running stage and fix the end-to-end totals."""
+        self._close_current()
+        self.wall_total = time.perf_counter() - self.wall_start
+        self.cpu_total = time.process_time() - self.cpu_start
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _close_current(self) -> None:
+        if self.current is None:
+            return
+        current, record = self.current, self.current['record']
+        record['wall_seconds'] += time.perf_counter() - current['wall']
+        record['cpu_seconds'] += time.process_time() - current['cpu']
+        rss = peak_rss_bytes()
+        if rss is not None:
+            record['peak_rss_bytes'] = max(record['peak_rss_bytes'] or 0, rss)
+            record['rss_increase_bytes'] += rss - (current['rss'] or rss)
+        if current['traced'] is not None and tracemalloc.is_tracing():
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            record['tracemalloc_peak_bytes'] = max(record['tracemalloc_peak_bytes'] or 0, traced_peak)
+            record['tracemalloc_delta_bytes'] += traced - current['traced']
+        self.current = None
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the stages recorded so far as the Timings sheet."""
+        rows = [[r['stage'], r['label'], r['calls'], round(r['wall_seconds'], 4), round(r['cpu_seconds'], 4),
+                 r['rows'], _mb(r['peak_rss_bytes']), _mb(r['rss_increase_bytes']),
+                 _mb(r['tracemalloc_peak_bytes']), _mb(r['tracemalloc_delta_bytes']) if self.trace_memory else None]
+                for r in self.stages.values()]
+        return pd.DataFrame(rows, columns=TIMINGS_COLUMNS)
+
+    def report(self, **metadata) -> dict:
+        """Return the profile as a JSON-serializable dict, with environment details for comparing releases."""
+        return {
+            'started_at': self.started_at,
+            **metadata,
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'platform': platform.platform(),
+            },
+            'trace_memory': self.trace_memory,
+            'total': {'wall_seconds': self.wall_total, 'cpu_seconds': self.cpu_total, 'peak_rss_bytes': peak_rss_bytes()},
+            'stages': list(self.stages.values()),
+        }
+
+    def write_json(self, file_path: str, **metadata) -> None:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(**metadata), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,294 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# AQL 抽样表 (constant, kept global for simplicity)
+AQL_SAMPLE_SIZE = {
+    1.0: {(2, 8): 8, (9, 15): 13, (16, 25): 13, (26, 50): 13, (51, 90): 13, (91, 150): 19, (151, 280): 29,
+          (281, 500): 29, (501, 1200): 34, (1201, 3200): 42, (3201, 10000): 50},
+    1.5: {(2, 8): 8, (9, 15): 8, (16, 25): 8, (26, 50): 8, (51, 90): 13, (91, 150): 19, (151, 280): 19, (281, 500): 21,
+          (501, 1200): 27, (1201, 3200): 35, (3201, 10000): 38},
+    2.5: {(2, 8): 5, (9, 15): 5, (16, 25): 5, (26, 50): 7, (51, 90): 11, (91, 150): 11, (151, 280): 13, (281, 500): 16,
+          (501, 1200): 19, (1201, 3200): 23, (3201, 10000): 29},
+    4.0: {(2, 8): 3, (9, 15): 3, (16, 25): 3, (26, 50): 7, (51, 90): 8, (91, 150): 9, (151, 280): 10, (281, 500): 11,
+          (501, 1200): 15, (1201, 3200): 18, (3201, 10000): 22},
+    10.0: {(2, 8): 3, (9, 15): 3, (16, 25): 3, (26, 50): 3, (51, 90): 4, (91, 150): 5, (151, 280): 6, (281, 500): 7,
+           (501, 1200): 8, (1201, 3200): 9, (3201, 10000): 9}
+}
+
+
+# 批量上限为 None 表示不设上限，编译后以该值作为最后一个范围的终点
+OPEN_END = int(np.iinfo(np.int64).max)
+# 内置抽样方案（AQL_SAMPLE_SIZE）的名称
+DEFAULT_PLAN = '内置'
+# 抽样方案数据文件中批量范围的列；其余每列为一个 AQL 级别，单元格为样本量
+PLAN_RANGE_COLUMNS = ['批量下限', '批量上限']
+PLAN_FILE_EXTENSIONS = ('.csv', '.xlsx')
+
+
+class CompiledAQLTable:
+    """Dense level × lot-segment lookup compiled from a {level: {(min_lot, max_lot): size}} table.
+
+    The lot axis is split at every range boundary of every level, so one np.searchsorted on the
+    lot sizes plus one on the levels resolves any number of rows in a single gather; a table with
+    more levels or ranges only adds boundaries to search. A max_lot of None leaves the range open
+    above (lots beyond the largest tabulated one).
+    """
+
+    def __init__(self, table: dict, name: str = DEFAULT_PLAN):
+        self.name = name
+        self.levels = np.array(sorted(table), dtype=float)
+        bounds = set()
+        for ranges in table.values():
+            for min_lot, max_lot in ranges:
+                bounds.update((min_lot, OPEN_END if max_lot is None else max_lot + 1))
+        # 第 i 段覆盖 [edges[i], edges[i+1])，最后一段（超出最大批量）样本量为 0
+        self.edges = np.array(sorted(bounds), dtype=np.int64)
+        self.sizes = np.zeros((len(self.levels), len(self.edges)), dtype=np.int64)
+        for i, level in enumerate(sorted(table)):
+            for (min_lot, max_lot), size in table[level].items():
+                end = OPEN_END if max_lot is None else max_lot + 1
+                self.sizes[i, (self.edges >= min_lot) & (self.edges < end)] = size
+        self.digest = hashlib.sha256(b''.join(np.ascontiguousarray(array).tobytes()
+                                              for array in (self.levels, self.edges, self.sizes))).hexdigest()
+
+    def level_index(self, levels) -> np.ndarray:
+        """Return the table row of each level, or -1 for levels not in the table."""
+        levels = np.asarray(levels, dtype=float)
+        idx = np.minimum(np.searchsorted(self.levels, levels), len(self.levels) - 1)
+        return np.where(self.levels[idx] == levels, idx, -1)
+
+    def has_level(self, level: float) -> bool:
+        return bool(self.level_index([level])[0] >= 0)
+
+    def nearest_level(self, level: float) -> float:
+        """Return the table level closest to level."""
+        return float(self.levels[np.abs(self.levels - level).argmin()])
+
+    def describe(self) -> str:
+        covered = self.edges[:-1][(self.sizes[:, :-1] > 0).any(axis=0)]
+        upper = '不设上限' if self.edges[-1] == OPEN_END and self.sizes[:, -2].any() else f"至 {self.edges[-1] - 1}"
+        return (f"抽样方案 {self.name}：AQL 级别 {', '.join(f'{level:g}' for level in self.levels)}，"
+                f"批量 {covered.min() if len(covered) else 0} {upper}")
+
+    def lookup(self, levels, lot_sizes) -> np.ndarray:
+        """Return min(lot_size, sample_size) per row, 0 for unknown levels or lot sizes outside every range.
+
+        levels and lot_sizes are broadcast against each other, so a column of levels and a row of lot
+        sizes give the whole level × lot-size matrix.
+        """
+        level_idx, lot_sizes = np.broadcast_arrays(self.level_index(levels), np.asarray(lot_sizes))
+        segment_idx = np.searchsorted(self.edges, lot_sizes, side='right') - 1
+        # 非整数批量只有落在 [min_lot, max_lot] 内才有效，例如 8.5 不属于 (2, 8) 或 (9, 15)
+        segment_end = self.edges[np.minimum(segment_idx + 1, len(self.edges) - 1)] - 1
+        valid = (level_idx >= 0) & (segment_idx >= 0) & (lot_sizes <= segment_end)
+        sizes = np.zeros(lot_sizes.shape, dtype=np.int64)
+        sizes[valid] = self.sizes[level_idx[valid], segment_idx[valid]]
+        return np.where(sizes > 0, np.minimum(lot_sizes, sizes), 0)
+
+
+def parse_plan_level(column) -> float:
+    """Return the AQL level of a plan file column such as 1.0, '2.5' or 'AQL 0.65'."""
+    text = str(column).strip()
+    match = AQL_LEVEL_PATTERN.search(text.upper()) if 'aql' in text.lower() else None
+    try:
+        return float(match.group(1) if match else text)
+    except ValueError:
+        raise ValueError(f"无法识别的 AQL 级别列：{column}") from None
+
+
+def read_sampling_plan(path: str, name: str | None = None) -> CompiledAQLTable:
+    """Read a sampling plan from a .csv or .xlsx data file and compile it.
+
+    The file has the columns 批量下限 and 批量上限 (blank for no upper limit) followed by one column
+    per AQL level holding the sample sizes; a blank cell means the level has no plan for that lot
+    range. One file holds one plan, e.g. one inspection level under normal, tightened or reduced
+    inspection. Ranges of a level must not overlap.
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith('.xlsx'):
+        frame = pd.read_excel(path, dtype=object)
+    else:
+        frame = pd.read_csv(path, dtype=str, encoding='utf-8-sig', skipinitialspace=True)
+    frame.columns = [str(col).strip() for col in frame.columns]
+    missing = [col for col in PLAN_RANGE_COLUMNS if col not in frame.columns]
+    if missing:
+        raise ValueError(f"抽样方案 {name} 缺少列：{', '.join(missing)}")
+    frame = frame.dropna(how='all')
+    levels = {col: parse_plan_level(col) for col in frame.columns if col not in PLAN_RANGE_COLUMNS}
+    if not levels:
+        raise ValueError(f"抽样方案 {name} 没有 AQL 级别列")
+    min_lots = pd.to_numeric(frame['批量下限'], errors='coerce')
+    max_lots = pd.to_numeric(frame['批量上限'], errors='coerce')
+    # 批量上限可以为空（不设上限），但不能是无法识别的值
+    bad_bounds = min_lots.isna() | (min_lots % 1 != 0) | (max_lots.notna() & (max_lots % 1 != 0)) | \
+        (max_lots < min_lots) | (frame['批量上限'].notna() & max_lots.isna())
+    if bad_bounds.any():
+        row = frame[bad_bounds].iloc[0]
+        raise ValueError(f"抽样方案 {name} 的批量范围无效：{row['批量下限']} - {row['批量上限']}")
+
+    table = {}
+    for col, level in levels.items():
+        sizes = pd.to_numeric(frame[col], errors='coerce')
+        if (frame[col].notna() & sizes.isna()).any() or (sizes < 0).any() or (sizes % 1 > 0).any():
+            raise ValueError(f"抽样方案 {name} 的 AQL {level:g} 列含有无效的样本量")
+        ranges = table.setdefault(level, {})
+        previous_end = None
+        for min_lot, max_lot, size in sorted(zip(min_lots, max_lots, sizes), key=lambda item: item[0]):
+            if pd.isna(size):
+                continue
+            if previous_end is not None and (previous_end == OPEN_END or min_lot <= previous_end):
+                raise ValueError(f"抽样方案 {name} 的 AQL {level:g} 列中批量范围重叠（批量 {int(min_lot)}）")
+            ranges[(int(min_lot), None if pd.isna(max_lot) else int(max_lot))] = int(size)
+            previous_end = OPEN_END if pd.isna(max_lot) else int(max_lot)
+    return CompiledAQLTable(table, name)
+
+
+class SamplingPlanRegistry:
+    """Named sampling plans: the built-in AQL table plus plans compiled from data files.
+
+    get() accepts a registered name or the path of a plan file. Files are compiled once at load
+    time and compiled again only after they change, so every lookup is a gather on the compiled
+    arrays whatever the size of the plan.
+    """
+
+    def __init__(self):
+        self.plans = {}
+        self.files = {}
+
+    def register(self, plan: CompiledAQLTable) -> None:
+        self.plans[plan.name] = plan
+
+    def load_directory(self, directory: str) -> list[str]:
+        """Register every plan file in directory under its file name (without extension) and return the names."""
+        names = []
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.lower().endswith(PLAN_FILE_EXTENSIONS):
+                plan = self.load_file(os.path.join(directory, file_name))
+                self.register(plan)
+                names.append(plan.name)
+        return names
+
+    def load_file(self, path: str) -> CompiledAQLTable:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        plan = self.files.get(key)
+        if plan is None:
+            plan = self.files[key] = read_sampling_plan(path)
+        return plan
+
+    def get(self, plan: str | None = None) -> CompiledAQLTable:
+        """Return the plan registered as plan, or compiled from the file at plan; None is the built-in plan."""
+        if plan is None or plan in self.plans:
+            return self.plans[DEFAULT_PLAN if plan is None else plan]
+        if os.path.isfile(plan):
+            return self.load_file(plan)
+        raise ValueError(f"未找到抽样方案：{plan}（可用方案：{', '.join(self.plans)}，或指定方案数据文件路径）")
+
+
+AQL_TABLE = CompiledAQLTable(AQL_SAMPLE_SIZE)
+SAMPLING_PLANS = SamplingPlanRegistry()
+SAMPLING_PLANS.register(AQL_TABLE)
+
+
+# 抽样规则类型
+RULE_INVALID = 0  # 无法识别的抽样频率
+RULE_FIXED = 1  # 固定抽样数量（首末件 2 件、1件/批 1 件）
+RULE_FULL = 2  # 100% 全检，抽样数量等于批次大小
+RULE_AQL = 3  # AQL 抽样，按级别查表
+RULE_AQL_INVALID = 4  # 含 AQL 但无法提取级别
+RULE_NAMES = {RULE_INVALID: '无效', RULE_FIXED: '固定数量', RULE_FULL: '全检', RULE_AQL: 'AQL', RULE_AQL_INVALID: 'AQL无效'}
+# 固定数量和全检规则不受“是否检验”影响，其余规则仅对需检验的行生效
+INSPECTION_INDEPENDENT_RULES = (RULE_FIXED, RULE_FULL)
+
+AQL_LEVEL_PATTERN = re.compile(r'AQL\s*(\d*\.?\d+)')
+
+
+class SamplingRule:
+    """One compiled 抽样频率: its kind, the fixed quantity for RULE_FIXED and the AQL level for RULE_AQL."""
+
+    __slots__ = ('kind', 'quantity', 'level')
+
+    def __init__(self, kind: int, quantity: int = 0, level: float = np.nan):
+        self.kind = kind
+        self.quantity = quantity
+        self.level = level
+
+    @property
+    def valid(self) -> bool:
+        return self.kind not in (RULE_INVALID, RULE_AQL_INVALID)
+
+    def __repr__(self) -> str:
+        return f"SamplingRule({RULE_NAMES[self.kind]}, quantity={self.quantity}, level={self.level})"
+
+
+def match_piece_per_lot(text: str) -> SamplingRule | None:
+    return SamplingRule(RULE_FIXED, quantity=1) if '1件' in text else None
+
+
+def match_first_last_piece(text: str) -> SamplingRule | None:
+    return SamplingRule(RULE_FIXED, quantity=2) if text == '首末件' else None
+
+
+def match_full_inspection(text: str) -> SamplingRule | None:
+    return SamplingRule(RULE_FULL) if '100%' in text else None
+
+
+def match_aql(text: str) -> SamplingRule | None:
+    if 'aql' not in text.lower():
+        return None
+    match = AQL_LEVEL_PATTERN.search(text)
+    return SamplingRule(RULE_AQL, level=float(match.group(1))) if match else SamplingRule(RULE_AQL_INVALID)
+
+
+# 按优先级排列：1件/批优先于首末件，二者优先于全检，最后才是 AQL
+DEFAULT_FREQUENCY_MATCHERS = [match_piece_per_lot, match_first_last_piece, match_full_inspection, match_aql]
+
+
+class SamplingRuleTable:
+    """Compile each distinct 抽样频率 string once into a SamplingRule and gather the rules per row.
+
+    Matchers are tried in order on the normalized string and the first non-None rule wins; strings
+    no matcher accepts (and missing values) compile to RULE_INVALID. Compiled rules are cached by
+    string for the lifetime of the table, so repeated runs in one process skip the parsing, and a
+    column is resolved with one factorize plus a gather on the integer codes.
+    """
+
+    def __init__(self, matchers: list | None = None):
+        self.matchers = list(DEFAULT_FREQUENCY_MATCHERS if matchers is None else matchers)
+        self.rules = {}
+
+    def register(self, matcher, before=None) -> None:
+        """Add a matcher, tried before the given matcher (or last), and drop the cached rules."""
+        position = self.matchers.index(before) if before is not None else len(self.matchers)
+        self.matchers.insert(position, matcher)
+        self.rules.clear()
+
+    def compile(self, text) -> SamplingRule:
+        rule = self.rules.get(text)
+        if rule is None:
+            rule = SamplingRule(RULE_INVALID)
+            if isinstance(text, str):
+                for matcher in self.matchers:
+                    matched = matcher(text)
+                    if matched is not None:
+                        rule = matched
+                        break
+            self.rules[text] = rule
+        return rule
+
+    def row_rules(self, frequencies: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the (kind, quantity, level) arrays of each row's rule."""
+        codes, uniques = pd.factorize(frequencies)
+        rules = [self.compile(text) for text in uniques] + [SamplingRule(RULE_INVALID)]
+        kinds = np.array([rule.kind for rule in rules], dtype=np.int8)
+        quantities = np.array([rule.quantity for rule in rules], dtype=np.int64)
+        levels = np.array([rule.level for rule in rules], dtype=float)
+        # 缺失值的编码为 -1，正好取到末尾的无效规则
+        return kinds[codes], quantities[codes], levels[codes]
+
+
+SAMPLING_RULES = SamplingRuleTable()
@@ -0,0 +1,325 @@
+"""Resident labor time calculation service with a local JSON/HTTP API.
+
+Run from the repository root:
+
+    python service.py --data-dir /path/to/reference --cards whole_rawdata.xlsx --port 8765
+
+The reference workbooks (batch_num.xlsx, database.xlsx, BOM.xlsx) and the optional inspection-card
+file are loaded once and kept in memory; before every request their size and modification time
+are checked and a changed file is reloaded, so a query only pays for its own rows.
+
+    GET  /health    服务状态、参考数据加载时间与检验卡行数
+    POST /sheet1    {"rows": [检验卡行, ...], "batch_size": 200} -> 这些行的 Sheet1 结果
+    POST /product   {"产品编码": "405312", "batch_size": 200} -> 常驻检验卡中该产品的 Sheet1 结果
+    GET  /product?产品编码=405312&batch_size=200
+
+batch_size may be omitted or null to use the product's historical median lot size. Both POST
+bodies (and the GET query) also accept "tool_hours_version", a tool-hours version such as "v2"
+or a date, to reproduce results against an older database.xlsx. Responses hold
+"sheet1" (records, missing values as null), "warnings" and "elapsed_ms"; errors return
+{"error": ...} with status 400 for invalid requests, 404 for unknown products and 500 otherwise.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from debuglog import LEVEL_NAMES
+from engine import LaborTimeEngine
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# 单个请求最多返回的警告条数
+MAX_WARNINGS = 50
+# 请求体上限，防止误传超大文件
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class RequestError(ValueError):
+    """Raised for a request that cannot be answered, carrying the HTTP status to return."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def file_signature(path: str) -> tuple[int, int] | None:
+    """Return (mtime_ns, size) of a file, or None when it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_batch_size(value) -> float | None:
+    """Validate a batch size from a request, None meaning the historical median."""
+    if value is None or value == '':
+        return None
+    try:
+        batch_size = float(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"批量大小必须是数字：{value}")
+    if batch_size <= 0:
+        raise RequestError("批量大小必须是正数。")
+    return batch_size
+
+
+class CalculationService:
+    """Keep references and inspection cards warm and answer Sheet1 queries against them.
+
+    Each request runs on its own LaborTimeEngine so concurrent requests never share debug logs or
+    per-run state; the loaded references and the prepared inspection-card frame are only read.
+    """
+
+    REFERENCE_FILES = ('batch_num.xlsx', 'database.xlsx', 'BOM.xlsx')
+
+    def __init__(self, data_dir: str | None = None, cards_path: str | None = None, cache_dir: str | None = None,
+                 use_cache: bool = True, log_level: str = '警告', max_sample_rows: int = 5,
+                 tool_hours_dir: str | None = None, sampling_plan: str | None = None):
+        self.data_dir = data_dir
+        self.cards_path = os.path.abspath(cards_path) if cards_path else None
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.log_level = log_level
+        self.max_sample_rows = max_sample_rows
+        self.tool_hours_dir = tool_hours_dir
+        self.sampling_plan = sampling_plan
+        self.lock = threading.Lock()
+        self.references = None
+        self.reference_signatures = None
+        self.references_loaded_at = None
+        # 请求中指定的量具工时版本 -> 快照，参考数据重新加载时清空
+        self.pinned_tool_hours = {}
+        self.cards = None
+        self.cards_signature = None
+        self.cards_loaded_at = None
+
+    def new_engine(self) -> LaborTimeEngine:
+        return LaborTimeEngine(data_dir=self.data_dir, cache_dir=self.cache_dir, use_cache=self.use_cache,
+                               log_level=self.log_level, max_sample_rows=self.max_sample_rows,
+                               tool_hours_dir=self.tool_hours_dir, sampling_plan=self.sampling_plan)
+
+    def reference_signatures_now(self, engine: LaborTimeEngine) -> dict:
+        return {name: file_signature(engine.reference_path(name)) for name in self.REFERENCE_FILES}
+
+    def current_references(self) -> dict:
+        """Return the loaded references, reloading them first if any reference workbook changed."""
+        with self.lock:
+            engine = self.new_engine()
+            signatures = self.reference_signatures_now(engine)
+            if self.references is None or signatures != self.reference_signatures:
+                self.references = engine.load_references()
+                self.pinned_tool_hours = {}
+                self.reference_signatures = signatures
+                self.references_loaded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            return self.references
+
+    def references_for(self, payload: dict) -> dict:
+        """Return the current references, with the tool hours of payload['tool_hours_version'] when given."""
+        references = self.current_references()
+        pin = payload.get('tool_hours_version')
+        if pin is None or str(pin).strip() == '':
+            return references
+        pin = str(pin).strip()
+        with self.lock:
+            if pin not in self.pinned_tool_hours:
+                engine = self.new_engine()
+                engine.tool_hours_version = pin
+                try:
+                    self.pinned_tool_hours[pin] = engine.load_and_validate_database()
+                except ValueError as e:
+                    raise RequestError(str(e))
+            return {**references, 'tool_to_hours_base': self.pinned_tool_hours[pin]}
+
+    def current_cards(self) -> pd.DataFrame:
+        """Return the prepared resident inspection cards, reloading the file first if it changed."""
+        if self.cards_path is None:
+            raise RequestError("服务未加载检验卡文件（启动时使用 --cards 指定），无法按产品编码查询")
+        with self.lock:
+            signature = file_signature(self.cards_path)
+            if self.cards is None or signature != self.cards_signature:
+                self.cards = self.new_engine().load_and_validate_test_data(self.cards_path)
+                self.cards_signature = signature
+                self.cards_loaded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            return self.cards
+
+    def warm_up(self) -> None:
+        self.current_references()
+        if self.cards_path is not None:
+            self.current_cards()
+
+    def calculate(self, engine: LaborTimeEngine, df_test: pd.DataFrame, batch_size: float | None,
+                  references: dict, started: float) -> dict:
+        sheet1_data, _, _ = engine.compute_test_data(df_test, batch_size, references)
+        warnings = [entry['信息'] for entry in engine.debug_info if entry['类别'] in ('警告', '错误')]
+        return {
+            'sheet1': json.loads(sheet1_data.to_json(orient='records', force_ascii=False)),
+            'warnings': warnings[:MAX_WARNINGS],
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def sheet1_for_rows(self, payload: dict) -> dict:
+        """Calculate Sheet1 for the inspection-card rows posted in payload['rows']."""
+        started = time.perf_counter()
+        rows = payload.get('rows')
+        if not isinstance(rows, list) or not rows:
+            raise RequestError("请求中缺少检验卡行：rows 必须是非空列表")
+        batch_size = parse_batch_size(payload.get('batch_size'))
+        references = self.references_for(payload)
+        engine = self.new_engine()
+        df_test = pd.DataFrame(rows)
+        if '产品编码' in df_test.columns:
+            # 与读取 Excel 时一致，产品编码按文本处理
+            df_test['产品编码'] = df_test['产品编码'].map(lambda value: value if pd.isna(value) else str(value))
+        df_test = engine.prepare_test_data(df_test, '请求数据')
+        return self.calculate(engine, df_test, batch_size, references, started)
+
+    def sheet1_for_product(self, payload: dict) -> dict:
+        """Calculate Sheet1 for one product of the resident inspection cards at a given batch size."""
+        started = time.perf_counter()
+        product = payload.get('产品编码')
+        if product is None or str(product).strip() == '':
+            raise RequestError("请求中缺少产品编码")
+        product = str(product).strip()
+        batch_size = parse_batch_size(payload.get('batch_size'))
+        references = self.references_for(payload)
+        cards = self.current_cards()
+        df_test = cards[(cards['产品编码'] == product).to_numpy()]
+        if df_test.empty:
+            raise RequestError(f"检验卡中没有产品编码 {product}", status=404)
+        return self.calculate(self.new_engine(), df_test.copy(), batch_size, references, started)
+
+    def health(self) -> dict:
+        return {
+            'status': 'ok',
+            'references_loaded_at': self.references_loaded_at,
+            'tool_hours_version': None if self.references is None else self.references['tool_to_hours_base'].version,
+            'cards_path': self.cards_path,
+            'cards_loaded_at': self.cards_loaded_at,
+            'cards_rows': None if self.cards is None else len(self.cards),
+        }
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """Route the JSON API to the server's CalculationService."""
+
+    server_version = 'LaborTimeService/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self.respond(200, self.server.service.health())
+        elif url.path == '/product':
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self.handle_call(self.server.service.sheet1_for_product, query)
+        else:
+            self.respond(404, {'error': f"未知路径 {url.path}"})
+
+    def do_POST(self):
+        routes = {'/sheet1': self.server.service.sheet1_for_rows, '/product': self.server.service.sheet1_for_product}
+        handler = routes.get(urlsplit(self.path).path)
+        if handler is None:
+            self.respond(404, {'error': f"未知路径 {self.path}"})
+            return
+        try:
+            payload = self.read_json()
+        except RequestError as e:
+            self.respond(e.status, {'error': str(e)})
+            return
+        self.handle_call(handler, payload)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise RequestError(f"请求体超过 {MAX_BODY_BYTES // 1024 // 1024} MB", status=413)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise RequestError(f"请求体不是有效的 JSON：{e}")
+        if not isinstance(payload, dict):
+            raise RequestError("请求体必须是 JSON 对象")
+        return payload
+
+    def handle_call(self, handler, payload: dict) -> None:
+        try:
+            self.respond(200, handler(payload))
+        except RequestError as e:
+            self.respond(e.status, {'error': str(e)})
+        except (ValueError, KeyError) as e:
+            self.respond(400, {'error': f"计算失败：{e}"})
+        except Exception as e:
+            self.log_error("%s", traceback.format_exc())
+            self.respond(500, {'error': f"计算失败：{e}"})
+
+    def respond(self, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service: CalculationService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                quiet: bool = False) -> ThreadingHTTPServer:
+    """Return an HTTP server bound to host:port that answers with service."""
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="批次检验工时计算常驻服务（本地 JSON/HTTP 接口）")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="监听地址，默认仅本机访问")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--data-dir", default=None,
+                        help="batch_num.xlsx / database.xlsx / BOM.xlsx 所在目录，默认为程序目录")
+    parser.add_argument("--cards", default=None, help="常驻的检验卡文件 (.xlsx)，用于按产品编码查询")
+    parser.add_argument("--cache-dir", default=None, help="参考数据缓存目录，默认为 ~/.batch_labor_time_cache")
+    parser.add_argument("--no-cache", action="store_true", help="不使用参考数据缓存，每次重新解析 Excel")
+    parser.add_argument("--tool-hours-dir", default=None, help="量具工时版本库目录，默认位于参考数据缓存目录中")
+    parser.add_argument("--sampling-plan", default=None, metavar="PLAN",
+                        help="抽样方案：已注册的方案名称或方案数据文件 (.csv/.xlsx) 路径，默认使用内置 AQL 抽样表")
+    parser.add_argument("--log-level", choices=LEVEL_NAMES, default='warning',
+                        help="每个请求记录的最低级别，warning 及以上的条目作为 warnings 返回")
+    parser.add_argument("--quiet", action="store_true", help="不打印每个请求的访问日志")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    service = CalculationService(data_dir=args.data_dir, cards_path=args.cards, cache_dir=args.cache_dir,
+                                 use_cache=not args.no_cache, log_level=LEVEL_NAMES[args.log_level],
+                                 tool_hours_dir=args.tool_hours_dir, sampling_plan=args.sampling_plan)
+    try:
+        service.warm_up()
+    except Exception as e:
+        print(f"错误：加载数据失败：{e}", file=sys.stderr)
+        return 1
+    server = make_server(service, args.host, args.port, args.quiet)
+    print(f"服务已启动：http://{args.host}:{server.server_address[1]}（Ctrl+C 停止）", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
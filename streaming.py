@@ -0,0 +1,70 @@
+import os
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+# 流式模式默认每块行数
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _convert_cell(value):
+    # 与 pd.read_excel 一致：空单元格读为 NaN，整数值的浮点单元格读为 int；
+    # read_excel 会把含空值的整列升为 float，归一化时由 engine.cell_text 统一写成整数文本
+    if value is None:
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def iter_excel_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield the first worksheet in DataFrames of at most chunk_size rows using openpyxl read-only mode.
+
+    Columns are object dtype holding the cell values as read, so every chunk is normalized the same
+    way regardless of which values happen to fall into it. 产品编码 is read as text as in the
+    non-streaming path.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            buffer.append([_convert_cell(value) for value in row])
+            if len(buffer) >= chunk_size:
+                yield _make_chunk(buffer, columns)
+                buffer = []
+        if buffer:
+            yield _make_chunk(buffer, columns)
+    finally:
+        workbook.close()
+
+
+def _make_chunk(rows: list, columns: list) -> pd.DataFrame:
+    width = len(columns)
+    rows = [row[:width] if len(row) >= width else row + [np.nan] * (width - len(row)) for row in rows]
+    df = pd.DataFrame(rows, columns=columns, dtype=object)
+    if '产品编码' in df.columns:
+        df['产品编码'] = df['产品编码'].map(lambda value: value if pd.isna(value) else str(value))
+    return df
+
+
+def iter_csv_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield a CSV export in DataFrames of at most chunk_size rows, all columns read as text."""
+    yield from pd.read_csv(file_path, dtype=str, chunksize=chunk_size, encoding='utf-8-sig')
+
+
+def iter_test_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield chunks of an inspection-card file, choosing the reader by extension (.xlsx or .csv)."""
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        return iter_csv_chunks(file_path, chunk_size)
+    return iter_excel_chunks(file_path, chunk_size)
+
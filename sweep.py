@@ -0,0 +1,166 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from sampling import AQL_TABLE, RULE_AQL, RULE_FIXED, RULE_FULL, SAMPLING_RULES, CompiledAQLTable
+
+# 一次扫描最多的批量大小个数（曲线表每个批量占一列）
+MAX_SWEEP_SIZES = 1000
+# 按批量分块计算时每块最多的单元格数（工序数 × 批量数），限制中间矩阵的内存
+SWEEP_BLOCK_CELLS = 5_000_000
+# 工序曲线图中显示的工序数（按最小批量下的单件工时从大到小）
+TOP_CURVES = 10
+# 曲线表中与批量无关的列
+CURVE_COLUMNS = ['产品编码', '检验卡编号', '版本', '工艺编号', 'Production Version', '工序号', '工序名称',
+                 '变更前Setup Personal time批量准备工时', '变更前Labor time单件工时', '变更后Setup Personal time批量准备工时',
+                 'BOM匹配']
+
+
+def parse_batch_sizes(text: str) -> list[int]:
+    """Parse a batch-size list such as '50,100,200' or '10:1000:10' (inclusive), or a mix of both.
+
+    Sizes are truncated to integers as a single batch size is, then deduplicated and sorted.
+    """
+    sizes = set()
+    for item in re.split(r'[,，\s]+', text.strip()):
+        if not item:
+            continue
+        parts = item.split(':')
+        try:
+            numbers = [float(part) for part in parts]
+        except ValueError:
+            raise ValueError(f"批量大小必须是数字或 起始:结束:步长：{item}")
+        if len(numbers) == 1:
+            values = numbers
+        elif len(numbers) == 3 and numbers[2] > 0:
+            start, stop, step = numbers
+            count = int(np.floor((stop - start) / step + 1e-9)) + 1
+            if count > MAX_SWEEP_SIZES:
+                raise ValueError(f"批量大小个数不能超过 {MAX_SWEEP_SIZES}：{item}")
+            values = [start + i * step for i in range(max(count, 0))]
+        else:
+            raise ValueError(f"批量大小范围的格式为 起始:结束:步长（步长为正数）：{item}")
+        for value in values:
+            if int(value) <= 0:
+                raise ValueError("批量大小必须是正数。")
+            sizes.add(int(value))
+    if not sizes:
+        raise ValueError("批量大小列表不能为空。")
+    if len(sizes) > MAX_SWEEP_SIZES:
+        raise ValueError(f"批量大小个数不能超过 {MAX_SWEEP_SIZES}")
+    return sorted(sizes)
+
+
+def sample_quantity_matrix(kinds: np.ndarray, fixed_quantities: np.ndarray, aql_levels: np.ndarray,
+                           inspected: np.ndarray, lot_sizes: np.ndarray,
+                           aql_table: CompiledAQLTable = AQL_TABLE) -> np.ndarray:
+    """Return the rows × lot sizes matrix of sampling quantities for user-given integer batch sizes.
+
+    Applies the same rules as LaborTimeEngine.calculate_sampling_quantity, with the AQL table looked
+    up for every (level, lot size) pair in one broadcast call.
+    """
+    lot_sizes = np.asarray(lot_sizes, dtype=np.int64)
+    quantities = np.zeros((len(kinds), len(lot_sizes)), dtype=np.int64)
+    fixed = kinds == RULE_FIXED
+    quantities[fixed] = fixed_quantities[fixed, None]
+    quantities[kinds == RULE_FULL] = lot_sizes
+    aql = inspected & (kinds == RULE_AQL)
+    quantities[aql] = aql_table.lookup(aql_levels[aql, None], lot_sizes[None, :])
+    return quantities
+
+
+def group_hours_matrix(df_test: pd.DataFrame, group_ids: np.ndarray, n_groups: int,
+                       lot_sizes: list[int], aql_table: CompiledAQLTable = AQL_TABLE) -> tuple[np.ndarray, list[int]]:
+    """Return the groups × lot sizes matrix of summed 工时 and the lot sizes where AQL rows fall outside the table.
+
+    Sampling quantities only depend on the compiled rule and 是否检验, so they are computed once per
+    distinct (rule, 是否检验) pair and gathered per row; the rows × lot sizes products are summed per
+    group in blocks of lot sizes to bound memory.
+    """
+    kinds, fixed_quantities, aql_levels = SAMPLING_RULES.row_rules(df_test['抽样频率'])
+    inspected = (df_test['是否检验'] == '是').to_numpy()
+    combos, _ = pd.MultiIndex.from_arrays(
+        [kinds, fixed_quantities, np.nan_to_num(aql_levels, nan=-1.0), inspected]).factorize()
+    first = np.unique(combos, return_index=True)[1]
+    lot_sizes = np.asarray(lot_sizes, dtype=np.int64)
+    combo_quantities = sample_quantity_matrix(kinds[first], fixed_quantities[first], aql_levels[first],
+                                              inspected[first], lot_sizes, aql_table)
+
+    aql_combos = inspected[first] & (kinds[first] == RULE_AQL)
+    out_of_range = lot_sizes[(combo_quantities[aql_combos] == 0).any(axis=0)].tolist() if aql_combos.any() else []
+
+    unit_hours = df_test['单件工时'].to_numpy(dtype=float)
+    in_group = group_ids >= 0
+    order = np.argsort(group_ids[in_group], kind='stable')
+    rows = np.flatnonzero(in_group)[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(group_ids[rows]) != 0]) if len(rows) else np.array([], dtype=int)
+    hours = np.zeros((n_groups, len(lot_sizes)))
+    if not len(rows):
+        return hours, out_of_range
+    block = max(1, SWEEP_BLOCK_CELLS // len(rows))
+    for start in range(0, len(lot_sizes), block):
+        columns = slice(start, start + block)
+        row_hours = combo_quantities[combos[rows], columns] * unit_hours[rows, None]
+        hours[group_ids[rows[starts]], columns] = np.add.reduceat(row_hours, starts, axis=0)
+    return hours, out_of_range
+
+
+def curve_column(lot_size: int) -> str:
+    return f"批量{lot_size}"
+
+
+def build_curves(sheet1_data: pd.DataFrame, batch_hours: np.ndarray,
+                 lot_sizes: list[int]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the per-operation curve table and the per-lot-size summary from Sheet1 and its 批次工时 matrix.
+
+    The curve table holds 变更后Labor time单件工时 for every lot size, one column per size. The
+    summary lists, per lot size, the operation count, the totals and the curves of the TOP_CURVES
+    operations with the highest unit labor time at the smallest lot size.
+    """
+    lot_sizes = np.asarray(lot_sizes, dtype=np.int64)
+    unit_labor = np.round(batch_hours / lot_sizes[None, :], 3)
+    curves = pd.concat([sheet1_data[CURVE_COLUMNS].reset_index(drop=True),
+                        pd.DataFrame(unit_labor, columns=[curve_column(size) for size in lot_sizes])], axis=1)
+
+    summary = pd.DataFrame({
+        '批次大小': lot_sizes,
+        '工序数': len(sheet1_data),
+        '批次工时合计': batch_hours.sum(axis=0).round(6),
+        '变更后Labor time单件工时合计': unit_labor.sum(axis=0).round(3),
+    })
+    top = np.argsort(-unit_labor[:, 0], kind='stable')[:TOP_CURVES] if len(unit_labor) else []
+    for i in top:
+        row = sheet1_data.iloc[i]
+        label = f"{row['产品编码']}/{row['检验卡编号']}/{row['工艺编号']}/{row['工序号']}"
+        summary[label if label not in summary.columns else f"{label}#{i}"] = unit_labor[i]
+    return curves, summary
+
+
+def curve_charts(summary_sheet: str, summary: pd.DataFrame) -> dict:
+    """Return chart sheet specs (see writer.write_workbook) plotting the summary sheet against 批次大小."""
+    last_row = len(summary)
+    categories = [summary_sheet, 1, 0, last_row, 0]
+
+    def series(column: int) -> dict:
+        return {'name': [summary_sheet, 0, column], 'categories': categories,
+                'values': [summary_sheet, 1, column, last_row, column], 'marker': {'type': 'circle', 'size': 4}}
+
+    total_column = summary.columns.get_loc('变更后Labor time单件工时合计')
+    charts = {
+        '单件工时曲线': {
+            'type': 'scatter', 'subtype': 'straight_with_markers',
+            'title': '变更后Labor time单件工时合计 - 批次大小',
+            'x_axis': {'name': '批次大小'}, 'y_axis': {'name': '单件工时合计 (H)'},
+            'series': [series(total_column)],
+        },
+    }
+    operation_columns = range(total_column + 1, len(summary.columns))
+    if len(operation_columns):
+        charts['工序曲线'] = {
+            'type': 'scatter', 'subtype': 'straight_with_markers',
+            'title': f"单件工时最高的 {len(operation_columns)} 个工序",
+            'x_axis': {'name': '批次大小'}, 'y_axis': {'name': '变更后Labor time单件工时 (H)'},
+            'series': [series(column) for column in operation_columns],
+        }
+    return charts
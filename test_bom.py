@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from bom import BOM_KEY_COLUMNS, BOM_VALUE_COLUMNS, NO_MATCH, BomIndex
+
+BOM = pd.DataFrame({
+    'Description': ['R1', 'R2', 'R1', 'R3', 'R2'],
+    'Operation/Activity N': ['0010', '0010', '0020', '0010', '0010'],
+    'Production Version': ['0001', '0001', '0002', '0001', '0002'],
+    'Setup Personal time': [0.1, 0.2, 0.3, 0.4, 0.5],
+    'Labor time': [0.01, 0.02, 0.03, 0.04, 0.05],
+})
+CARDS = pd.DataFrame({
+    '工艺编号': ['R2', 'R1', 'R9', 'R1', 'R3', 'R2'],
+    '工序号': ['0010', '0010', '0010', '0020', '0030', '0010'],
+})
+
+
+def merged() -> pd.DataFrame:
+    return CARDS.merge(BOM, how='left', left_on=['工艺编号', '工序号'], right_on=BOM_KEY_COLUMNS)
+
+
+def test_expand_matches_left_merge():
+    index = BomIndex.from_frame(BOM)
+    rows, values = index.expand(index.positions(CARDS['工艺编号'], CARDS['工序号']))
+    expected = merged()
+    np.testing.assert_array_equal(CARDS['工艺编号'].to_numpy()[rows], expected['工艺编号'].to_numpy())
+    pd.testing.assert_frame_equal(values, expected[BOM_VALUE_COLUMNS])
+
+
+def test_first_values_match_first_merged_row():
+    index = BomIndex.from_frame(BOM)
+    positions = index.positions(CARDS['工艺编号'], CARDS['工序号'])
+    assert (positions == NO_MATCH).tolist() == [False, False, True, False, True, False]
+    np.testing.assert_array_equal(index.multiplicity(positions), [2, 1, 1, 1, 1, 2])
+    expected = merged()[~CARDS.index.repeat(index.multiplicity(positions)).duplicated()]
+    pd.testing.assert_frame_equal(index.first_values(positions), expected[BOM_VALUE_COLUMNS].reset_index(drop=True))
+
+
+def test_entry_round_trip():
+    index = BomIndex.from_entry(BomIndex.from_frame(BOM).to_entry())
+    assert len(index) == len(BOM)
+    rows, values = index.expand(index.positions(CARDS['工艺编号'], CARDS['工序号']))
+    pd.testing.assert_frame_equal(values, merged()[BOM_VALUE_COLUMNS])
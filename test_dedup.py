@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+import dedup
+from dedup import TEST_DEDUP_COLUMNS, KeyDeduplicator
+
+CARDS = pd.DataFrame({
+    '工艺编号': ['R1', 'R1', 'R2', 'R1', None, 'R2', None, 'R3', 'R1'],
+    '工序号': ['0010', '0020', '0010', '0010', '0010', '0010', '0010', '0010', '0010'],
+    '尺寸内容': ['D1', 'D2', 'D3', 'D1', 'D5', 'D6', 'D7', 'D8', 'D9'],
+})
+
+
+def test_keep_mask_matches_duplicated():
+    for cards in (CARDS, CARDS.astype({'工艺编号': 'category', '工序号': 'category'})):
+        keep = KeyDeduplicator(TEST_DEDUP_COLUMNS).keep_mask(cards)
+        np.testing.assert_array_equal(keep, ~cards.duplicated(TEST_DEDUP_COLUMNS).to_numpy())
+
+
+def test_chunks_match_whole_frame():
+    deduplicator = KeyDeduplicator(TEST_DEDUP_COLUMNS, across_chunks=True)
+    keep = np.concatenate([deduplicator.keep_mask(CARDS.iloc[start:start + 4]) for start in range(0, len(CARDS), 4)])
+    whole = KeyDeduplicator(TEST_DEDUP_COLUMNS)
+    np.testing.assert_array_equal(keep, whole.keep_mask(CARDS))
+    pd.testing.assert_frame_equal(deduplicator.report(), whole.report())
+
+
+def test_report_counts_repeats_and_differing_rows():
+    deduplicator = KeyDeduplicator(TEST_DEDUP_COLUMNS)
+    deduplicator.keep_mask(CARDS)
+    report = deduplicator.report()
+    assert report[['工艺编号', '出现次数', '首行序号', '内容不同行数']].values.tolist() == [
+        ['R1', 3, 1, 1], ['R2', 2, 3, 1], [None, 2, 5, 1]]
+    assert deduplicator.dropped_rows == 4
+
+
+def test_hash_collisions_fall_back_to_exact_keys(monkeypatch):
+    monkeypatch.setattr(dedup, 'hash_keys', lambda df, columns: np.zeros(len(df), dtype=np.uint64))
+    deduplicator = KeyDeduplicator(TEST_DEDUP_COLUMNS)
+    keep = deduplicator.keep_mask(CARDS)
+    np.testing.assert_array_equal(keep, ~CARDS.duplicated(TEST_DEDUP_COLUMNS).to_numpy())
+    assert deduplicator.collisions > 0
@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+
+import delta
+from delta import diff_snapshots, save_snapshot, snapshot_frame, write_delta
+
+
+def sheet1(rows):
+    return pd.DataFrame(rows, columns=['产品编码', '检验卡编号', '版本', '工艺编号', '工序号', '工序名称',
+                                       '变更后Setup Personal time批量准备工时', '变更后Labor time单件工时',
+                                       '批次工时', '批次大小'])
+
+
+PREVIOUS = sheet1([
+    ['P1', 'C1', 'A', 'R1', '0010', '车削', 0.2, 0.01, 1.0, 100],
+    ['P1', 'C1', 'A', 'R1', '0020', '磨削', 0.2, 0.02, 2.0, 100],
+    ['P1', 'C1', 'A', 'R1', '0020', '磨削', 0.3, 0.03, 3.0, 100],
+    ['P1', 'C1', 'A', 'R1', '0020', '磨削', 0.4, 0.04, 4.0, 100],
+    ['P1', 'C1', 'A', 'R1', '0030', '终检', 0.1, 0.01, 5.0, 100],
+])
+
+
+def test_repeated_keys_are_merged():
+    frame = snapshot_frame(PREVIOUS)
+    assert len(frame) == 3
+    assert frame['key_hash'].is_unique
+    assert frame.loc[1, '批次工时'] == 9.0
+
+
+def test_removing_a_repeated_row_changes_only_its_operation():
+    current = PREVIOUS.drop(index=2)
+    delta = diff_snapshots(snapshot_frame(PREVIOUS), snapshot_frame(current))
+    assert delta['变更类型'].tolist() == ['变更']
+    assert delta['工序号'].tolist() == ['0020']
+    assert delta['批次工时差值'].tolist() == [-3.0]
+
+
+def test_unchanged_snapshots_have_no_delta():
+    assert diff_snapshots(snapshot_frame(PREVIOUS), snapshot_frame(PREVIOUS.iloc[::-1])).empty
+
+
+def test_large_delta_is_written_as_csv(tmp_path, monkeypatch):
+    save_snapshot(str(tmp_path / 'previous'), PREVIOUS.iloc[:1])
+    save_snapshot(str(tmp_path / 'current'), PREVIOUS.iloc[1:])
+    # 差异有 3 行，模拟只能容纳 2 行的工作表
+    monkeypatch.setattr(delta, 'fits_xlsx', lambda df: len(df) <= 2)
+    output = str(tmp_path / 'delta.xlsx')
+    _, stats = write_delta(str(tmp_path / 'previous'), str(tmp_path / 'current'), output)
+
+    csv_path = str(tmp_path / 'delta_差异.csv')
+    assert [item['path'] for item in stats] == [csv_path, output]
+    assert len(pd.read_csv(csv_path)) == 3
+    assert '差异' not in pd.ExcelFile(output).sheet_names
+    assert os.path.exists(output)
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from benchmarks.generators import CARD_COLUMNS, generate_dataset
+from engine import SPECIAL_TOOLS
+
+
+def test_same_seed_gives_same_data():
+    first, second = generate_dataset(2000, seed=3), generate_dataset(2000, seed=3)
+    for name, frame in first.items():
+        pd.testing.assert_frame_equal(frame, second[name])
+    assert not generate_dataset(2000, seed=4)['cards'].equals(first['cards'])
+
+
+def test_cards_cover_the_cases_the_pipeline_handles():
+    data = generate_dataset(2000, seed=0)
+    cards = data['cards']
+    assert list(cards.columns) == CARD_COLUMNS and len(cards) == 2000
+    # 约一半的行重复已有的（工艺编号, 工序号）
+    assert 0.4 < cards.duplicated(['工艺编号', '工序号']).mean() < 0.6
+    assert cards['量具1层编码'].isna().any()
+    assert set(SPECIAL_TOOLS) <= set(data['database']['量具1层'].str.upper())
+    bom_keys = set(zip(data['bom']['Description'], data['bom']['Operation/Activity N']))
+    card_keys = set(zip(cards['工艺编号'].str.upper(), cards['工序号']))
+    assert bom_keys < card_keys
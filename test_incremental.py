@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+
+from engine import TEST_REQUIRED_COLUMNS, LaborTimeEngine
+from incremental import IncrementalState, diff_cards, row_hashes
+from writer import write_workbook
+
+ROWS = pd.DataFrame({
+    '产品编码': ['P1', 'P1', 'P2', 'P3'],
+    '检验卡编号': ['C1', 'C1', 'C2', 'C3'],
+    '版本': ['A', 'A', 'A', 'A'],
+    '工艺编号': ['R1', 'R1', 'R2', 'R3'],
+    '工序号': ['0010', '0020', '0010', '0010'],
+    '抽样频率': ['首末件', '100%', 'AQL1.0 C=0', '1件/批'],
+})
+VALUE_COLUMNS = list(ROWS.columns)
+
+
+def test_row_hashes_do_not_depend_on_dtype():
+    categorical = ROWS.astype('category')
+    pd.testing.assert_frame_equal(row_hashes(ROWS, VALUE_COLUMNS), row_hashes(categorical, VALUE_COLUMNS))
+
+
+def test_diff_cards():
+    current = ROWS.copy()
+    current.loc[1, '抽样频率'] = 'AQL2.5 C=0'
+    current = pd.concat([current[current['检验卡编号'] != 'C3'],
+                         ROWS.iloc[[3]].assign(检验卡编号='C4')], ignore_index=True)
+    previous_rows, current_rows = row_hashes(ROWS, VALUE_COLUMNS), row_hashes(current, VALUE_COLUMNS)
+    added, changed, removed = diff_cards(previous_rows, current_rows)
+    card_hash = dict(zip(current['检验卡编号'], current_rows['card_hash']))
+    previous_card_hash = dict(zip(ROWS['检验卡编号'], previous_rows['card_hash']))
+    assert added == {card_hash['C4']}
+    assert changed == {card_hash['C1']}
+    assert removed == {previous_card_hash['C3']}
+    assert diff_cards(previous_rows, previous_rows) == (set(), set(), set())
+
+
+def test_incremental_run_matches_full_run(tmp_path, data_dir, dataset):
+    cards_path = os.path.join(data_dir, 'whole_rawdata.xlsx')
+    state = IncrementalState(str(tmp_path / 'state'))
+    engine = LaborTimeEngine(data_dir=data_dir, use_cache=False, parallel_load=False)
+    engine.compute_file_incremental(cards_path, None, engine.load_references(), state)
+
+    cards = dataset['cards']
+    first_card, last_card = cards['检验卡编号'].iloc[0], cards['检验卡编号'].iloc[-1]
+    cards.loc[cards['检验卡编号'] == first_card, '抽样频率'] = '100%'
+    cards = cards[cards['检验卡编号'] != last_card]
+    write_workbook(cards_path, {'Sheet1': cards})
+
+    engine = LaborTimeEngine(data_dir=data_dir, use_cache=False, parallel_load=False)
+    references = engine.load_references()
+    sheet1, sheet2, counts = engine.compute_file_incremental(cards_path, None, references, state)
+    assert counts['changed'] >= 1 and counts['removed'] >= 1 and counts['unchanged'] > 0
+
+    expected1, expected2, _ = engine.compute_file(cards_path, None, references)
+    pd.testing.assert_frame_equal(sheet1.reset_index(drop=True).astype(str),
+                                  expected1.reset_index(drop=True).astype(str))
+    pd.testing.assert_frame_equal(sheet2[TEST_REQUIRED_COLUMNS].reset_index(drop=True).astype(str),
+                                  expected2[TEST_REQUIRED_COLUMNS].reset_index(drop=True).astype(str))
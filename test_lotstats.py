@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from lotstats import LotSizeStore, build_stats
+from writer import write_workbook
+
+BATCH = pd.DataFrame({
+    'Material Number': ['14629', '14629', '14629', '110075', '110075', None, '14629', '405311'],
+    'Batch': [f"B{i}" for i in range(8)],
+    'Order quantity (GMEIN)': [100, 77, 'n/a', 40, 60, 500, 100, 3],
+})
+
+
+def baseline(batch: pd.DataFrame) -> tuple[dict, pd.Series]:
+    """Medians and distribution as computed from the whole sheet before the statistics store."""
+    quantities = pd.to_numeric(batch['Order quantity (GMEIN)'], errors='coerce').fillna(0)
+    medians = quantities.groupby(batch['Material Number']).median().to_dict()
+    return medians, quantities.describe()
+
+
+def save(path: str, batch: pd.DataFrame) -> None:
+    write_workbook(path, {'Sheet1': batch}, text_sheets=('Sheet1',))
+
+
+def assert_matches_baseline(stats, batch):
+    medians, described = baseline(batch)
+    assert dict(stats.items()) == medians
+    np.testing.assert_allclose(stats.describe().to_numpy(), described.to_numpy())
+    assert stats.default_lot_size == described['50%']
+    materials = pd.Series(['14629', 'NOPE', None, '405311'])
+    np.testing.assert_array_equal(stats.lookup(materials), [medians['14629'], np.nan, np.nan, 3.0])
+
+
+def test_stats_match_groupby_median(tmp_path):
+    path = str(tmp_path / 'batch_num.xlsx')
+    save(path, BATCH)
+    assert_matches_baseline(build_stats(path, chunk_size=3), BATCH)
+
+
+def test_store_appends_and_rebuilds(tmp_path):
+    path = str(tmp_path / 'batch_num.xlsx')
+    store = LotSizeStore(str(tmp_path / 'store'))
+    save(path, BATCH)
+    assert store.load(path, chunk_size=3)[1] == 'rebuilt'
+    assert store.load(path, chunk_size=3)[1] == 'cached'
+
+    appended = pd.concat([BATCH, BATCH.iloc[[0, 3]].assign(**{'Order quantity (GMEIN)': [10, 90]})],
+                         ignore_index=True)
+    save(path, appended)
+    stats, how, new_rows = store.load(path, chunk_size=3)
+    assert (how, new_rows) == ('appended', 2)
+    assert_matches_baseline(stats, appended)
+
+    edited = appended.copy()
+    edited.loc[1, 'Order quantity (GMEIN)'] = 1000
+    save(path, edited)
+    stats, how, _ = store.load(path, chunk_size=3)
+    assert how == 'rebuilt'
+    assert_matches_baseline(stats, edited)
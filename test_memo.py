@@ -0,0 +1,82 @@
+import os
+
+import pandas as pd
+
+from engine import LaborTimeEngine
+from memo import BUDGET_ENV, DEFAULT_BUDGET_MB, ResultCache, budget_from_environment, copy_frames, value_nbytes
+from writer import write_workbook
+
+FRAME = pd.DataFrame({'a': range(100), 'b': ['x'] * 100})
+
+
+def test_lru_eviction_within_budget():
+    size = value_nbytes(FRAME)
+    cache = ResultCache(max_bytes=2 * size)
+    assert cache.put('first', FRAME) and cache.put('second', FRAME)
+    assert cache.get('first') is FRAME
+    assert cache.put('third', FRAME)
+    assert cache.get('second') is None
+    assert cache.get('first') is FRAME and cache.get('third') is FRAME
+    assert cache.evictions == 1 and cache.total_bytes == 2 * size
+
+
+def test_value_larger_than_budget_is_not_stored():
+    cache = ResultCache(max_bytes=value_nbytes(FRAME) - 1)
+    assert not cache.put('key', FRAME)
+    assert len(cache) == 0 and cache.total_bytes == 0
+
+
+def test_copy_frames_isolates_cached_frames():
+    value = (FRAME, 3)
+    copied = copy_frames(value)
+    copied[0].loc[0, 'a'] = -1
+    assert FRAME.loc[0, 'a'] == 0 and copied[1] == 3
+
+
+def test_budget_from_environment(monkeypatch):
+    monkeypatch.setenv(BUDGET_ENV, '2')
+    assert budget_from_environment() == 2 * 1024 * 1024
+    monkeypatch.setenv(BUDGET_ENV, 'many')
+    assert budget_from_environment() == DEFAULT_BUDGET_MB * 1024 * 1024
+
+
+def compute(data_dir: str, cache: ResultCache, batch_size=None):
+    engine = LaborTimeEngine(data_dir=data_dir, use_cache=False, parallel_load=False, result_cache=cache)
+    sheet1, sheet2, _ = engine.compute(os.path.join(data_dir, 'whole_rawdata.xlsx'), batch_size)
+    reuse = [entry['信息'] for entry in engine.debug_info if entry['信息'].startswith('复用缓存')]
+    return sheet1, sheet2, reuse[0] if reuse else ''
+
+
+def uncached(data_dir: str, batch_size=None):
+    engine = LaborTimeEngine(data_dir=data_dir, use_cache=False, parallel_load=False)
+    return engine.compute(os.path.join(data_dir, 'whole_rawdata.xlsx'), batch_size)[:2]
+
+
+def assert_same(result, expected):
+    for frame, expected_frame in zip(result, expected):
+        pd.testing.assert_frame_equal(frame.reset_index(drop=True).astype(str),
+                                      expected_frame.reset_index(drop=True).astype(str))
+
+
+def test_results_are_reused_and_invalidated(data_dir, dataset):
+    cache = ResultCache()
+    first = compute(data_dir, cache)
+    assert '复用缓存的' not in first[2]
+    assert_same(first[:2], uncached(data_dir))
+
+    again = compute(data_dir, cache)
+    assert '计算结果' in again[2]
+    assert_same(again[:2], first[:2])
+
+    # 批量大小变化只重新汇总
+    resized = compute(data_dir, cache, 50)
+    assert '量具工时和BOM匹配' in resized[2] and '计算结果' not in resized[2]
+    assert_same(resized[:2], uncached(data_dir, 50))
+
+    # BOM 变化后重新匹配，检验卡数据仍复用
+    bom = dataset['bom']
+    bom['Labor time'] = bom['Labor time'] * 2
+    write_workbook(os.path.join(data_dir, 'BOM.xlsx'), {'Sheet1': bom})
+    rematched = compute(data_dir, cache)
+    assert '检验卡数据' in rematched[2] and '量具工时和BOM匹配' not in rematched[2]
+    assert_same(rematched[:2], uncached(data_dir))
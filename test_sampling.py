@@ -0,0 +1,79 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from engine import LaborTimeEngine
+from sampling import (AQL_SAMPLE_SIZE, AQL_TABLE, RULE_AQL, RULE_AQL_INVALID, RULE_FIXED, RULE_FULL, RULE_INVALID,
+                      SamplingRule, SamplingRuleTable)
+
+FREQUENCIES = ['首末件', '1件/批', '100%', '100%全检1件', 'AQL1.0 C=0', 'AQL2.5 C=0', 'AQL4.0 C=0', 'AQL 1.5',
+               'AQL10', 'AQL 6.5', 'AQLX', 'aql 2.5', '随机', '巡检', None]
+LOT_SIZES = [1, 2, 8, 8.5, 9, 100, 1200.4, 3200, 10000, 10001, 20000]
+
+
+def baseline_sampling_quantity(df_test: pd.DataFrame) -> pd.Series:
+    """The row-mask implementation the sampling rules replaced, without its warnings."""
+    quantity = pd.Series(0.0, index=df_test.index)
+    frequency = df_test['抽样频率']
+    no_inspection = df_test['是否检验'] != '是'
+    is_first_last_piece = frequency == '首末件'
+    is_piece_per_lot = frequency.str.contains('1件', case=False, na=False)
+    is_full_inspection = frequency.str.contains('100%', case=False, na=False)
+    is_aql = frequency.str.contains('AQL', case=False, na=False)
+    quantity[is_first_last_piece] = 2
+    quantity[is_piece_per_lot] = 1
+    full = is_full_inspection & ~is_piece_per_lot & ~is_first_last_piece
+    quantity[full] = df_test.loc[full, 'lot_size_median']
+    aql_rows = ~no_inspection & ~is_full_inspection & ~is_piece_per_lot & ~is_first_last_piece & is_aql
+    levels = frequency[aql_rows].str.extract(r'AQL\s*(\d*\.?\d+)', expand=False).astype(float)
+    for row, level in levels.dropna().items():
+        lot_size = int(round(df_test.loc[row, 'lot_size_median']))
+        for (min_lot, max_lot), size in AQL_SAMPLE_SIZE.get(level, {}).items():
+            if min_lot <= lot_size <= max_lot:
+                quantity[row] = min(lot_size, size)
+    return quantity
+
+
+def test_compiled_table_matches_dict_lookup():
+    lot_sizes = np.arange(0, 12000)
+    for level in [*AQL_SAMPLE_SIZE, 0.65, 6.5]:
+        expected = np.zeros(len(lot_sizes), dtype=np.int64)
+        for (min_lot, max_lot), size in AQL_SAMPLE_SIZE.get(level, {}).items():
+            in_range = (lot_sizes >= min_lot) & (lot_sizes <= max_lot)
+            expected[in_range] = np.minimum(lot_sizes[in_range], size)
+        np.testing.assert_array_equal(AQL_TABLE.lookup(level, lot_sizes), expected)
+
+
+def test_fractional_lot_sizes_between_ranges_get_no_sample():
+    np.testing.assert_array_equal(AQL_TABLE.lookup([1.0, 1.0, 1.0], [8.0, 8.5, 9.0]), [8, 0, 9])
+
+
+def test_rule_compiler_kinds():
+    table = SamplingRuleTable()
+    assert table.compile('首末件').kind == RULE_FIXED and table.compile('首末件').quantity == 2
+    assert table.compile('1件/批').quantity == 1
+    assert table.compile('100%全检1件').kind == RULE_FIXED
+    assert table.compile('100%').kind == RULE_FULL
+    assert table.compile('AQL 1.5').kind == RULE_AQL and table.compile('AQL 1.5').level == 1.5
+    assert table.compile('AQLX').kind == RULE_AQL_INVALID
+    assert table.compile('巡检').kind == RULE_INVALID
+    assert table.compile(None).kind == RULE_INVALID
+
+
+def test_registered_matcher_takes_precedence():
+    table = SamplingRuleTable()
+    assert table.compile('巡检').kind == RULE_INVALID
+    table.register(lambda text: SamplingRule(RULE_FIXED, quantity=3) if text == '巡检' else None)
+    assert table.compile('巡检').quantity == 3
+
+
+def test_sampling_quantity_matches_baseline():
+    rows = list(itertools.product(FREQUENCIES, ['是', '否'], LOT_SIZES))
+    df_test = pd.DataFrame(rows, columns=['抽样频率', '是否检验', 'lot_size_median'])
+    for col in ['检验卡编号', '工序名称', '量具1层编码']:
+        df_test[col] = 'x'
+    expected = baseline_sampling_quantity(df_test)
+
+    result = LaborTimeEngine().calculate_sampling_quantity(df_test.copy())
+    np.testing.assert_array_equal(result['抽样数量'].to_numpy(dtype=float), expected.to_numpy())
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import LaborTimeEngine
+from sampling import AQL_SAMPLE_SIZE, AQL_TABLE, SamplingPlanRegistry, read_sampling_plan
+
+
+def builtin_plan() -> pd.DataFrame:
+    """AQL_SAMPLE_SIZE as a plan file frame: one row per lot range, one column per level."""
+    ranges = list(AQL_SAMPLE_SIZE[1.0])
+    frame = pd.DataFrame({'批量下限': [low for low, _ in ranges], '批量上限': [high for _, high in ranges]})
+    for level, sizes in AQL_SAMPLE_SIZE.items():
+        frame[f"AQL {level:g}"] = [sizes[lot_range] for lot_range in ranges]
+    return frame
+
+
+def test_plan_files_compile_like_the_builtin_table(tmp_path):
+    csv_path, xlsx_path = str(tmp_path / '正常.csv'), str(tmp_path / '正常.xlsx')
+    builtin_plan().to_csv(csv_path, index=False, encoding='utf-8-sig')
+    builtin_plan().to_excel(xlsx_path, index=False)
+    for path in (csv_path, xlsx_path):
+        plan = read_sampling_plan(path)
+        assert plan.name == '正常'
+        assert plan.digest == AQL_TABLE.digest
+
+
+def test_open_upper_bound_and_blank_sizes(tmp_path):
+    path = str(tmp_path / 'plan.csv')
+    pd.DataFrame({'批量下限': [2, 91], '批量上限': [90, None], '1.0': [5, 20], '2.5': [3, None]}).to_csv(path, index=False)
+    plan = read_sampling_plan(path)
+    np.testing.assert_array_equal(plan.lookup(1.0, [1, 4, 90, 91, 10 ** 7]), [0, 4, 5, 20, 20])
+    np.testing.assert_array_equal(plan.lookup(2.5, [50, 91]), [3, 0])
+
+
+@pytest.mark.parametrize('frame', [
+    pd.DataFrame({'批量下限': [2], '1.0': [5]}),
+    pd.DataFrame({'批量下限': [2, 8], '批量上限': [10, 20], '1.0': [5, 8]}),
+    pd.DataFrame({'批量下限': [2], '批量上限': [10], '1.0': ['many']}),
+    pd.DataFrame({'批量下限': [10], '批量上限': [2], '1.0': [5]}),
+    pd.DataFrame({'批量下限': [2], '批量上限': [10], 'level': [5]}),
+])
+def test_invalid_plans_are_rejected(tmp_path, frame):
+    path = str(tmp_path / 'bad.csv')
+    frame.to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        read_sampling_plan(path)
+
+
+def test_registry_compiles_files_once_until_changed(tmp_path):
+    path = str(tmp_path / '加严.csv')
+    builtin_plan().to_csv(path, index=False)
+    registry = SamplingPlanRegistry()
+    assert registry.load_directory(str(tmp_path)) == ['加严']
+    assert registry.get('加严') is registry.get(path)
+    plan = builtin_plan()
+    plan['AQL 1'] = plan['AQL 1'] + 1
+    plan.to_csv(path, index=False)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert registry.get(path).digest != AQL_TABLE.digest
+    with pytest.raises(ValueError):
+        registry.get('不存在')
+
+
+def test_engine_with_plan_file_matches_builtin(tmp_path):
+    path = str(tmp_path / 'plan.csv')
+    builtin_plan().to_csv(path, index=False)
+    df_test = pd.DataFrame({'抽样频率': ['AQL1.0 C=0', 'AQL 1.5', 'AQL10', 'AQL2.5 C=0'] * 3,
+                            '是否检验': '是', 'lot_size_median': [5, 60, 400, 20000] * 3,
+                            '检验卡编号': 'C1', '工序名称': '终检', '量具1层编码': 'x'})
+    expected = LaborTimeEngine().calculate_sampling_quantity(df_test.copy())['抽样数量']
+    engine = LaborTimeEngine(sampling_plan=path)
+    pd.testing.assert_series_equal(engine.calculate_sampling_quantity(df_test.copy())['抽样数量'], expected)
+    assert any('抽样方案 plan' in entry['信息'] for entry in engine.debug_info)
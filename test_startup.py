@@ -0,0 +1,6 @@
+from benchmarks.startup import measure_once
+
+
+def test_gui_start_does_not_load_heavy_modules():
+    # 无显示环境时只检查 import main
+    assert measure_once()['heavy_modules'] == []
@@ -0,0 +1,27 @@
+import os
+
+import pandas as pd
+
+from engine import LaborTimeEngine
+from writer import CsvSheet2Sink
+
+
+def test_streaming_matches_read_excel_with_blank_cells(data_dir):
+    cards_path = os.path.join(data_dir, 'whole_rawdata.xlsx')
+    engine = LaborTimeEngine(data_dir=data_dir, use_cache=False, parallel_load=False)
+    references = engine.load_references()
+    sheet1, sheet2, _ = engine.compute_file(cards_path, None, references)
+
+    sheet2_path = os.path.join(data_dir, 'sheet2.csv')
+    streamed = LaborTimeEngine(data_dir=data_dir, use_cache=False).compute_file_streaming(
+        cards_path, None, references, chunk_size=64, sheet2_sink=CsvSheet2Sink(sheet2_path))
+
+    # 含空值的工序号被 read_excel 读为 float，两条路径仍应得到相同的四位工序号
+    assert sheet1['工序号'].astype(str).str.fullmatch(r'\d{4}|0nan').all()
+    pd.testing.assert_frame_equal(streamed.reset_index(drop=True).astype(str),
+                                  sheet1.reset_index(drop=True).astype(str))
+
+    streamed2 = pd.read_csv(sheet2_path, dtype=str, keep_default_na=False)
+    expected2 = sheet2.reset_index(drop=True)
+    for col in ['工艺编号', '工序号', '量具1层编码']:
+        assert streamed2[col].tolist() == expected2[col].astype(str).tolist()
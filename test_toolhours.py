@@ -0,0 +1,69 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from toolhours import ToolHours, ToolHoursStore
+
+
+def database(hours: float) -> pd.DataFrame:
+    return pd.DataFrame({'量具1层': ['Caliper游标卡尺', ' height  gage数显高度尺 ', 'Caliper游标卡尺'],
+                         '量具分类': ['非特殊量具'] * 3, '工时基数': [0.001, 0.002, hours]})
+
+
+def parse(path: str) -> ToolHours:
+    return ToolHours.from_frames(pd.read_excel(path))
+
+
+def save(path: str, hours: float, day: int) -> None:
+    database(hours).to_excel(path, index=False)
+    moment = datetime(2026, 1, day).timestamp()
+    os.utime(path, (moment, moment))
+
+
+def test_codes_are_normalized_and_resolved():
+    aliases = pd.DataFrame({'别名': ['卡尺'], '量具编码': ['caliper游标卡尺']})
+    tool_hours = ToolHours.from_frames(database(0.004), aliases)
+    # 重复的编码保留最后一行的工时
+    assert tool_hours['CALIPER游标卡尺'] == 0.004
+    assert tool_hours['HEIGHT GAGE数显高度尺'] == 0.002
+    codes = pd.Series(['CALIPER游标卡尺', '卡尺', 'HEIGHTGAGE数显高度尺', 'UNKNOWN', None])
+    assert tool_hours.resolve(codes).tolist() == ['CALIPER游标卡尺', 'CALIPER游标卡尺', 'HEIGHT GAGE数显高度尺',
+                                                  None, None]
+
+
+def test_versions_and_pins(tmp_path):
+    path = str(tmp_path / 'database.xlsx')
+    store = ToolHoursStore(str(tmp_path / 'store'))
+    save(path, 0.004, 1)
+    assert store.load(path, parse)[1] == 'v1'
+    save(path, 0.005, 10)
+    tool_hours, imported = store.load(path, parse)
+    assert imported == 'v2' and tool_hours['CALIPER游标卡尺'] == 0.005
+
+    # 内容未变的重新保存不产生新版本
+    save(path, 0.005, 12)
+    assert store.load(path, parse)[1] is None
+    assert [item['version'] for item in store.versions()] == ['v1', 'v2']
+
+    assert store.load(path, parse, 'v1')[0]['CALIPER游标卡尺'] == 0.004
+    assert store.load(path, parse, '2026-01-05')[0].version == 'v1'
+    assert store.load(path, parse, '2026-01-10')[0].version == 'v2'
+    with pytest.raises(ValueError):
+        store.load(path, parse, '2025-12-31')
+    with pytest.raises(ValueError):
+        store.load(path, parse, 'v9')
+
+
+def test_restored_older_file_is_current(tmp_path):
+    path = str(tmp_path / 'database.xlsx')
+    store = ToolHoursStore(str(tmp_path / 'store'))
+    save(path, 0.004, 10)
+    store.load(path, parse)
+    # 还原一份修改时间更早的旧文件：生效时间更早，但仍是当前工作簿的内容
+    save(path, 0.003, 1)
+    tool_hours, imported = store.load(path, parse)
+    assert imported == 'v2'
+    assert tool_hours.version == 'v2' and tool_hours['CALIPER游标卡尺'] == 0.003
+    assert store.load(path, parse)[0]['CALIPER游标卡尺'] == 0.003
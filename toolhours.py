@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import unicodedata
+import uuid
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from cache import _replace_atomic, file_fingerprint, read_frame, write_frame
+
+# 版本库格式变化时递增，使旧版本库失效（重新从当前 database.xlsx 建立）
+STORE_VERSION = 1
+# 快照中的列：归一化后的量具编码及其工时基数
+TOOL_COLUMN = '量具编码'
+HOURS_COLUMN = '工时基数'
+# database.xlsx 中可选的别名工作表：第一列为别名，第二列为对应的量具编码
+ALIAS_SHEET = '别名'
+ALIAS_COLUMNS = ['别名', TOOL_COLUMN]
+# 快照生效时间的格式（取 database.xlsx 的修改时间）
+EFFECTIVE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def normalize_tool_code(values: pd.Series) -> pd.Series:
+    """Strip, upper-case and collapse whitespace in tool codes, as for 量具1层编码 in the inspection cards."""
+    return values.str.strip().str.upper().str.replace(r'\s+', ' ', regex=True)
+
+
+def loose_key(code: str) -> str:
+    """Return a tolerant form of a normalized tool code for near-miss matching.
+
+    Full-width characters are folded (NFKC), whitespace is dropped and the '+'-joined tools of a
+    combination are put in sorted order, so 'A （通止）+ B' and 'B+A (通止)' share a key.
+    """
+    folded = ''.join(unicodedata.normalize('NFKC', code).upper().split())
+    return '+'.join(sorted(folded.split('+')))
+
+
+def table_digest(tools: pd.DataFrame, aliases: pd.DataFrame) -> str:
+    """Return a SHA-256 of a snapshot's contents, used to skip re-saved but unchanged workbooks."""
+    sha = hashlib.sha256()
+    for df in (tools, aliases):
+        sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+class ToolHours(Mapping):
+    """Tool hours of one database.xlsx snapshot, read as a mapping of normalized tool code to hours.
+
+    resolve() matches inspection-card codes exactly first, then through the alias sheet, then by
+    loose_key when that loose key belongs to tools with a single hours value. version and
+    effective identify the snapshot (None for an unversioned load); digest identifies its contents.
+    """
+
+    def __init__(self, tools: pd.DataFrame, aliases: pd.DataFrame, version: str | None = None,
+                 effective: str | None = None, digest: str | None = None):
+        self.tools = tools
+        self.aliases = aliases
+        self.version = version
+        self.effective = effective
+        self.digest = digest or table_digest(tools, aliases)
+        self.hours = dict(zip(tools[TOOL_COLUMN], tools[HOURS_COLUMN]))
+        self.alias_keys = {alias: key for alias, key in zip(aliases['别名'], aliases[TOOL_COLUMN])
+                           if key in self.hours and alias not in self.hours}
+        loose = pd.DataFrame({'loose': tools[TOOL_COLUMN].map(loose_key), 'key': tools[TOOL_COLUMN],
+                              'hours': tools[HOURS_COLUMN]})
+        unambiguous = loose[loose.groupby('loose')['hours'].transform('nunique') == 1].drop_duplicates('loose')
+        self.loose_keys = dict(zip(unambiguous['loose'], unambiguous['key']))
+
+    @classmethod
+    def from_frames(cls, df_database: pd.DataFrame, df_aliases: pd.DataFrame | None = None, **kwargs) -> 'ToolHours':
+        """Build from the first worksheet of database.xlsx (code, category, hours) and the optional alias sheet.
+
+        Codes are normalized as text (an empty cell becomes 'NAN') and a repeated code keeps its
+        last hours, as the flat dict built from the worksheet did.
+        """
+        codes = normalize_tool_code(df_database.iloc[:, 0].astype(str))
+        hours = pd.to_numeric(df_database.iloc[:, 2], errors='coerce').fillna(0)
+        tools = pd.DataFrame({TOOL_COLUMN: codes.to_numpy(), HOURS_COLUMN: hours.to_numpy(dtype=float)})
+        tools = tools.drop_duplicates(TOOL_COLUMN, keep='last').reset_index(drop=True)
+        if df_aliases is None or df_aliases.shape[1] < 2:
+            aliases = pd.DataFrame({column: pd.Series(dtype=object) for column in ALIAS_COLUMNS})
+        else:
+            df_aliases = df_aliases.iloc[:, :2].dropna()
+            aliases = pd.DataFrame({
+                '别名': normalize_tool_code(df_aliases.iloc[:, 0].astype(str)).to_numpy(),
+                TOOL_COLUMN: normalize_tool_code(df_aliases.iloc[:, 1].astype(str)).to_numpy(),
+            }).drop_duplicates('别名', keep='last').reset_index(drop=True)
+        return cls(tools, aliases, **kwargs)
+
+    def __getitem__(self, code) -> float:
+        return self.hours[code]
+
+    def __contains__(self, code) -> bool:
+        return code in self.hours
+
+    def __iter__(self):
+        return iter(self.hours)
+
+    def __len__(self) -> int:
+        return len(self.hours)
+
+    def match(self, code) -> str | None:
+        """Return the database code that code resolves to, or None."""
+        if not isinstance(code, str):
+            return None
+        if code in self.hours:
+            return code
+        if code in self.alias_keys:
+            return self.alias_keys[code]
+        return self.loose_keys.get(loose_key(code))
+
+    def resolve(self, codes: pd.Series) -> pd.Series:
+        """Return the database code each inspection-card code resolves to, NaN where none does.
+
+        Only the distinct codes (the categories of a categorical column) are matched.
+        """
+        if isinstance(codes.dtype, pd.CategoricalDtype):
+            positions, uniques = codes.cat.codes.to_numpy(), codes.cat.categories
+        else:
+            positions, uniques = pd.factorize(codes)
+        matched = np.array([self.match(code) for code in uniques] + [None], dtype=object)
+        return pd.Series(matched[positions], index=codes.index, dtype=object)
+
+    def describe(self) -> str:
+        label = f"版本 {self.version}（生效时间 {self.effective}）" if self.version else "未启用版本库"
+        return f"量具工时数据库{label}：{len(self.hours)} 个量具编码，{len(self.alias_keys)} 个别名"
+
+
+def parse_pin(pin: str) -> datetime | None:
+    """Return the moment a date or datetime pin refers to (end of day for a date), or None if it is not one."""
+    try:
+        moment = datetime.fromisoformat(pin)
+    except ValueError:
+        return None
+    if len(pin) <= 10:
+        moment += timedelta(days=1) - timedelta(seconds=1)
+    return moment
+
+
+class ToolHoursStore:
+    """Effective-dated snapshots of database.xlsx kept in store_dir.
+
+    Every distinct content of the workbook becomes a snapshot v1, v2, ... stored as feather frames
+    and effective from the workbook's modification time; versions.json lists them together with
+    the fingerprint of the workbook last seen and the version holding its contents. load() imports
+    the workbook when its fingerprint changed (so a resident process picks up new hours on its next
+    reload) and returns the snapshot of the current workbook, or the one a version name or date pins.
+    The current snapshot is not chosen by effective time, which goes back when an older file is
+    restored with its modification time.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.store_dir, 'versions.json')
+
+    def read_index(self) -> dict:
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+        if index is None or index.get('version') != STORE_VERSION:
+            return {'version': STORE_VERSION, 'fingerprint': None, 'current': None, 'snapshots': []}
+        return index
+
+    def write_index(self, index: dict) -> None:
+        tmp_path = os.path.join(self.store_dir, f"versions.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        _replace_atomic(tmp_path, self.index_path)
+
+    def is_current(self, path: str) -> bool:
+        """Return True if load would not need to parse the workbook."""
+        return self.read_index()['fingerprint'] == file_fingerprint(path)
+
+    def versions(self) -> list[dict]:
+        """Return the snapshot records (version, effective, imported_at, tools, aliases, digest), oldest first."""
+        return self.read_index()['snapshots']
+
+    def load(self, path: str, parse, pin: str | None = None) -> tuple[ToolHours, str | None]:
+        """Return (snapshot, imported): the pinned or current snapshot and the version imported by this call, if any.
+
+        parse(path) must return a ToolHours built from the workbook.
+        """
+        fingerprint = file_fingerprint(path)
+        index = self.read_index()
+        imported = None
+        if index['fingerprint'] != fingerprint:
+            tool_hours = parse(path)
+            snapshots = index['snapshots']
+            if not snapshots or snapshots[-1]['digest'] != tool_hours.digest:
+                imported = self.add_snapshot(index, tool_hours, datetime.fromtimestamp(
+                    fingerprint['mtime_ns'] / 1e9).strftime(EFFECTIVE_FORMAT))
+            index['fingerprint'] = fingerprint
+            index['current'] = snapshots[-1]['version']
+            self.write_index(index)
+        return self.snapshot(index, pin), imported
+
+    def add_snapshot(self, index: dict, tool_hours: ToolHours, effective: str) -> str:
+        os.makedirs(self.store_dir, exist_ok=True)
+        version = f"v{len(index['snapshots']) + 1}"
+        index['snapshots'].append({
+            'version': version,
+            'effective': effective,
+            'imported_at': datetime.now().strftime(EFFECTIVE_FORMAT),
+            'tools': len(tool_hours.tools),
+            'aliases': len(tool_hours.aliases),
+            'digest': tool_hours.digest,
+            'files': {name: write_frame(self.store_dir, f"{version}.{name}", df.reset_index(drop=True))
+                      for name, df in (('tools', tool_hours.tools), ('aliases', tool_hours.aliases))},
+        })
+        return version
+
+    def snapshot(self, index: dict, pin: str | None = None) -> ToolHours:
+        """Return the snapshot named by pin (a version such as 'v3', or a date/datetime), the current one without one.
+
+        Effective times only order the snapshots for a date pin.
+        """
+        snapshots = index['snapshots']
+        if not snapshots:
+            raise ValueError("量具工时版本库为空")
+        by_name = {item['version']: item for item in snapshots}
+        if pin is None:
+            # 当前工作簿的内容总是最后导入的版本；旧版本库没有 current 时同样取最后导入的版本
+            record = by_name.get(index.get('current'), snapshots[-1])
+        else:
+            moment = parse_pin(pin)
+            if pin in by_name:
+                record = by_name[pin]
+            elif moment is not None:
+                effective = [item for item in snapshots
+                             if datetime.strptime(item['effective'], EFFECTIVE_FORMAT) <= moment]
+                if not effective:
+                    raise ValueError(f"没有在 {pin} 之前生效的量具工时版本，最早的版本生效于 "
+                                     f"{min(item['effective'] for item in snapshots)}")
+                record = max(effective, key=lambda item: (item['effective'], int(item['version'][1:])))
+            else:
+                raise ValueError(f"未知的量具工时版本：{pin}（可用版本：{'、'.join(by_name)}）")
+        frames = {name: read_frame(os.path.join(self.store_dir, file_name))
+                  for name, file_name in record['files'].items()}
+        return ToolHours(frames['tools'], frames['aliases'], version=record['version'], effective=record['effective'],
+                         digest=record['digest'])
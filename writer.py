@@ -0,0 +1,182 @@
+import os
+import time
+
+import pandas as pd
+
+SHEET2_FORMATS = ('xlsx', 'csv', 'parquet')
+# 列式输出中按浮点数保存的列，其余列统一保存为文本，保证各块 schema 一致
+NUMERIC_OUTPUT_COLUMNS = {'批次大小', '抽样数量', '单件工时', '工时'}
+# 每次转换为 Python 对象的行数，限制写出时的额外内存
+WRITE_BLOCK_ROWS = 10_000
+# xlsx 工作表的最大行数（含表头行）
+XLSX_MAX_ROWS = 1_048_576
+
+
+def write_stats(path: str, rows: int, seconds: float) -> dict:
+    """Return rows, bytes and throughput for a written file."""
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    seconds = max(seconds, 1e-9)
+    return {
+        'path': path,
+        'rows': rows,
+        'bytes': size,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds,
+        'bytes_per_sec': size / seconds,
+    }
+
+
+def format_write_stats(stats: dict) -> str:
+    return (f"写入 {stats['path']}：{stats['rows']} 行，{stats['bytes'] / 1024 / 1024:.2f} MB，"
+            f"耗时 {stats['seconds']:.2f} 秒（{stats['rows_per_sec']:.0f} 行/秒，"
+            f"{stats['bytes_per_sec'] / 1024 / 1024:.2f} MB/秒）")
+
+
+def fits_xlsx(df: pd.DataFrame) -> bool:
+    """Return True if df and its header row fit in one xlsx worksheet."""
+    return len(df) + 1 <= XLSX_MAX_ROWS
+
+
+def fill_missing(df: pd.DataFrame, fill_values: dict | None) -> pd.DataFrame:
+    """Replace missing values in the given columns with display text, e.g. {'Production Version': 'N/A'}."""
+    fill_values = {col: value for col, value in (fill_values or {}).items() if col in df.columns}
+    if not fill_values:
+        return df
+    return df.astype({col: object for col in fill_values}).fillna(fill_values)
+
+
+def _iter_rows(df: pd.DataFrame, fill_values: dict | None = None):
+    # xlsxwriter 需要 Python 标量，NaN 写为空单元格
+    for start in range(0, len(df), WRITE_BLOCK_ROWS):
+        block = fill_missing(df.iloc[start:start + WRITE_BLOCK_ROWS].astype(object), fill_values)
+        yield from block.where(block.notna(), None).to_numpy().tolist()
+
+
+def write_workbook(path: str, sheets: dict, text_sheets: tuple = ('Sheet1', 'Sheet2'),
+                   fill_values: dict | None = None, charts: dict | None = None) -> dict:
+    """Write DataFrames to an xlsx workbook in xlsxwriter constant_memory mode using bulk write_row calls.
+
+    Rows are flushed to disk as they are written, so memory does not grow with the sheet size.
+    The first column of each sheet in text_sheets is formatted as text, as before. fill_values maps
+    sheet names to {column: text} written in place of missing values. charts maps chart sheet names
+    to {'type', 'subtype', 'title', 'x_axis', 'y_axis', 'series'}, the series given as xlsxwriter
+    add_series options referring to the data sheets; chart sheets follow the data sheets.
+    A sheet with more rows than an xlsx worksheet holds raises ValueError before anything is written.
+    """
+    import xlsxwriter
+
+    for sheet_name, df in sheets.items():
+        if not fits_xlsx(df):
+            raise ValueError(f"工作表 {sheet_name} 有 {len(df)} 行，超过 xlsx 工作表的上限 {XLSX_MAX_ROWS - 1} 行"
+                             f"（不含表头），请改用 CSV / Parquet 输出")
+    start = time.perf_counter()
+    rows = 0
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True,
+                                          'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    try:
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        text_format = workbook.add_format({'num_format': '@'})
+        for sheet_name, df in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            if sheet_name in text_sheets:
+                worksheet.set_column(0, 0, None, text_format)
+            worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+            for row_index, values in enumerate(_iter_rows(df, (fill_values or {}).get(sheet_name)), start=1):
+                # constant_memory 模式下超出行范围时 write_row 返回 -1 且不写入任何内容
+                if worksheet.write_row(row_index, 0, values) == -1:
+                    raise ValueError(f"工作表 {sheet_name} 第 {row_index + 1} 行写入失败：超出 xlsx 行范围")
+            rows += len(df)
+        for sheet_name, spec in (charts or {}).items():
+            chart = workbook.add_chart({'type': spec['type'], 'subtype': spec.get('subtype')})
+            for series in spec['series']:
+                chart.add_series(series)
+            chart.set_title({'name': spec.get('title', sheet_name)})
+            chart.set_x_axis(spec.get('x_axis', {}))
+            chart.set_y_axis(spec.get('y_axis', {}))
+            workbook.add_chartsheet(sheet_name).set_chart(chart)
+    finally:
+        workbook.close()
+    return write_stats(path, rows, time.perf_counter() - start)
+
+
+def columnar_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast output columns to a fixed schema: known numeric columns to float64, everything else to text."""
+    result = {}
+    for col in df.columns:
+        if col in NUMERIC_OUTPUT_COLUMNS:
+            result[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        else:
+            values = df[col]
+            result[col] = values.where(values.isna(), values.astype(str)).astype(object)
+    return pd.DataFrame(result)
+
+
+def sheet2_output_path(output_file_path: str, sheet2_format: str) -> str:
+    """Return the side file used for Sheet2 when it is not written into the workbook."""
+    return f"{os.path.splitext(output_file_path)[0]}_Sheet2.{sheet2_format}"
+
+
+class CsvSheet2Sink:
+    """Append Sheet2 chunks to a CSV file so per-row output never has to be held in memory."""
+
+    def __init__(self, file_path: str, fill_values: dict | None = None):
+        self.file_path = file_path
+        self.fill_values = fill_values
+        self.rows_written = 0
+        self.seconds = 0.0
+
+    def __call__(self, sheet2_chunk: pd.DataFrame) -> None:
+        start = time.perf_counter()
+        sheet2_chunk = fill_missing(sheet2_chunk, self.fill_values)
+        first = self.rows_written == 0
+        # 仅首块写入 BOM 和表头，便于 Excel 正确识别中文
+        sheet2_chunk.to_csv(self.file_path, mode='w' if first else 'a', header=first, index=False,
+                            encoding='utf-8-sig' if first else 'utf-8')
+        self.rows_written += len(sheet2_chunk)
+        self.seconds += time.perf_counter() - start
+
+    def close(self) -> dict:
+        return write_stats(self.file_path, self.rows_written, self.seconds)
+
+
+class ParquetSheet2Sink:
+    """Append Sheet2 chunks as row groups of one Parquet file with a fixed schema (requires pyarrow)."""
+
+    def __init__(self, file_path: str, fill_values: dict | None = None):
+        self.file_path = file_path
+        self.fill_values = fill_values
+        self.rows_written = 0
+        self.seconds = 0.0
+        self.writer = None
+
+    def __call__(self, sheet2_chunk: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        start = time.perf_counter()
+        frame = columnar_frame(fill_missing(sheet2_chunk, self.fill_values))
+        if self.writer is None:
+            schema = pa.schema([(col, pa.float64() if col in NUMERIC_OUTPUT_COLUMNS else pa.string())
+                                for col in frame.columns])
+            self.writer = pq.ParquetWriter(self.file_path, schema)
+        self.writer.write_table(pa.Table.from_pandas(frame, schema=self.writer.schema, preserve_index=False))
+        self.rows_written += len(sheet2_chunk)
+        self.seconds += time.perf_counter() - start
+
+    def close(self) -> dict:
+        start = time.perf_counter()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.seconds += time.perf_counter() - start
+        return write_stats(self.file_path, self.rows_written, self.seconds)
+
+
+def make_sheet2_sink(sheet2_format: str, output_file_path: str, fill_values: dict | None = None):
+    """Return a CSV or Parquet Sheet2 sink writing next to output_file_path."""
+    path = sheet2_output_path(output_file_path, sheet2_format)
+    if sheet2_format == 'csv':
+        return CsvSheet2Sink(path, fill_values)
+    if sheet2_format == 'parquet':
+        return ParquetSheet2Sink(path, fill_values)
+    raise ValueError(f"不支持的 Sheet2 输出格式：{sheet2_format}")